@@ -1,23 +1,206 @@
 # SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
 # SPDX-License-Identifier: MPL-2.0
+import asyncio
+import inspect
+import time
+from collections.abc import AsyncGenerator
+from collections.abc import AsyncIterator
+from collections.abc import Coroutine
+from collections.abc import Iterator
+from contextlib import nullcontext
+from functools import partial
+from typing import Any
+from typing import TypeVar
 from uuid import UUID
 
 import structlog
 from fastapi import APIRouter
+from fastapi import HTTPException
 from fastapi import Response
+from fastapi.responses import StreamingResponse
+from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
 from lxml import etree
+from lxml.etree import _Element as Element
+from more_itertools import chunked
 from more_itertools import one
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import root_validator
 
 from os2mo_fkk import depends
 from os2mo_fkk.events import SyncStatus
+from os2mo_fkk.events import dry_run_sync
 from os2mo_fkk.events import sync
+from os2mo_fkk.events import sync_batch
+from os2mo_fkk.klassifikation.api import FKKAPI
+from os2mo_fkk.klassifikation.api import LIST_LIMIT
 from os2mo_fkk.klassifikation.models import Klasse as FKKKlasse
+from os2mo_fkk.klassifikation.models import parse_klasser
+from os2mo_fkk.lanes import Lane
 from os2mo_fkk.models import ClassValidity
 from os2mo_fkk.models import fkk_klasse_to_class_validities
+from os2mo_fkk.planner import SyncPlan
+from os2mo_fkk.reconcile import ReconciliationProgress
+from os2mo_fkk.tracing import Span
+from os2mo_fkk.util import StrictBaseModel
 
 router = APIRouter()
 logger = structlog.stdlib.get_logger()
 
+T = TypeVar("T")
+
+
+async def _as_completed(
+    concurrency: int, coroutines: list[Coroutine[Any, Any, T]]
+) -> AsyncGenerator[T, None]:
+    """Run the coroutines with bounded concurrency, yielding results as they complete.
+
+    Remaining coroutines are cancelled if the iteration stops early, such as when
+    the client of a streaming response disconnects.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coroutine: Coroutine[Any, Any, T]) -> T:
+        async with semaphore:
+            return await coroutine
+
+    tasks = [asyncio.create_task(run(c)) for c in coroutines]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for t in tasks:
+            t.cancel()
+        # Coroutines of tasks cancelled before they started are never awaited
+        for c in coroutines:
+            if inspect.getcoroutinestate(c) == inspect.CORO_CREATED:
+                c.close()
+
+
+async def _read_lists(
+    fkk: FKKAPI, uuids: list[UUID]
+) -> AsyncIterator[tuple[list[UUID], list[Element], str | None]]:
+    """Read the Klasser in concurrent list requests, yielding each as it completes.
+
+    The response is already being streamed, so a failed request yields its error
+    instead of raising.
+    """
+
+    async def read_list(
+        chunk: list[UUID],
+    ) -> tuple[list[UUID], list[Element], str | None]:
+        try:
+            return chunk, await fkk.read_list_outputs(chunk), None
+        except Exception as e:
+            logger.exception("Failed to read classes", uuids=chunk)
+            return chunk, [], repr(e)
+
+    chunks = chunked(dict.fromkeys(uuids), LIST_LIMIT)
+    async for chunk, raws, error in _as_completed(4, [read_list(c) for c in chunks]):
+        yield chunk, raws, error
+
+
+def _parse_list(
+    chunk: list[UUID], raws: list[Element]
+) -> Iterator[tuple[UUID, FKKKlasse | None]]:
+    """Parse list responses, including the Klasser which do not exist in FKK."""
+    klasser = {k.uuid: k for raw in raws for k in parse_klasser(raw)}
+    for uuid in chunk:
+        yield uuid, klasser.get(uuid)
+
+
+async def _read_klasser(
+    fkk: FKKAPI, uuids: list[UUID]
+) -> AsyncIterator[tuple[UUID, FKKKlasse | None, str | None]]:
+    """Read and parse the Klasser, yielding each with the error of its chunk, if any."""
+    async for chunk, raws, error in _read_lists(fkk, uuids):
+        if error is None:
+            try:
+                klasser = list(_parse_list(chunk, raws))
+            except Exception as e:
+                logger.exception("Failed to parse classes", uuids=chunk)
+                error = repr(e)
+        if error is not None:
+            for uuid in chunk:
+                yield uuid, None, error
+            continue
+        for uuid, klasse in klasser:
+            yield uuid, klasse, None
+
+
+class ReadResult(BaseModel):
+    uuid: UUID
+    klasse: FKKKlasse | None
+    error: str | None = None
+
+
+class MOReadResult(BaseModel):
+    uuid: UUID
+    validities: list[ClassValidity] | None
+    error: str | None = None
+
+
+@router.post("/read/raw", response_class=StreamingResponse)
+async def read_raw_many(uuids: list[UUID], fkk: depends.FKKAPI) -> StreamingResponse:
+    """Read multiple raw Klasser from FKK.
+
+    Streams an XML document containing the `ListOutput` of every list request as
+    soon as it completes, or an `Error` element per Klasse of a failed request.
+    """
+
+    async def results() -> AsyncIterator[bytes]:
+        yield b'<?xml version="1.0" encoding="UTF-8"?>\n<ListOutputs>\n'
+        async for chunk, raws, error in _read_lists(fkk, uuids):
+            for raw in raws:
+                yield etree.tostring(raw, pretty_print=True)
+            if error is not None:
+                for uuid in chunk:
+                    element = etree.Element("Error", uuid=str(uuid))
+                    element.text = error
+                    yield etree.tostring(element, pretty_print=True)
+        yield b"</ListOutputs>\n"
+
+    return StreamingResponse(results(), media_type="application/xml")
+
+
+@router.post("/read/parsed", response_class=StreamingResponse)
+async def read_parsed_many(uuids: list[UUID], fkk: depends.FKKAPI) -> StreamingResponse:
+    """Read multiple Klasser from FKK and parse them.
+
+    Streams a `ReadResult` NDJSON line per Klasse as soon as it is read, with the
+    error if it could not be read.
+    """
+
+    async def results() -> AsyncIterator[str]:
+        async for uuid, klasse, error in _read_klasser(fkk, uuids):
+            yield ReadResult(uuid=uuid, klasse=klasse, error=error).json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/read/mo", response_class=StreamingResponse)
+async def read_mo_many(
+    uuids: list[UUID], mo: depends.GraphQLClient, fkk: depends.FKKAPI
+) -> StreamingResponse:
+    """Read multiple Klasser from FKK and convert them to MO validity states.
+
+    Streams a `MOReadResult` NDJSON line per Klasse as soon as it is read, with the
+    error if it could not be read.
+    """
+    kle_number_facet = one((await mo.get_facet("kle_number")).objects).uuid
+
+    async def results() -> AsyncIterator[str]:
+        async for uuid, klasse, error in _read_klasser(fkk, uuids):
+            validities = None
+            if klasse is not None:
+                validities = list(
+                    fkk_klasse_to_class_validities(klasse, facet=kle_number_facet)
+                )
+            result = MOReadResult(uuid=uuid, validities=validities, error=error)
+            yield result.json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 
 @router.get("/read/{uuid}/raw")
 async def read_raw(uuid: UUID, fkk: depends.FKKAPI) -> Response:
@@ -49,9 +232,186 @@ async def read_mo(
     return list(fkk_klasse_to_class_validities(parsed, facet=kle_number_facet))
 
 
+class SyncRequest(StrictBaseModel):
+    """Classes to synchronise, by UUID or by user key prefix, e.g. `85.02`."""
+
+    uuids: list[UUID] | None = None
+    user_key_prefix: str | None = Field(None, min_length=1)
+
+    @root_validator(skip_on_failure=True)
+    def check_exactly_one(cls, values: dict[str, Any]) -> dict[str, Any]:
+        if (values.get("uuids") is None) == (values.get("user_key_prefix") is None):
+            raise ValueError("Exactly one of uuids and user_key_prefix is required")
+        return values
+
+
+class SyncResult(BaseModel):
+    uuid: UUID
+    status: SyncStatus | None = None
+    error: str | None = None
+    duration: float  # seconds
+
+
+@router.post("/sync", response_class=StreamingResponse)
+async def sync_many(
+    sync_request: SyncRequest,
+    settings: depends.Settings,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+) -> StreamingResponse:
+    """Synchronise multiple classes from FKK to OS2mo.
+
+    Streams a `SyncResult` NDJSON line per class as soon as it is synchronised, so
+    large resynchronisations neither need a client-side loop nor hit proxy timeouts.
+    Classes are synchronised in the bulk priority lane if enabled. They are not
+    ordered by their KLE hierarchy, which would require reading every class from
+    FKK before the first result; a child created before its parent fails, and can
+    be synchronised again.
+    """
+    if sync_request.uuids is not None:
+        uuids = list(dict.fromkeys(sync_request.uuids))
+    else:
+        assert sync_request.user_key_prefix is not None
+        uuids = sorted(await fkk.get_uuids(f"{sync_request.user_key_prefix}*"))
+
+    async def sync_class(uuid: UUID) -> SyncResult:
+        start = time.perf_counter()
+        try:
+            async with lanes.slot(Lane.BULK) if lanes is not None else nullcontext():
+                status = await sync(
+                    uuid,
+                    mo,
+                    fkk,
+                    loader=loader,
+                    batcher=batcher,
+                    fingerprints=fingerprints,
+                    echoes=echoes,
+                    prefilter=prefilter,
+                    locks=locks,
+                    mo_changed=True,
+                )
+        except Exception as e:
+            logger.exception("Failed to synchronise class", uuid=uuid)
+            return SyncResult(
+                uuid=uuid, error=repr(e), duration=time.perf_counter() - start
+            )
+        return SyncResult(
+            uuid=uuid, status=status, duration=time.perf_counter() - start
+        )
+
+    async def results() -> AsyncIterator[str]:
+        async for result in _as_completed(
+            settings.fkk.changes_concurrency, [sync_class(uuid) for uuid in uuids]
+        ):
+            yield result.json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/sync/dry-run")
+async def dry_run_many(
+    uuids: list[UUID], mo: depends.GraphQLClient, fkk: depends.FKKAPI
+) -> list[SyncPlan]:
+    """Plan synchronisation of multiple classes without writing to OS2mo."""
+    return await gather_with_concurrency(
+        4, *(dry_run_sync(uuid, mo, fkk) for uuid in uuids)
+    )
+
+
 @router.post("/sync/{uuid}")
 async def sync_uuid(
-    uuid: UUID, mo: depends.GraphQLClient, fkk: depends.FKKAPI
-) -> SyncStatus:
-    """Synchronise klassifikation from FKK to OS2mo."""
-    return await sync(uuid, mo, fkk)
+    uuid: UUID,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    locks: depends.KeyedLock,
+    dry_run: bool = False,
+) -> SyncStatus | SyncPlan:
+    """Synchronise klassifikation from FKK to OS2mo.
+
+    MO is always read, since manual synchronisation is used to repair MO. With
+    `dry_run`, the planned mutations are returned instead of executed.
+    """
+    if dry_run:
+        return await dry_run_sync(uuid, mo, fkk)
+    return await sync(
+        uuid,
+        mo,
+        fkk,
+        loader=loader,
+        batcher=batcher,
+        fingerprints=fingerprints,
+        echoes=echoes,
+        prefilter=prefilter,
+        locks=locks,
+        mo_changed=True,
+    )
+
+
+@router.post("/reconcile")
+async def start_reconciliation(
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+    reconciler: depends.Reconciler,
+) -> ReconciliationProgress:
+    """Start full reconciliation of all KLE classes between FKK and OS2mo."""
+    if reconciler.running:
+        raise HTTPException(status_code=409, detail="Reconciliation already running")
+    reconciler.start(
+        mo,
+        partial(
+            sync_batch,
+            mo=mo,
+            fkk=fkk,
+            loader=loader,
+            batcher=batcher,
+            fingerprints=fingerprints,
+            echoes=echoes,
+            prefilter=prefilter,
+            locks=locks,
+            lanes=lanes,
+        ),
+    )
+    return reconciler.progress
+
+
+@router.get("/reconcile")
+async def get_reconciliation(reconciler: depends.Reconciler) -> ReconciliationProgress:
+    """Get progress of the current or last reconciliation."""
+    return reconciler.progress
+
+
+@router.get("/traces")
+async def get_traces(exporter: depends.TraceExporter) -> dict[UUID, list[Span]]:
+    """Get the most recent traces, by trace ID."""
+    if exporter is None:
+        raise HTTPException(status_code=404, detail="Tracing is not enabled")
+    return exporter.traces()
+
+
+@router.post("/event-generator/trigger", status_code=202)
+async def trigger_event_generator(event_generator: depends.FKKEventGenerator) -> None:
+    """Check FKK for changed classes now, instead of waiting for the interval."""
+    if not event_generator.is_leader:
+        raise HTTPException(
+            status_code=409, detail="Another replica runs the event generator"
+        )
+    event_generator.trigger()
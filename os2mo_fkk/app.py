@@ -7,15 +7,32 @@ from fastapi import FastAPI
 from fastramqpi.main import FastRAMQPI
 from fastramqpi.metrics import dipex_last_success_timestamp
 from fastramqpi.ramqp import AMQPSystem
+from fastramqpi.ramqp import Router
 
 from os2mo_fkk import api
 from os2mo_fkk import events
 from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.batching import SyncBatcher
 from os2mo_fkk.config import Settings
 from os2mo_fkk.database import Base
+from os2mo_fkk.debounce import Debouncer
+from os2mo_fkk.echo import EchoRegistry
 from os2mo_fkk.events import fkk_router
+from os2mo_fkk.fingerprint import Fingerprints
 from os2mo_fkk.klassifikation.api import FKKAPI
 from os2mo_fkk.klassifikation.event_generator import FKKEventGenerator
+from os2mo_fkk.klassifikation.outbox import OutboxPublisher
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.lanes import PriorityLanes
+from os2mo_fkk.leader import LeaderLease
+from os2mo_fkk.loader import ClassLoader
+from os2mo_fkk.locks import AdvisoryKeyedLock
+from os2mo_fkk.locks import KeyedLock
+from os2mo_fkk.mutations import MutationBatcher
+from os2mo_fkk.partitions import register_partitions
+from os2mo_fkk.prefilter import KLEPrefilter
+from os2mo_fkk.reconcile import Reconciler
+from os2mo_fkk.tracing import InMemoryExporter
 
 
 def create_app() -> FastAPI:
@@ -29,25 +46,139 @@ def create_app() -> FastAPI:
     )
     fastramqpi.add_context(settings=settings)
 
-    # FKK AMQP system
+    # Tracing
+    trace_exporter = None
+    if settings.tracing.enabled:
+        trace_exporter = InMemoryExporter(max_spans=settings.tracing.max_spans)
+        fastramqpi.add_lifespan_manager(trace_exporter, priority=100)
+    fastramqpi.add_context(trace_exporter=trace_exporter)
+
+    # FKK AMQP system. The handlers of the consumed partitions are registered in
+    # addition to the unpartitioned ones, which drain messages published before
+    # partitioning was enabled. MO class events are routed to the partitions too.
+    router = Router()
+    router.registry.update(fkk_router.registry)
+    register_partitions(
+        router, events.fkk_handler, "change", settings.fkk.consumed_partitions
+    )
+    register_partitions(
+        router, events.fkk_changes_handler, "changes", settings.fkk.consumed_partitions
+    )
+    register_partitions(
+        router,
+        events.fkk_mo_change_handler,
+        "mo_change",
+        settings.fkk.consumed_partitions,
+    )
     fkk_amqp_system = AMQPSystem(
         settings=settings.fkk.amqp,
-        router=fkk_router,
+        router=router,
         context=fastramqpi.get_context(),
     )
+    fastramqpi.add_context(fkk_amqp_system=fkk_amqp_system)
 
     # FKK API
     fkk_api = FKKAPI(settings=settings.fkk)
     fastramqpi.add_context(fkk_api=fkk_api)
 
+    # MO class loader
+    fastramqpi.add_context(class_loader=ClassLoader())
+
+    # MO write-behind
+    mutation_batcher = None
+    if settings.write_behind.enabled:
+        mutation_batcher = MutationBatcher(
+            window=settings.write_behind.window,
+            max_size=settings.write_behind.max_size,
+        )
+        # After the GraphQL client, before the AMQP systems
+        fastramqpi.add_lifespan_manager(mutation_batcher, priority=600)
+    fastramqpi.add_context(mutation_batcher=mutation_batcher)
+
+    # Micro-batching of AMQP messages
+    sync_batcher = None
+    if settings.batching.enabled:
+        sync_batcher = SyncBatcher(
+            window=settings.batching.window,
+            max_size=settings.batching.max_size,
+        )
+        # Before the AMQP systems, after the write-behind
+        fastramqpi.add_lifespan_manager(sync_batcher, priority=700)
+    fastramqpi.add_context(sync_batcher=sync_batcher)
+
+    # Debouncing of bursts of events for the same class
+    debouncer = None
+    if settings.debounce.enabled:
+        debouncer = Debouncer(window=settings.debounce.window)
+        # Before the AMQP systems, after the micro-batching
+        fastramqpi.add_lifespan_manager(debouncer, priority=800)
+    fastramqpi.add_context(debouncer=debouncer)
+
+    # Priority lanes separating live changes, MO events and bulk work
+    priority_lanes = None
+    if settings.lanes.enabled:
+        priority_lanes = PriorityLanes(
+            concurrency=settings.lanes.concurrency,
+            weights={
+                Lane.LIVE: settings.lanes.live_weight,
+                Lane.MO: settings.lanes.mo_weight,
+                Lane.BULK: settings.lanes.bulk_weight,
+            },
+        )
+    fastramqpi.add_context(priority_lanes=priority_lanes)
+
+    # Suppression of MO events caused by our own writes
+    echo_registry = EchoRegistry(ttl=settings.echo_ttl)
+    fastramqpi.add_context(echo_registry=echo_registry)
+
+    # Per-class locking of synchronisations
+    locks: KeyedLock
+    match settings.lock_backend:
+        case "memory":
+            locks = KeyedLock()
+        case "database":
+            locks = AdvisoryKeyedLock(
+                engine=fastramqpi.get_context()["engine"],
+                max_connections=settings.lock_connections,
+            )
+    fastramqpi.add_context(locks=locks)
+
+    # Desired state fingerprints
+    fingerprints = Fingerprints(sessionmaker=fastramqpi.get_context()["sessionmaker"])
+    fastramqpi.add_context(fingerprints=fingerprints)
+
+    # Discard MO events for non-KLE classes
+    kle_prefilter = KLEPrefilter(
+        fingerprints=fingerprints, context=fastramqpi.get_context()
+    )
+    fastramqpi.add_context(kle_prefilter=kle_prefilter)
+
     # FKK event generator
+    fkk_outbox_publisher = OutboxPublisher(
+        amqp_system=fkk_amqp_system,
+        sessionmaker=fastramqpi.get_context()["sessionmaker"],
+        message_size=settings.fkk.changes_message_size,
+        partitions=settings.fkk.partitions,
+    )
+    fkk_event_generator_lease = LeaderLease(
+        sessionmaker=fastramqpi.get_context()["sessionmaker"],
+        name="event_generator",
+        ttl=settings.fkk.leader_lease_ttl,
+    )
     fkk_event_generator = FKKEventGenerator(
         settings=settings.fkk,
         api=fkk_api,
-        amqp_system=fkk_amqp_system,
+        outbox=fkk_outbox_publisher,
+        lease=fkk_event_generator_lease,
         sessionmaker=fastramqpi.get_context()["sessionmaker"],
     )
 
+    fastramqpi.add_context(fkk_event_generator=fkk_event_generator)
+
+    # Full reconciliation
+    reconciler = Reconciler(fkk=fkk_api)
+    fastramqpi.add_context(reconciler=reconciler)
+
     # The event generator controls the dipex_last_success_timestamp metric
     async def update_dipex_last_success_timestamp(_: Any) -> None:
         last_run = await fkk_event_generator.get_last_run()
@@ -61,9 +192,14 @@ def create_app() -> FastAPI:
 
     # Before MO AMQP system
     fastramqpi.add_lifespan_manager(fkk_api, priority=500)
+    # Before the AMQP systems
+    fastramqpi.add_lifespan_manager(kle_prefilter, priority=900)
     # After MO AMQP system
     fastramqpi.add_lifespan_manager(fkk_amqp_system, priority=1100)
+    fastramqpi.add_lifespan_manager(fkk_outbox_publisher, priority=1150)
+    fastramqpi.add_lifespan_manager(fkk_event_generator_lease, priority=1150)
     fastramqpi.add_lifespan_manager(fkk_event_generator, priority=1200)
+    fastramqpi.add_lifespan_manager(reconciler, priority=1300)
 
     # FastAPI router
     app = fastramqpi.get_app()
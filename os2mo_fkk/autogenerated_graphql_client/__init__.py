@@ -1,4 +1,4 @@
-# Generated by ariadne-codegen on 2024-08-08 21:31
+# Generated by ariadne-codegen on 2026-10-19 12:52
 
 from .async_base_client import AsyncBaseClient
 from .base_model import BaseModel
@@ -15,14 +15,33 @@ from .exceptions import GraphQLClientGraphQLError
 from .exceptions import GraphQLClientGraphQLMultiError
 from .exceptions import GraphQLClientHttpError
 from .exceptions import GraphQlClientInvalidResponseError
+from .fragments import ClassValidities
+from .fragments import ClassValiditiesValidities
+from .fragments import ClassValiditiesValiditiesValidity
 from .get_class import GetClass
 from .get_class import GetClassClasses
 from .get_class import GetClassClassesObjects
 from .get_class import GetClassClassesObjectsValidities
 from .get_class import GetClassClassesObjectsValiditiesValidity
+from .get_class_and_facet import GetClassAndFacet
+from .get_class_and_facet import GetClassAndFacetClasses
+from .get_class_and_facet import GetClassAndFacetClassesObjects
+from .get_class_and_facet import GetClassAndFacetFacets
+from .get_class_and_facet import GetClassAndFacetFacetsObjects
+from .get_classes import GetClasses
+from .get_classes import GetClassesClasses
+from .get_classes import GetClassesClassesObjects
+from .get_classes import GetClassesFacets
+from .get_classes import GetClassesFacetsObjects
 from .get_facet import GetFacet
 from .get_facet import GetFacetFacets
 from .get_facet import GetFacetFacetsObjects
+from .get_facet_classes import GetFacetClasses
+from .get_facet_classes import GetFacetClassesClasses
+from .get_facet_classes import GetFacetClassesClassesObjects
+from .get_facet_classes import GetFacetClassesClassesPageInfo
+from .get_facet_classes import GetFacetClassesFacets
+from .get_facet_classes import GetFacetClassesFacetsObjects
 from .input_types import AddressCreateInput
 from .input_types import AddressFilter
 from .input_types import AddressRegistrationFilter
@@ -159,6 +178,9 @@ __all__ = [
     "ClassRegistrationFilter",
     "ClassTerminateInput",
     "ClassUpdateInput",
+    "ClassValidities",
+    "ClassValiditiesValidities",
+    "ClassValiditiesValiditiesValidity",
     "ConfigurationFilter",
     "CreateClass",
     "CreateClassClassCreate",
@@ -189,11 +211,27 @@ __all__ = [
     "FileFilter",
     "FileStore",
     "GetClass",
+    "GetClassAndFacet",
+    "GetClassAndFacetClasses",
+    "GetClassAndFacetClassesObjects",
+    "GetClassAndFacetFacets",
+    "GetClassAndFacetFacetsObjects",
     "GetClassClasses",
     "GetClassClassesObjects",
     "GetClassClassesObjectsValidities",
     "GetClassClassesObjectsValiditiesValidity",
+    "GetClasses",
+    "GetClassesClasses",
+    "GetClassesClassesObjects",
+    "GetClassesFacets",
+    "GetClassesFacetsObjects",
     "GetFacet",
+    "GetFacetClasses",
+    "GetFacetClassesClasses",
+    "GetFacetClassesClassesObjects",
+    "GetFacetClassesClassesPageInfo",
+    "GetFacetClassesFacets",
+    "GetFacetClassesFacetsObjects",
     "GetFacetFacets",
     "GetFacetFacetsObjects",
     "GraphQLClient",
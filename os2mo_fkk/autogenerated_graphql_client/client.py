@@ -1,17 +1,26 @@
-# Generated by ariadne-codegen on 2024-08-08 21:31
+# Generated by ariadne-codegen on 2026-10-19 12:52
 # Source: queries.graphql
 
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Union
 from uuid import UUID
 
 from .async_base_client import AsyncBaseClient
+from .base_model import UNSET
+from .base_model import UnsetType
 from .create_class import CreateClass
 from .create_class import CreateClassClassCreate
 from .delete_class import DeleteClass
 from .delete_class import DeleteClassClassDelete
 from .get_class import GetClass
 from .get_class import GetClassClasses
+from .get_class_and_facet import GetClassAndFacet
+from .get_classes import GetClasses
 from .get_facet import GetFacet
 from .get_facet import GetFacetFacets
+from .get_facet_classes import GetFacetClasses
 from .input_types import ClassCreateInput
 from .input_types import ClassUpdateInput
 from .truncate_class import TruncateClass
@@ -42,6 +51,137 @@ class GraphQLClient(AsyncBaseClient):
         data = self.get_data(response)
         return GetFacet.parse_obj(data).facets
 
+    async def get_class_and_facet(
+        self, uuid: UUID, facet_user_key: str
+    ) -> GetClassAndFacet:
+        query = gql(
+            """
+            query get_class_and_facet($uuid: UUID!, $facet_user_key: String!) {
+              classes(filter: {uuids: [$uuid], from_date: null, to_date: null}) {
+                objects {
+                  ...class_validities
+                }
+              }
+              facets(filter: {user_keys: [$facet_user_key]}) {
+                objects {
+                  uuid
+                }
+              }
+            }
+
+            fragment class_validities on ClassResponse {
+              validities(start: null, end: null) {
+                validity {
+                  from
+                  to
+                }
+                facet_uuid
+                uuid
+                user_key
+                name
+                parent_uuid
+              }
+            }
+            """
+        )
+        variables: dict[str, object] = {"uuid": uuid, "facet_user_key": facet_user_key}
+        response = await self.execute(query=query, variables=variables)
+        data = self.get_data(response)
+        return GetClassAndFacet.parse_obj(data)
+
+    async def get_classes(self, uuids: List[UUID], facet_user_key: str) -> GetClasses:
+        query = gql(
+            """
+            query get_classes($uuids: [UUID!]!, $facet_user_key: String!) {
+              classes(filter: {uuids: $uuids, from_date: null, to_date: null}) {
+                objects {
+                  uuid
+                  ...class_validities
+                }
+              }
+              facets(filter: {user_keys: [$facet_user_key]}) {
+                objects {
+                  uuid
+                }
+              }
+            }
+
+            fragment class_validities on ClassResponse {
+              validities(start: null, end: null) {
+                validity {
+                  from
+                  to
+                }
+                facet_uuid
+                uuid
+                user_key
+                name
+                parent_uuid
+              }
+            }
+            """
+        )
+        variables: dict[str, object] = {
+            "uuids": uuids,
+            "facet_user_key": facet_user_key,
+        }
+        response = await self.execute(query=query, variables=variables)
+        data = self.get_data(response)
+        return GetClasses.parse_obj(data)
+
+    async def get_facet_classes(
+        self,
+        facet_user_key: str,
+        cursor: Union[Optional[Any], UnsetType] = UNSET,
+        limit: Union[Optional[Any], UnsetType] = UNSET,
+    ) -> GetFacetClasses:
+        query = gql(
+            """
+            query get_facet_classes($facet_user_key: String!, $cursor: Cursor, $limit: int) {
+              classes(
+                filter: {facet: {user_keys: [$facet_user_key]}, from_date: null, to_date: null}
+                cursor: $cursor
+                limit: $limit
+              ) {
+                objects {
+                  uuid
+                  ...class_validities
+                }
+                page_info {
+                  next_cursor
+                }
+              }
+              facets(filter: {user_keys: [$facet_user_key]}) {
+                objects {
+                  uuid
+                }
+              }
+            }
+
+            fragment class_validities on ClassResponse {
+              validities(start: null, end: null) {
+                validity {
+                  from
+                  to
+                }
+                facet_uuid
+                uuid
+                user_key
+                name
+                parent_uuid
+              }
+            }
+            """
+        )
+        variables: dict[str, object] = {
+            "facet_user_key": facet_user_key,
+            "cursor": cursor,
+            "limit": limit,
+        }
+        response = await self.execute(query=query, variables=variables)
+        data = self.get_data(response)
+        return GetFacetClasses.parse_obj(data)
+
     async def get_class(self, uuid: UUID) -> GetClassClasses:
         query = gql(
             """
@@ -0,0 +1,34 @@
+# Generated by ariadne-codegen on 2026-10-19 12:47
+# Source: queries.graphql
+
+from datetime import datetime
+from typing import List
+from typing import Optional
+from uuid import UUID
+
+from pydantic import Field
+
+from .base_model import BaseModel
+
+
+class ClassValidities(BaseModel):
+    validities: List["ClassValiditiesValidities"]
+
+
+class ClassValiditiesValidities(BaseModel):
+    validity: "ClassValiditiesValiditiesValidity"
+    facet_uuid: UUID
+    uuid: UUID
+    user_key: str
+    name: str
+    parent_uuid: Optional[UUID]
+
+
+class ClassValiditiesValiditiesValidity(BaseModel):
+    from_: Optional[datetime] = Field(alias="from")
+    to: Optional[datetime]
+
+
+ClassValidities.update_forward_refs()
+ClassValiditiesValidities.update_forward_refs()
+ClassValiditiesValiditiesValidity.update_forward_refs()
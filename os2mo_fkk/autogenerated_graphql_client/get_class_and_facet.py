@@ -0,0 +1,36 @@
+# Generated by ariadne-codegen on 2026-10-19 12:47
+# Source: queries.graphql
+
+from typing import List
+from uuid import UUID
+
+from .base_model import BaseModel
+from .fragments import ClassValidities
+
+
+class GetClassAndFacet(BaseModel):
+    classes: "GetClassAndFacetClasses"
+    facets: "GetClassAndFacetFacets"
+
+
+class GetClassAndFacetClasses(BaseModel):
+    objects: List["GetClassAndFacetClassesObjects"]
+
+
+class GetClassAndFacetClassesObjects(ClassValidities):
+    pass
+
+
+class GetClassAndFacetFacets(BaseModel):
+    objects: List["GetClassAndFacetFacetsObjects"]
+
+
+class GetClassAndFacetFacetsObjects(BaseModel):
+    uuid: UUID
+
+
+GetClassAndFacet.update_forward_refs()
+GetClassAndFacetClasses.update_forward_refs()
+GetClassAndFacetClassesObjects.update_forward_refs()
+GetClassAndFacetFacets.update_forward_refs()
+GetClassAndFacetFacetsObjects.update_forward_refs()
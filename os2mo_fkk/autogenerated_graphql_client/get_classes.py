@@ -0,0 +1,36 @@
+# Generated by ariadne-codegen on 2026-10-19 12:51
+# Source: queries.graphql
+
+from typing import List
+from uuid import UUID
+
+from .base_model import BaseModel
+from .fragments import ClassValidities
+
+
+class GetClasses(BaseModel):
+    classes: "GetClassesClasses"
+    facets: "GetClassesFacets"
+
+
+class GetClassesClasses(BaseModel):
+    objects: List["GetClassesClassesObjects"]
+
+
+class GetClassesClassesObjects(ClassValidities):
+    uuid: UUID
+
+
+class GetClassesFacets(BaseModel):
+    objects: List["GetClassesFacetsObjects"]
+
+
+class GetClassesFacetsObjects(BaseModel):
+    uuid: UUID
+
+
+GetClasses.update_forward_refs()
+GetClassesClasses.update_forward_refs()
+GetClassesClassesObjects.update_forward_refs()
+GetClassesFacets.update_forward_refs()
+GetClassesFacetsObjects.update_forward_refs()
@@ -0,0 +1,44 @@
+# Generated by ariadne-codegen on 2026-10-19 12:52
+# Source: queries.graphql
+
+from typing import Any
+from typing import List
+from typing import Optional
+from uuid import UUID
+
+from .base_model import BaseModel
+from .fragments import ClassValidities
+
+
+class GetFacetClasses(BaseModel):
+    classes: "GetFacetClassesClasses"
+    facets: "GetFacetClassesFacets"
+
+
+class GetFacetClassesClasses(BaseModel):
+    objects: List["GetFacetClassesClassesObjects"]
+    page_info: "GetFacetClassesClassesPageInfo"
+
+
+class GetFacetClassesClassesObjects(ClassValidities):
+    uuid: UUID
+
+
+class GetFacetClassesClassesPageInfo(BaseModel):
+    next_cursor: Optional[Any]
+
+
+class GetFacetClassesFacets(BaseModel):
+    objects: List["GetFacetClassesFacetsObjects"]
+
+
+class GetFacetClassesFacetsObjects(BaseModel):
+    uuid: UUID
+
+
+GetFacetClasses.update_forward_refs()
+GetFacetClassesClasses.update_forward_refs()
+GetFacetClassesClassesObjects.update_forward_refs()
+GetFacetClassesClassesPageInfo.update_forward_refs()
+GetFacetClassesFacets.update_forward_refs()
+GetFacetClassesFacetsObjects.update_forward_refs()
@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections.abc import Awaitable
+from typing import AsyncContextManager
+from typing import Protocol
+from typing import Self
+from uuid import UUID
+
+import structlog
+from prometheus_client import Histogram
+
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.planner import SyncStatus
+
+logger = structlog.stdlib.get_logger()
+
+batch_size = Histogram(
+    "fkk_sync_batch_size",
+    "Number of classes synchronised per micro-batch",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+
+
+class SyncBatch(Protocol):
+    """Synchronisation of the classes of a batch, such as `events.sync_batch()`."""
+
+    def __call__(
+        self, uuids: list[UUID], *, mo_changed: set[UUID], lane: Lane
+    ) -> Awaitable[list[SyncStatus | BaseException]]: ...
+
+
+class SyncBatcher(AsyncContextManager):
+    def __init__(self, window: float, max_size: int) -> None:
+        """Micro-batching of AMQP messages into a single batched synchronisation.
+
+        The UUIDs of messages received within `window` seconds, up to `max_size` of
+        them, are synchronised together using the batch-oriented FKK and MO APIs.
+        Each handler waits for the outcome of its own UUID, so every message is
+        still acknowledged or rejected individually. A batch is synchronised in the
+        most urgent priority lane of its messages.
+        """
+        self._window = window
+        self._max_size = max_size
+        self._batch: dict[UUID, asyncio.Future[SyncStatus]] = {}
+        # Classes of the batch with messages signalling that MO was changed
+        self._mo_changed: set[UUID] = set()
+        self._lanes: set[Lane] = set()
+        self._sync_batch: SyncBatch | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Synchronise pending classes and wait for in-flight batches."""
+        self._flush()
+        await asyncio.gather(*self._flushes)
+
+    async def submit(
+        self, uuid: UUID, sync_batch: SyncBatch, lane: Lane, mo_changed: bool = False
+    ) -> SyncStatus:
+        """Synchronise the class as part of the next batch.
+
+        `mo_changed` signals that the MO class was changed by someone else, and is
+        passed on to `sync_batch` for the class.
+        Raises the exception raised while synchronising the class, if any.
+        """
+        self._lanes.add(lane)
+        if mo_changed:
+            self._mo_changed.add(uuid)
+        future = self._batch.get(uuid)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._batch[uuid] = future
+            self._sync_batch = sync_batch
+            if len(self._batch) >= self._max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(
+                    self._window, self._flush
+                )
+        # Shield the shared future from cancellation of a single handler
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        """Start synchronising the current batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch:
+            return
+        assert self._sync_batch is not None
+        # Lanes are declared from most to least urgent
+        lane = min(self._lanes, key=list(Lane).index)
+        task = asyncio.create_task(
+            self._run(self._sync_batch, self._batch, self._mo_changed, lane)
+        )
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+        self._batch = {}
+        self._mo_changed = set()
+        self._lanes = set()
+
+    async def _run(
+        self,
+        sync_batch: SyncBatch,
+        batch: dict[UUID, asyncio.Future[SyncStatus]],
+        mo_changed: set[UUID],
+        lane: Lane,
+    ) -> None:
+        batch_size.observe(len(batch))
+        uuids = list(batch.keys())
+        try:
+            results = await sync_batch(uuids, mo_changed=mo_changed, lane=lane)
+        except Exception as e:
+            # Reading failed: every class in the batch fails
+            logger.exception("Failed to synchronise batch", size=len(uuids))
+            results = [e] * len(uuids)
+        for result, future in zip(results, batch.values()):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
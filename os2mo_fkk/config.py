@@ -3,6 +3,7 @@
 from datetime import UTC
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 from typing import Literal
 
 import structlog
@@ -53,14 +54,59 @@ class FKKSettings(BaseModel):
     # further information.
     authority_context_cvr: str
 
-    # How often should we check FKK for new klasser?
+    # How often should we check FKK for new klasser? The interval is halved, down to
+    # `min_interval`, after every run finding changes, and doubled, up to `interval`,
+    # after every run finding none.
     interval: int = 1800  # seconds
+    min_interval: int = 60  # seconds
+
+    # Only one replica, the holder of a lease in the database, polls FKK. If it dies,
+    # another replica takes over when the lease expires.
+    leader_lease_ttl: float = 30  # seconds
 
     # Apply additional `BrugervendtNoegleTekst` filter to the event generator. Set in
     # compose and CI to speed up testing, as starting the event generator from scratch
     # otherwise takes a very long time. Supports wildcards such as `85*`.
     changed_uuids_user_key_filter: str | None
 
+    # Searching all of FKK, such as when the event generator starts from scratch, is
+    # split into a shard per KLE main group. Incremental searches covering a long
+    # period, such as after downtime, are split into windows of at most
+    # `search_window`. This many shards are paginated concurrently.
+    search_concurrency: int = 4
+    search_window: int = 3600  # seconds
+
+    # Publish changed UUIDs in `changes` messages of up to this many UUIDs, instead
+    # of a `change` message per UUID, reducing the message rate on bulk releases.
+    # The classes of a message, and of a bulk synchronisation through the API, are
+    # synchronised with this concurrency.
+    changes_message_size: int | None = None
+    changes_concurrency: int = 10
+
+    # Route change messages to this many partitions by consistently hashing the
+    # UUID, e.g. `change.3`, each consumed from its own queue. Every replica consumes
+    # a fixed set of partitions. MO class events are forwarded to the partitions as
+    # `mo_change` messages, so all events of a class are handled by the same
+    # replica, and the in-process locks, echoes and prefilter suffice. Every
+    # partition must be consumed by exactly one replica; messages of a partition
+    # nobody consumes are dropped by the exchange.
+    partitions: int | None = None
+    consumed_partitions: list[int] = []
+
+    @validator("consumed_partitions", always=True)
+    def validate_consumed_partitions(
+        cls, consumed_partitions: list[int], values: dict[str, Any]
+    ) -> list[int]:
+        partitions = values.get("partitions")
+        if consumed_partitions and partitions is None:
+            raise ValueError("Consumed partitions given without partitions")
+        if partitions is not None and not consumed_partitions:
+            raise ValueError("Partitions given without consumed partitions")
+        for p in consumed_partitions:
+            if not 0 <= p < (partitions or 0):
+                raise ValueError(f"Partition {p} not in range of {partitions}")
+        return consumed_partitions
+
     @validator("certificate", always=True)
     def validate_certificate(cls, cert_path: FilePath) -> FilePath:
         cert = x509.load_pem_x509_certificate(cert_path.read_bytes())
@@ -97,6 +143,68 @@ class FKKSettings(BaseModel):
                 return "https://adgangsstyring.eksterntest-stoettesystemerne.dk/runtime/services/kombittrust/14/certificatemixed"
 
 
+class WriteBehindSettings(BaseModel):
+    # Collect the MO mutations of concurrent synchronisations and write them to MO in
+    # batches. Only useful if multiple classes are synchronised concurrently.
+    enabled: bool = False
+
+    # A batch is written when it is this old ...
+    window: float = 0.1  # seconds
+
+    # ... or when it contains at least this many mutations.
+    max_size: int = 100
+
+
+class BatchingSettings(BaseModel):
+    # Synchronise the UUIDs of multiple AMQP messages together, using the bulk FKK
+    # and MO APIs. Requires raising the `prefetch_count` of both AMQP systems, i.e.
+    # FASTRAMQPI__AMQP__PREFETCH_COUNT and FKK__AMQP__PREFETCH_COUNT, to at least
+    # `max_size`; otherwise only one message is received at a time.
+    enabled: bool = False
+
+    # A batch is synchronised when it is this old ...
+    window: float = 0.5  # seconds
+
+    # ... or when it contains this many classes.
+    max_size: int = 50
+
+
+class DebounceSettings(BaseModel):
+    # Collapse bursts of events for the same class into a single synchronisation,
+    # and never synchronise the same class in parallel. Requires raising the
+    # `prefetch_count` of both AMQP systems, i.e. FASTRAMQPI__AMQP__PREFETCH_COUNT and
+    # FKK__AMQP__PREFETCH_COUNT, above one; otherwise the events of a burst are
+    # received one at a time, and each is only delayed by the window.
+    enabled: bool = False
+
+    # Synchronise this long after the first event of a burst.
+    window: float = 2  # seconds
+
+
+class LanesSettings(BaseModel):
+    # Schedule synchronisations in priority lanes, so bulk work such as multi-UUID
+    # change messages and reconciliations cannot starve live changes. Only useful if
+    # classes are synchronised concurrently, i.e. with a raised `prefetch_count`.
+    enabled: bool = False
+
+    # Total number of synchronisations at a time, each of a class or, with
+    # micro-batching, a batch of classes ...
+    concurrency: int = 10
+
+    # ... shared between the waiting lanes by these weights.
+    live_weight: int = 6
+    mo_weight: int = 3
+    bulk_weight: int = 1
+
+
+class TracingSettings(BaseModel):
+    # Trace the synchronisation pipeline. The most recent spans are kept in memory
+    # and can be inspected through the `/traces` endpoint.
+    enabled: bool = False
+
+    max_spans: int = 10_000
+
+
 class Settings(BaseSettings):
     class Config:
         frozen = True
@@ -104,3 +212,37 @@ class Settings(BaseSettings):
 
     fastramqpi: FastRAMQPISettings
     fkk: FKKSettings
+    write_behind: WriteBehindSettings = WriteBehindSettings()
+    batching: BatchingSettings = BatchingSettings()
+    debounce: DebounceSettings = DebounceSettings()
+    tracing: TracingSettings = TracingSettings()
+    lanes: LanesSettings = LanesSettings()
+
+    @validator("debounce")
+    def validate_debounce(
+        cls, debounce: DebounceSettings, values: dict[str, Any]
+    ) -> DebounceSettings:
+        if not debounce.enabled or "fastramqpi" not in values or "fkk" not in values:
+            return debounce
+        if values["fastramqpi"].amqp.prefetch_count <= 1:
+            raise ValueError("Debouncing requires FASTRAMQPI__AMQP__PREFETCH_COUNT > 1")
+        if values["fkk"].amqp.prefetch_count <= 1:
+            raise ValueError("Debouncing requires FKK__AMQP__PREFETCH_COUNT > 1")
+        return debounce
+
+    # Synchronisations of the same class are serialised using an in-process lock,
+    # which is sufficient for a single replica, or partitioned replicas, to use a
+    # `prefetch_count` above one. The database backend uses PostgreSQL advisory
+    # locks to also serialise them across unpartitioned replicas. Each in-flight
+    # class then holds a database connection.
+    lock_backend: Literal["memory", "database"] = "memory"
+
+    # Maximum number of classes synchronised at a time with the database lock
+    # backend. Must be below the size of the database connection pool, which is 15
+    # by default, since synchronisation also uses the database.
+    lock_connections: int = 10
+
+    # How long to recognise the MO events caused by our own writes. These events are
+    # dropped instead of synchronising the class again, if the class is still in the
+    # state we wrote.
+    echo_ttl: float = 60  # seconds
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import AsyncContextManager
+from typing import Self
+from uuid import UUID
+
+from prometheus_client import Counter
+
+from os2mo_fkk.planner import SyncStatus
+
+collapsed_events = Counter(
+    "fkk_debounce_collapsed_events",
+    "Number of events collapsed into the synchronisation of another event",
+)
+
+
+class Debouncer(AsyncContextManager):
+    def __init__(self, window: float) -> None:
+        """Debounce and coalesce bursts of events for the same class.
+
+        A synchronisation is started `window` seconds after the first event for a
+        class. Further events for the class in the meantime are collapsed into it.
+        If the class is already being synchronised, a single follow-up is scheduled
+        for after it instead of a parallel run.
+
+        A synchronisation is told whether any of the events collapsed into it signalled
+        that the MO class was changed by someone else.
+        """
+        self._window = window
+        # Synchronisations waiting for the window to pass or the previous one
+        self._pending: dict[UUID, asyncio.Future[SyncStatus]] = {}
+        self._running: dict[UUID, asyncio.Future[SyncStatus]] = {}
+        # Pending synchronisations with events signalling that MO was changed
+        self._mo_changed: set[UUID] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Wait for pending synchronisations."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run(
+        self,
+        uuid: UUID,
+        sync: Callable[[bool], Awaitable[SyncStatus]],
+        mo_changed: bool = False,
+    ) -> SyncStatus:
+        """Synchronise the class, coalescing with other events for it.
+
+        `sync` is only called if the event is not collapsed into another's, and is
+        passed whether MO was changed according to any of the collapsed events.
+        Raises the exception of the synchronisation, if any.
+        """
+        if mo_changed:
+            self._mo_changed.add(uuid)
+        future = self._pending.get(uuid)
+        if future is not None:
+            collapsed_events.inc()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[uuid] = future
+            task = asyncio.create_task(self._run(uuid, future, sync))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        # Shield the shared future from cancellation of a single handler
+        return await asyncio.shield(future)
+
+    async def _run(
+        self,
+        uuid: UUID,
+        future: asyncio.Future[SyncStatus],
+        sync: Callable[[bool], Awaitable[SyncStatus]],
+    ) -> None:
+        await asyncio.sleep(self._window)
+        # Events arriving while waiting for the running synchronisation are
+        # collapsed into this follow-up.
+        running = self._running.get(uuid)
+        if running is not None:
+            await asyncio.wait([running])
+        del self._pending[uuid]
+        mo_changed = uuid in self._mo_changed
+        self._mo_changed.discard(uuid)
+        self._running[uuid] = future
+        try:
+            future.set_result(await sync(mo_changed))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            if self._running.get(uuid) is future:
+                del self._running[uuid]
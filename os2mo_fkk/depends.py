@@ -4,10 +4,48 @@ from typing import Annotated
 
 from fastapi import Depends
 from fastramqpi.depends import from_user_context
+from fastramqpi.ramqp import AMQPSystem as _AMQPSystem
 from fastramqpi.ramqp.depends import from_context
 
 from os2mo_fkk.autogenerated_graphql_client import GraphQLClient as _GraphQLClient
+from os2mo_fkk.batching import SyncBatcher as _SyncBatcher
+from os2mo_fkk.config import Settings as _Settings
+from os2mo_fkk.debounce import Debouncer as _Debouncer
+from os2mo_fkk.echo import EchoRegistry as _EchoRegistry
+from os2mo_fkk.fingerprint import Fingerprints as _Fingerprints
 from os2mo_fkk.klassifikation.api import FKKAPI as _FKKAPI
+from os2mo_fkk.klassifikation.event_generator import (
+    FKKEventGenerator as _FKKEventGenerator,
+)
+from os2mo_fkk.lanes import PriorityLanes as _PriorityLanes
+from os2mo_fkk.loader import ClassLoader as _ClassLoader
+from os2mo_fkk.locks import KeyedLock as _KeyedLock
+from os2mo_fkk.mutations import MutationBatcher as _MutationBatcher
+from os2mo_fkk.prefilter import KLEPrefilter as _KLEPrefilter
+from os2mo_fkk.reconcile import Reconciler as _Reconciler
+from os2mo_fkk.tracing import InMemoryExporter as _InMemoryExporter
 
+Settings = Annotated[_Settings, Depends(from_user_context("settings"))]
 GraphQLClient = Annotated[_GraphQLClient, Depends(from_context("graphql_client"))]
 FKKAPI = Annotated[_FKKAPI, Depends(from_user_context("fkk_api"))]
+FKKAMQPSystem = Annotated[_AMQPSystem, Depends(from_user_context("fkk_amqp_system"))]
+FKKEventGenerator = Annotated[
+    _FKKEventGenerator, Depends(from_user_context("fkk_event_generator"))
+]
+ClassLoader = Annotated[_ClassLoader, Depends(from_user_context("class_loader"))]
+MutationBatcher = Annotated[
+    _MutationBatcher | None, Depends(from_user_context("mutation_batcher"))
+]
+Reconciler = Annotated[_Reconciler, Depends(from_user_context("reconciler"))]
+Fingerprints = Annotated[_Fingerprints, Depends(from_user_context("fingerprints"))]
+EchoRegistry = Annotated[_EchoRegistry, Depends(from_user_context("echo_registry"))]
+KLEPrefilter = Annotated[_KLEPrefilter, Depends(from_user_context("kle_prefilter"))]
+SyncBatcher = Annotated[_SyncBatcher | None, Depends(from_user_context("sync_batcher"))]
+Debouncer = Annotated[_Debouncer | None, Depends(from_user_context("debouncer"))]
+PriorityLanes = Annotated[
+    _PriorityLanes | None, Depends(from_user_context("priority_lanes"))
+]
+KeyedLock = Annotated[_KeyedLock, Depends(from_user_context("locks"))]
+TraceExporter = Annotated[
+    _InMemoryExporter | None, Depends(from_user_context("trace_exporter"))
+]
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import time
+from uuid import UUID
+
+from prometheus_client import Counter
+
+from os2mo_fkk.fingerprint import fingerprint
+from os2mo_fkk.models import ClassValidity
+
+suppressed_echoes = Counter(
+    "fkk_suppressed_echoes",
+    "Number of MO class events dropped because they were caused by our own writes",
+)
+
+
+class EchoRegistry:
+    def __init__(self, ttl: float) -> None:
+        """Short-lived registry of the class states recently written to MO.
+
+        Every write to MO produces one or more MO AMQP class events, which are
+        received by our own MO handler. Recording the written states allows the
+        handler to drop these echoes instead of synchronising the class again:
+        an event is an echo if the class in MO is still in the state we wrote.
+        Changes made by others since are never dropped, since the state differs.
+
+        Written states expire after `ttl` seconds, after which events are handled
+        as usual.
+        """
+        self._ttl = ttl
+        # Fingerprint of the written state and when it expires, by UUID
+        self._written: dict[UUID, tuple[str, float]] = {}
+        self._next_sweep = time.monotonic() + ttl
+
+    def record(self, uuid: UUID, state: set[ClassValidity]) -> None:
+        """Record that the class was successfully written to MO in the state."""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        self._written[uuid] = (fingerprint(state), now + self._ttl)
+
+    def expects(self, uuid: UUID) -> bool:
+        """Whether events of the class may be echoes of a recent write."""
+        return self._digest(uuid, time.monotonic()) is not None
+
+    def is_echo(self, uuid: UUID, state: set[ClassValidity]) -> bool:
+        """Determine whether an event of the class is an echo of our own write.
+
+        Args:
+            uuid: UUID of the class.
+            state: Current state of the class in MO.
+
+        Returns:
+            True if the event is an echo of our own write and should be dropped.
+        """
+        digest = self._digest(uuid, time.monotonic())
+        if digest is None or digest != fingerprint(state):
+            return False
+        suppressed_echoes.inc()
+        return True
+
+    def _digest(self, uuid: UUID, now: float) -> str | None:
+        digest, expires = self._written.get(uuid, (None, now))
+        if expires <= now:
+            self._written.pop(uuid, None)
+            return None
+        return digest
+
+    def _sweep(self, now: float) -> None:
+        """Forget expired states."""
+        self._written = {
+            uuid: (digest, expires)
+            for uuid, (digest, expires) in self._written.items()
+            if expires > now
+        }
+        self._next_sweep = now + self._ttl
@@ -1,141 +1,592 @@
 # SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
 # SPDX-License-Identifier: MPL-2.0
-from datetime import timedelta
-from enum import StrEnum
-from enum import auto
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Collection
+from contextlib import nullcontext
+from functools import partial
+from typing import Annotated
+from typing import AsyncContextManager
+from typing import TypeVar
 from uuid import UUID
 
 import structlog
+from fastapi import Depends
+from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
 from fastramqpi.ramqp import Router
-from fastramqpi.ramqp.depends import RateLimit
+from fastramqpi.ramqp.depends import Message
+from fastramqpi.ramqp.depends import get_payload_as_type
 from fastramqpi.ramqp.mo import MORouter
 from fastramqpi.ramqp.mo import PayloadUUID
 from more_itertools import one
 from more_itertools import only
+from prometheus_client import Counter
+from prometheus_client import Histogram
 
 from os2mo_fkk import depends
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
 from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.batching import SyncBatcher
+from os2mo_fkk.debounce import Debouncer
+from os2mo_fkk.echo import EchoRegistry
+from os2mo_fkk.fingerprint import Fingerprints
+from os2mo_fkk.fingerprint import fingerprint
 from os2mo_fkk.klassifikation.api import FKKAPI
-from os2mo_fkk.models import class_validity_to_create_input
-from os2mo_fkk.models import class_validity_to_update_input
-from os2mo_fkk.models import fkk_klasse_to_class_validities
-from os2mo_fkk.models import mo_class_read_to_class_validities
+from os2mo_fkk.klassifikation.models import Klasse as FKKKlasse
+from os2mo_fkk.lanes import BulkRateLimit
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.lanes import LiveRateLimit
+from os2mo_fkk.lanes import MORateLimit
+from os2mo_fkk.lanes import PriorityLanes
+from os2mo_fkk.loader import ClassLoader
+from os2mo_fkk.loader import MOClassState
+from os2mo_fkk.locks import KeyedLock
+from os2mo_fkk.mutations import MutationBatcher
+from os2mo_fkk.mutations import execute_mutations
+from os2mo_fkk.partitions import partition
+from os2mo_fkk.planner import SyncPlan
+from os2mo_fkk.planner import SyncStatus
+from os2mo_fkk.planner import actual_state
+from os2mo_fkk.planner import desired_state
+from os2mo_fkk.planner import plan_sync
+from os2mo_fkk.prefilter import KLEPrefilter
+from os2mo_fkk.tracing import span
 
 logger = structlog.stdlib.get_logger()
 
 mo_router = MORouter()
 fkk_router = Router()
 
+T = TypeVar("T")
+
+sync_stage_duration = Histogram(
+    "fkk_sync_stage_duration_seconds",
+    "Time spent in each stage of synchronising a class",
+    ["stage"],
+)
+fingerprint_hits = Counter(
+    "fkk_fingerprint_hits",
+    "Number of synchronisations skipped because the desired state was unchanged",
+)
+
+
+async def _timed(stage: str, awaitable: Awaitable[T]) -> T:
+    """Await the awaitable, recording its duration as the given sync stage."""
+    with sync_stage_duration.labels(stage).time():
+        return await awaitable
+
 
 @mo_router.register("class")
 async def mo_handler(
-    uuid: PayloadUUID, mo: depends.GraphQLClient, fkk: depends.FKKAPI, _: RateLimit
+    uuid: PayloadUUID,
+    settings: depends.Settings,
+    amqp_system: depends.FKKAMQPSystem,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    sync_batcher: depends.SyncBatcher,
+    debouncer: depends.Debouncer,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+    _: MORateLimit,
+) -> None:
+    with span("amqp.handle", routing_key="class", uuid=str(uuid)):
+        partitions = settings.fkk.partitions
+        if partitions is not None:
+            # Handled by the replica consuming the partition of the class, like its
+            # FKK changes, since locks, echoes and the prefilter are per replica
+            await amqp_system.publish_message(
+                routing_key=f"mo_change.{partition(uuid, partitions)}",
+                payload=str(uuid),
+            )
+            return
+        await _mo_event(
+            uuid,
+            mo,
+            fkk,
+            loader=loader,
+            batcher=batcher,
+            fingerprints=fingerprints,
+            echoes=echoes,
+            prefilter=prefilter,
+            sync_batcher=sync_batcher,
+            debouncer=debouncer,
+            locks=locks,
+            lanes=lanes,
+        )
+
+
+async def fkk_mo_change_handler(
+    uuid: PayloadUUID,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    sync_batcher: depends.SyncBatcher,
+    debouncer: depends.Debouncer,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+    _: MORateLimit,
+) -> None:
+    """Handle MO class events routed to a partition by the MO handler.
+
+    Registered for the consumed partitions only, see `register_partitions()`.
+    """
+    with span("amqp.handle", routing_key="mo_change", uuid=str(uuid)):
+        await _mo_event(
+            uuid,
+            mo,
+            fkk,
+            loader=loader,
+            batcher=batcher,
+            fingerprints=fingerprints,
+            echoes=echoes,
+            prefilter=prefilter,
+            sync_batcher=sync_batcher,
+            debouncer=debouncer,
+            locks=locks,
+            lanes=lanes,
+        )
+
+
+async def _mo_event(
+    uuid: UUID,
+    mo: GraphQLClient,
+    fkk: FKKAPI,
+    loader: ClassLoader,
+    batcher: MutationBatcher | None,
+    fingerprints: Fingerprints,
+    echoes: EchoRegistry,
+    prefilter: KLEPrefilter,
+    sync_batcher: SyncBatcher | None,
+    debouncer: Debouncer | None,
+    locks: KeyedLock,
+    lanes: PriorityLanes | None,
 ) -> None:
-    await sync(uuid, mo, fkk)
+    """Synchronise the class of an MO event, unless it is non-KLE or our own echo."""
+    if not await prefilter.is_relevant(mo, loader, uuid):
+        logger.info("Dropping event for non-KLE class", uuid=uuid)
+        return
+    if echoes.expects(uuid):
+        mo_class, kle_number_facet = await _read_mo(uuid, mo, loader)
+        if echoes.is_echo(uuid, actual_state(mo_class)):
+            logger.info("Dropping echo of our own write", uuid=uuid)
+            return
+    # The MO class was changed by someone else, so the fingerprint cannot be
+    # trusted
+    await _sync_event(
+        uuid,
+        mo,
+        fkk,
+        loader=loader,
+        batcher=batcher,
+        fingerprints=fingerprints,
+        echoes=echoes,
+        prefilter=prefilter,
+        sync_batcher=sync_batcher,
+        debouncer=debouncer,
+        locks=locks,
+        lanes=lanes,
+        lane=Lane.MO,
+        mo_changed=True,
+    )
 
 
 @fkk_router.register("change")
 async def fkk_handler(
-    uuid: PayloadUUID, mo: depends.GraphQLClient, fkk: depends.FKKAPI, _: RateLimit
+    uuid: PayloadUUID,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    sync_batcher: depends.SyncBatcher,
+    debouncer: depends.Debouncer,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+    _: LiveRateLimit,
 ) -> None:
-    await sync(uuid, mo, fkk)
+    with span("amqp.handle", routing_key="change", uuid=str(uuid)):
+        await _sync_event(
+            uuid,
+            mo,
+            fkk,
+            loader=loader,
+            batcher=batcher,
+            fingerprints=fingerprints,
+            echoes=echoes,
+            prefilter=prefilter,
+            sync_batcher=sync_batcher,
+            debouncer=debouncer,
+            locks=locks,
+            lanes=lanes,
+            lane=Lane.LIVE,
+        )
 
 
-class SyncStatus(StrEnum):
-    CREATE_OR_UPDATE = auto()
-    DELETE = auto()
-    UP_TO_DATE = auto()
-    WONT_DELETE = auto()
+PayloadUUIDs = Annotated[list[UUID], Depends(get_payload_as_type(list[UUID]))]
 
 
-async def sync(uuid: UUID, mo: GraphQLClient, fkk: FKKAPI) -> SyncStatus:
-    """Synchronise FKK Klasse to MO."""
+@fkk_router.register("changes")
+async def fkk_changes_handler(
+    uuids: PayloadUUIDs,
+    settings: depends.Settings,
+    mo: depends.GraphQLClient,
+    fkk: depends.FKKAPI,
+    loader: depends.ClassLoader,
+    batcher: depends.MutationBatcher,
+    fingerprints: depends.Fingerprints,
+    echoes: depends.EchoRegistry,
+    prefilter: depends.KLEPrefilter,
+    sync_batcher: depends.SyncBatcher,
+    debouncer: depends.Debouncer,
+    locks: depends.KeyedLock,
+    lanes: depends.PriorityLanes,
+    message: Message,
+    amqp_system: depends.FKKAMQPSystem,
+    _: BulkRateLimit,
+) -> None:
+    """Synchronise the classes of a multi-UUID change message concurrently.
+
+    Every class is attempted, even if some fail. The failed classes are then
+    republished in a new message, to be retried without synchronising the others
+    again, and the original message is acknowledged. If every class failed, the
+    message is rejected instead, and redelivered after the rate-limit delay.
+    """
+    failed: list[UUID] = []
+    errors: list[Exception] = []
+
+    async def sync_class(uuid: UUID) -> None:
+        try:
+            await _sync_event(
+                uuid,
+                mo,
+                fkk,
+                loader=loader,
+                batcher=batcher,
+                fingerprints=fingerprints,
+                echoes=echoes,
+                prefilter=prefilter,
+                sync_batcher=sync_batcher,
+                debouncer=debouncer,
+                locks=locks,
+                lanes=lanes,
+                lane=Lane.BULK,
+            )
+        except Exception as e:
+            failed.append(uuid)
+            errors.append(e)
+
+    with span("amqp.handle", routing_key="changes", size=len(uuids)):
+        await gather_with_concurrency(
+            settings.fkk.changes_concurrency, *(sync_class(uuid) for uuid in uuids)
+        )
+        if errors and len(errors) == len(uuids):
+            raise ExceptionGroup(f"Failed to synchronise {len(uuids)} classes", errors)
+        if failed:
+            logger.warning(
+                "Republishing failed classes",
+                uuids=failed,
+                errors=[repr(e) for e in errors],
+            )
+            assert message.routing_key is not None
+            await amqp_system.publish_message(
+                routing_key=message.routing_key,
+                payload=[str(uuid) for uuid in failed],
+            )
+
+
+async def _sync_event(
+    uuid: UUID,
+    mo: GraphQLClient,
+    fkk: FKKAPI,
+    loader: ClassLoader,
+    batcher: MutationBatcher | None,
+    fingerprints: Fingerprints,
+    echoes: EchoRegistry,
+    prefilter: KLEPrefilter,
+    sync_batcher: SyncBatcher | None,
+    debouncer: Debouncer | None,
+    locks: KeyedLock,
+    lanes: PriorityLanes | None,
+    lane: Lane,
+    mo_changed: bool = False,
+) -> None:
+    """Synchronise the class of an AMQP event, debounced and batched if enabled.
+
+    The synchronisation is scheduled in the given priority lane, if enabled. See
+    `sync()` for `mo_changed`.
+    """
+
+    async def run(mo_changed: bool) -> SyncStatus:
+        if sync_batcher is not None:
+            # The lane is held by the batch, not while waiting for it to fill up
+            return await sync_batcher.submit(
+                uuid,
+                partial(
+                    sync_batch,
+                    mo=mo,
+                    fkk=fkk,
+                    loader=loader,
+                    batcher=batcher,
+                    fingerprints=fingerprints,
+                    echoes=echoes,
+                    prefilter=prefilter,
+                    locks=locks,
+                    lanes=lanes,
+                ),
+                lane=lane,
+                mo_changed=mo_changed,
+            )
+        async with _slot(lanes, lane):
+            return await sync(
+                uuid,
+                mo,
+                fkk,
+                loader=loader,
+                batcher=batcher,
+                fingerprints=fingerprints,
+                echoes=echoes,
+                prefilter=prefilter,
+                locks=locks,
+                mo_changed=mo_changed,
+            )
+
+    if debouncer is not None:
+        await debouncer.run(uuid, run, mo_changed=mo_changed)
+    else:
+        await run(mo_changed)
+
+
+async def _read_mo(
+    uuid: UUID, mo: GraphQLClient, loader: ClassLoader | None
+) -> MOClassState:
+    """Read MO class and the UUID of the `kle_number` facet."""
+    with span("mo.read", uuid=str(uuid)):
+        if loader is not None:
+            return await loader.load(mo, uuid)
+        result = await mo.get_class_and_facet(uuid, facet_user_key="kle_number")
+        return only(result.classes.objects), one(result.facets.objects).uuid
+
+
+async def sync(
+    uuid: UUID,
+    mo: GraphQLClient,
+    fkk: FKKAPI,
+    loader: ClassLoader | None = None,
+    batcher: MutationBatcher | None = None,
+    fingerprints: Fingerprints | None = None,
+    echoes: EchoRegistry | None = None,
+    prefilter: KLEPrefilter | None = None,
+    locks: KeyedLock | None = None,
+    mo_changed: bool = False,
+) -> SyncStatus:
+    """Synchronise FKK Klasse to MO.
+
+    MO is read through the batching `loader` and mutations are written through the
+    write-behind `batcher` if given.
+
+    If `fingerprints` is given, the fingerprint of the desired state last applied
+    to MO is used to skip reading MO when the desired state has not changed since.
+    This assumes MO has not been changed by anyone else, which callers signal
+    otherwise through `mo_changed`. The fingerprint is then deleted under the lock,
+    so a concurrent synchronisation cannot write it back after reading MO from
+    before the change.
+
+    Writes are recorded in the `echoes` registry, if given, so the resulting MO
+    events can be dropped by the MO handler, and the KLE `prefilter` is updated
+    with the outcome.
+
+    Concurrent synchronisations of the same class are serialised by `locks`.
+    """
     log = logger.bind(uuid=uuid)
     log.info("Synchronising class")
 
-    # Read current state from both FKK and OS2mo
-    fkk_klasse = await fkk.read(uuid)
-    mo_classes = await mo.get_class(uuid)
-    mo_class = only(mo_classes.objects)
-    kle_number_facet = one((await mo.get_facet("kle_number")).objects).uuid
-
-    # Convert to intermediate ClassValidity objects to allow comparison
-    actual = set()
-    if mo_class is not None:
-        actual = set(mo_class_read_to_class_validities(mo_class))
-
-    desired = set()
-    if fkk_klasse is not None:
-        desired = set(
-            fkk_klasse_to_class_validities(fkk_klasse, facet=kle_number_facet)
+    async with _locked(locks, uuid):
+        known = None
+        if fingerprints is not None:
+            if mo_changed:
+                await fingerprints.delete(uuid)
+            else:
+                known = await fingerprints.get(uuid)
+
+        if known is not None:
+            # Read FKK first, since MO is not read at all if the desired state matches
+            # the fingerprint.
+            fkk_klasse = await _timed("fkk_read", fkk.read(uuid))
+            desired = desired_state(fkk_klasse, known.facet)
+            if fingerprint(desired) == known.digest:
+                log.info("Desired state matches fingerprint: nothing to do")
+                fingerprint_hits.inc()
+                if prefilter is not None:
+                    prefilter.update(uuid, relevant=bool(desired))
+                return SyncStatus.UP_TO_DATE
+            mo_class, kle_number_facet = await _timed(
+                "mo_read", _read_mo(uuid, mo, loader)
+            )
+        else:
+            # Read current state from both FKK and OS2mo. FKK is by far the slowest, so
+            # the (single) MO request is done concurrently instead of after it.
+            with sync_stage_duration.labels("read").time():
+                fkk_klasse, (mo_class, kle_number_facet) = await asyncio.gather(
+                    _timed("fkk_read", fkk.read(uuid)),
+                    _timed("mo_read", _read_mo(uuid, mo, loader)),
+                )
+        return await _apply(
+            uuid,
+            fkk_klasse,
+            mo_class,
+            kle_number_facet,
+            mo,
+            batcher=batcher,
+            fingerprints=fingerprints,
+            echoes=echoes,
+            prefilter=prefilter,
         )
 
-    if desired:
-        # TODO(#61751): MO does not support datetimes with a time. Truncate
-        # time from the validity to avoid infinite synchronisation loops.
-        desired = {d.with_validity_as_dates() for d in desired}
-
-        # TODO(#61435): MO does not support objects with a validity less than a day
-        single_day_desired = {
-            d
-            for d in desired
-            if (d.validity.end - d.validity.start) <= timedelta(days=1)
-        }
-        if single_day_desired:
-            logger.warning(
-                "Ignoring desired single-day class validities",
-                ignored=single_day_desired,
+
+async def sync_batch(
+    uuids: list[UUID],
+    mo: GraphQLClient,
+    fkk: FKKAPI,
+    loader: ClassLoader | None = None,
+    batcher: MutationBatcher | None = None,
+    fingerprints: Fingerprints | None = None,
+    echoes: EchoRegistry | None = None,
+    prefilter: KLEPrefilter | None = None,
+    locks: KeyedLock | None = None,
+    lanes: PriorityLanes | None = None,
+    lane: Lane = Lane.BULK,
+    mo_changed: Collection[UUID] = (),
+) -> list[SyncStatus | BaseException]:
+    """Synchronise multiple FKK Klasser to MO.
+
+    All classes are read in bulk from FKK and MO, instead of one request each.
+    Fingerprints are refreshed, but never used to skip reading MO, since MO is
+    read in bulk anyway. `mo_changed` are the classes changed in MO by someone
+    else. The batch is synchronised in the given priority lane, if enabled. See
+    `sync()` for the other arguments.
+
+    Returns:
+        The status, or the exception raised, for each UUID in order.
+    """
+    logger.info("Synchronising classes", uuids=uuids)
+    async with _slot(lanes, lane), _locked(locks, *uuids):
+        if fingerprints is not None:
+            # Deleted under the lock, as in `sync()`
+            for uuid in mo_changed:
+                await fingerprints.delete(uuid)
+        with sync_stage_duration.labels("read").time():
+            fkk_klasser, mo_states = await asyncio.gather(
+                _timed("fkk_read", fkk.read_list(uuids)),
+                _timed(
+                    "mo_read",
+                    asyncio.gather(*(_read_mo(uuid, mo, loader) for uuid in uuids)),
+                ),
             )
-            desired -= single_day_desired
-
-    log.info("Synchronise", actual=actual, desired=desired)
-
-    # The actual and desired state can match either if the class is equal in both
-    # systems *or* if it is missing (None) in both.
-    if actual == desired:
-        log.info("Actual state matches desired state: nothing to do")
-        return SyncStatus.UP_TO_DATE
-
-    # The FKK klasse does not exist
-    if not desired:
-        # MO class must exist or the states would be equal
-        assert mo_class is not None
-        # The UUID we are handling could be missing from FKK because it was
-        # deleted, but it could also be a class from MO that has nothing to do
-        # with FKK. We have no way to know since there is nothing in FKK
-        # (anymore), so we err on the side of caution and abort if the MO class
-        # is not under the kle_number facet. This allows us to clean-up deleted
-        # FKK classes in all cases except if someone manually moves it to a
-        # different facet between events after it was deleted from FKK.
-        mo_class_facets = {validity.facet_uuid for validity in mo_class.validities}
-        if mo_class_facets != {kle_number_facet}:
-            log.info("MO class is not KLE: won't delete")
-            return SyncStatus.WONT_DELETE
-        log.info("Deleting class from MO")
-        await mo.delete_class(uuid)
-        return SyncStatus.DELETE
-
-    # The FKK klasse exists, and we have a set of desired intermediate
-    # ClassValidity states we need to synchronise to MO. Each validity can be
-    # added to MO using either a GraphQL `class_create` or `class_update`.
-    if not actual:
-        # If the class does not already exist in MO, we select a random
-        # validity and `class_create` using it.
-        log.info("Creating new class in MO")
-        some_validity = desired.pop()
-        create_input = class_validity_to_create_input(some_validity)
-        await mo.create_class(create_input)
-    else:
-        # Otherwise, we truncate all the class's existing validities using
-        # `class_terminate`.
-        log.info("Truncating existing class validities in MO")
-        await mo.truncate_class(uuid)
-
-    # In either case, we now have a MO class to which we can `class_update` the
-    # remaining desired validities.
-    log.info("Updating class validities in MO")
-    for validity in desired:
-        update_input = class_validity_to_update_input(validity)
-        await mo.update_class(update_input)
-
-    return SyncStatus.CREATE_OR_UPDATE
+        return await asyncio.gather(
+            *(
+                _apply(
+                    uuid,
+                    fkk_klasser.get(uuid),
+                    mo_class,
+                    kle_number_facet,
+                    mo,
+                    batcher=batcher,
+                    fingerprints=fingerprints,
+                    echoes=echoes,
+                    prefilter=prefilter,
+                )
+                for uuid, (mo_class, kle_number_facet) in zip(uuids, mo_states)
+            ),
+            return_exceptions=True,
+        )
+
+
+def _locked(locks: KeyedLock | None, *uuids: UUID) -> AsyncContextManager[None]:
+    if locks is None:
+        return nullcontext()
+    return locks.lock(*uuids)
+
+
+def _slot(lanes: PriorityLanes | None, lane: Lane) -> AsyncContextManager[None]:
+    if lanes is None:
+        return nullcontext()
+    return lanes.slot(lane)
+
+
+async def _apply(
+    uuid: UUID,
+    fkk_klasse: FKKKlasse | None,
+    mo_class: MOClassValidities | None,
+    kle_number_facet: UUID,
+    mo: GraphQLClient,
+    batcher: MutationBatcher | None,
+    fingerprints: Fingerprints | None,
+    echoes: EchoRegistry | None,
+    prefilter: KLEPrefilter | None,
+) -> SyncStatus:
+    """Write the differences between the FKK Klasse and MO class to MO."""
+    execute = batcher.submit if batcher is not None else execute_mutations
+    desired = desired_state(fkk_klasse, kle_number_facet)
+
+    status, mutations = plan_sync(uuid, desired, mo_class, kle_number_facet)
+    if mutations:
+        await _timed("write", execute(mo, mutations))
+        # Echoes arriving before this are synchronised as usual, and found to be
+        # up to date.
+        if echoes is not None:
+            echoes.record(uuid, desired)
+
+    if fingerprints is not None:
+        if status == SyncStatus.WONT_DELETE:
+            # MO does not match the desired state
+            await fingerprints.delete(uuid)
+        else:
+            await fingerprints.set(uuid, kle_number_facet, desired)
+    if prefilter is not None:
+        # MO now matches the desired state, except if we won't delete the class
+        prefilter.update(uuid, relevant=bool(desired))
+    return status
+
+
+async def dry_run_sync(uuid: UUID, mo: GraphQLClient, fkk: FKKAPI) -> SyncPlan:
+    """Plan the synchronisation of FKK Klasse to MO without writing anything."""
+    durations = {}
+
+    async def timed(stage: str, awaitable: Awaitable[T]) -> T:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            durations[stage] = time.perf_counter() - start
+
+    fkk_klasse, (mo_class, kle_number_facet) = await timed(
+        "read",
+        asyncio.gather(
+            timed("fkk_read", fkk.read(uuid)),
+            timed("mo_read", _read_mo(uuid, mo, loader=None)),
+        ),
+    )
+    start = time.perf_counter()
+    desired = desired_state(fkk_klasse, kle_number_facet)
+    status, mutations = plan_sync(uuid, desired, mo_class, kle_number_facet)
+    durations["plan"] = time.perf_counter() - start
+    return SyncPlan(
+        uuid=uuid,
+        status=status,
+        mutations=mutations,
+        durations=durations,
+        # Read FKK and MO, and write all mutations in a single document
+        remote_calls=2 + (1 if mutations else 0),
+    )
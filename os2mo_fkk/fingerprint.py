@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import hashlib
+from uuid import UUID
+
+from sqlalchemy import String
+from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from os2mo_fkk.database import Base
+from os2mo_fkk.models import ClassValidity
+
+
+class Fingerprint(Base):
+    """Fingerprint of the desired state last successfully synchronised to MO."""
+
+    __tablename__ = "fingerprint"
+
+    uuid: Mapped[UUID] = mapped_column(primary_key=True)
+    # The desired state depends on the UUID of the kle_number facet in MO, so it is
+    # stored to allow computing the desired state without querying MO.
+    facet: Mapped[UUID]
+    digest: Mapped[str] = mapped_column(String(64))
+
+
+def fingerprint(desired: set[ClassValidity]) -> str:
+    """Stable hash of a set of desired ClassValidity states."""
+    lines = sorted(validity.json(sort_keys=True) for validity in desired)
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+class Fingerprints:
+    def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+        """Persistent per-UUID fingerprints of the state last applied to MO."""
+        self._sessionmaker = sessionmaker
+
+    async def get(self, uuid: UUID) -> Fingerprint | None:
+        async with self._sessionmaker() as session:
+            return await session.get(Fingerprint, uuid)
+
+    async def set(self, uuid: UUID, facet: UUID, desired: set[ClassValidity]) -> None:
+        async with self._sessionmaker() as session, session.begin():
+            await session.merge(
+                Fingerprint(uuid=uuid, facet=facet, digest=fingerprint(desired))
+            )
+
+    async def delete(self, uuid: UUID) -> None:
+        async with self._sessionmaker() as session, session.begin():
+            await session.execute(delete(Fingerprint).where(Fingerprint.uuid == uuid))
+
+    async def existing(self) -> list[UUID]:
+        """UUIDs of the classes last synchronised with a non-empty desired state.
+
+        These are the classes which existed in FKK when last synchronised.
+        """
+        async with self._sessionmaker() as session:
+            return list(
+                await session.scalars(
+                    select(Fingerprint.uuid).where(
+                        Fingerprint.digest != fingerprint(set())
+                    )
+                )
+            )
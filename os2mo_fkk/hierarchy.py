@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from collections.abc import Iterable
+from uuid import UUID
+
+import structlog
+from prometheus_client import Counter
+
+from os2mo_fkk.klassifikation.models import Klasse as FKKKlasse
+
+logger = structlog.stdlib.get_logger()
+
+deferred_classes = Counter(
+    "fkk_hierarchy_deferred_classes",
+    "Number of classes ordered after their parents in the same batch, each of which "
+    "could otherwise fail to be created and be retried",
+)
+
+
+def hierarchy_waves(klasser: dict[UUID, FKKKlasse]) -> list[list[UUID]]:
+    """Order Klasser topologically by their KLE hierarchy.
+
+    Every Klasse is placed in the wave after the last of its parents, at any
+    point in time, so parents always exist in MO before their children are
+    created. Parents not in `klasser` are assumed to already be in MO. The
+    Klasser of a wave do not depend on each other and can be synchronised in
+    parallel.
+
+    Returns:
+        The UUIDs of each wave, in order.
+    """
+    parents = {
+        uuid: {r.uuid for r in klasse.relation_overordnet if r.uuid in klasser} - {uuid}
+        for uuid, klasse in klasser.items()
+    }
+    waves: list[list[UUID]] = []
+    placed: set[UUID] = set()
+    remaining = set(klasser)
+    while remaining:
+        wave = {uuid for uuid in remaining if parents[uuid] <= placed}
+        if not wave:
+            # Cycles cannot be ordered. Synchronise them last; the failing
+            # mutations will be retried.
+            logger.warning("Cyclic KLE hierarchy", uuids=remaining)
+            wave = remaining
+        elif waves:
+            deferred_classes.inc(len(wave))
+        waves.append(sorted(wave))
+        placed |= wave
+        remaining -= wave
+    return waves
+
+
+def sync_waves(
+    uuids: Iterable[UUID], klasser: dict[UUID, FKKKlasse]
+) -> list[list[UUID]]:
+    """Order classes to be synchronised in waves by their KLE hierarchy.
+
+    See `hierarchy_waves()`. Classes not in `klasser`, i.e. not in FKK, are to be
+    deleted, and are handled in a final wave.
+    """
+    waves = hierarchy_waves(klasser)
+    deleted = sorted(set(uuids) - klasser.keys())
+    if deleted:
+        waves.append(deleted)
+    return waves
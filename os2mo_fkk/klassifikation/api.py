@@ -20,10 +20,12 @@ from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
 from lxml import etree
 
 # https://stackoverflow.com/questions/72226485/mypy-function-lxml-etree-elementtree-is-not-valid-as-a-type-but-why
 from lxml.etree import _Element as Element
+from more_itertools import chunked
 from OpenSSL.crypto import X509
 from signxml import SignatureConstructionMethod
 from signxml import XMLSigner
@@ -33,6 +35,9 @@ from os2mo_fkk.klassifikation.models import Klasse
 from os2mo_fkk.klassifikation.models import _find
 from os2mo_fkk.klassifikation.models import _findtext
 from os2mo_fkk.klassifikation.models import parse_klasse
+from os2mo_fkk.klassifikation.models import parse_klasser
+from os2mo_fkk.tracing import set_attribute
+from os2mo_fkk.tracing import span
 
 logger = structlog.stdlib.get_logger()
 
@@ -111,6 +116,20 @@ SIGNER = XMLSigner(
 SIGNER.namespaces = {None: signxml.namespaces.ds}  # type: ignore[dict-item]
 
 
+# The search endpoint supports a maximum of 500 results per page. Requesting fewer
+# elements does not seem to impact the response time (FKK is probably implemented on
+# top of LoRa).
+SEARCH_PAGE_LIMIT = 500
+
+# Maximum number of objects read in a single list request. FKK is slow enough that
+# large requests risk timing out.
+LIST_LIMIT = 100
+
+# Shards of a search of all of FKK. KLE user keys always start with the two-digit
+# main group number, e.g. `85.02.01`.
+BOOTSTRAP_USER_KEY_FILTERS = [f"{group:02}*" for group in range(100)]
+
+
 def _format_time(dt: datetime) -> str:
     """Format datetime to be serviceplatformen-compatible."""
     # The date MUST be formated like `2024-07-10T14:59:44.190Z` (UTC). The timestamp
@@ -192,40 +211,44 @@ class FKKAPI(AsyncContextManager):
         ).text = self.cert_base64
 
         # Sign the `reference_uri` elements individually
-        signed = SIGNER.sign(
-            envelope,
-            key=self.key,
-            cert=[self.cert_openssl],
-            reference_uri=[
-                "action",
-                "message-id",
-                "to",
-                "timestamp",
-                "body",
-            ],
-            key_info=TOKEN_KEY_INFO,
-        )
+        with span("fkk.sign"):
+            signed = SIGNER.sign(
+                envelope,
+                key=self.key,
+                cert=[self.cert_openssl],
+                reference_uri=[
+                    "action",
+                    "message-id",
+                    "to",
+                    "timestamp",
+                    "body",
+                ],
+                key_info=TOKEN_KEY_INFO,
+            )
         # Add the signature (with the digests of each signed element) to the header
         _find(envelope, "{*}Header/{*}Security").append(signed)
 
         # Perform SOAP request
         content: bytes = etree.tostring(envelope)
         logger.debug("Token request", content=content)
-        response = await self.client.post(
-            url=self.settings.token_url,
-            headers={
-                "Content-Type": "application/soap+xml; charset=utf-8",
-            },
-            content=content,
-        )
+        with span("fkk.http", url=self.settings.token_url):
+            response = await self.client.post(
+                url=self.settings.token_url,
+                headers={
+                    "Content-Type": "application/soap+xml; charset=utf-8",
+                },
+                content=content,
+            )
         logger.debug("Token response", text=response.text)
         response.raise_for_status()
-        return etree.fromstring(response.text)
+        with span("fkk.parse"):
+            return etree.fromstring(response.text)
 
     async def _get_token(self) -> Element:
         """Return cached token or fetch a new one if expired."""
         if self._token is None or not _is_token_valid(self._token):
-            self._token = await self._fetch_token()
+            with span("fkk.fetch_token"):
+                self._token = await self._fetch_token()
         # lxml works best with in-place modifications; return a copy to ensure the
         # cached version of the token does not get modified.
         return deepcopy(self._token)
@@ -239,9 +262,11 @@ class FKKAPI(AsyncContextManager):
         _find(envelope, "{*}Header/{*}MessageID").text = f"urn:uuid:{uuid4()}"
         _find(envelope, "{*}Header/{*}To").text = url
         _find(envelope, "{*}Header/{*}Action").text = action
-        _find(envelope, "{*}Header/{*}RequestHeader/{*}TransactionUUID").text = str(
-            uuid4()
-        )
+        transaction_uuid = str(uuid4())
+        _find(
+            envelope, "{*}Header/{*}RequestHeader/{*}TransactionUUID"
+        ).text = transaction_uuid
+        set_attribute("transaction_uuid", transaction_uuid)
         now = datetime.now(UTC)
         _find(
             envelope, "{*}Header/{*}Security/{*}Timestamp/{*}Created"
@@ -279,43 +304,47 @@ class FKKAPI(AsyncContextManager):
         key_info.append(token_reference)
 
         # Sign the `reference_uri` elements individually
-        signed = SIGNER.sign(
-            envelope,
-            key=self.key,
-            cert=[self.cert_openssl],
-            reference_uri=[
-                "action",
-                "message-id",
-                "to",
-                "timestamp",
-                "token-reference",
-                "body",
-            ],
-            key_info=key_info,
-        )
+        with span("fkk.sign"):
+            signed = SIGNER.sign(
+                envelope,
+                key=self.key,
+                cert=[self.cert_openssl],
+                reference_uri=[
+                    "action",
+                    "message-id",
+                    "to",
+                    "timestamp",
+                    "token-reference",
+                    "body",
+                ],
+                key_info=key_info,
+            )
         # Add the signature (with the digests of each signed element) to the header
         _find(envelope, "{*}Header/{*}Security").append(signed)
 
         # Perform SOAP request
         content: bytes = etree.tostring(envelope)
         logger.debug("Request", content=content)
-        response = await self.client.post(
-            url=url,
-            headers={
-                "Content-Type": f'application/soap+xml; charset=utf-8; action="{action}"',
-            },
-            content=content,
-            # The FKK API seems to be hosted on a spare Raspberry Pi Zero they also
-            # use to mine bitcoins.
-            timeout=300,
-        )
+        with span("fkk.http", url=url):
+            response = await self.client.post(
+                url=url,
+                headers={
+                    "Content-Type": f'application/soap+xml; charset=utf-8; action="{action}"',
+                },
+                content=content,
+                # The FKK API seems to be hosted on a spare Raspberry Pi Zero they also
+                # use to mine bitcoins.
+                timeout=300,
+            )
         logger.debug("Response", text=response.text)
         response.raise_for_status()
-        return etree.fromstring(response.text)
+        with span("fkk.parse"):
+            return etree.fromstring(response.text)
 
     async def _search(
         self,
         since: datetime,
+        until: datetime | None,
         page_limit: int,
         page_offset: int,
         user_key_filter: str | None,
@@ -348,6 +377,17 @@ class FKKAPI(AsyncContextManager):
             body, "{*}SoegRegistrering/{*}FraTidspunkt/{*}TidsstempelDatoTid"
         ).text = _format_time(since)
 
+        if until is not None:
+            til_tidspunkt = etree.fromstring(
+                """
+                <urn:TilTidspunkt xmlns:urn="urn:oio:sagdok:3.0.0">
+                  <urn:TidsstempelDatoTid></urn:TidsstempelDatoTid>
+                </urn:TilTidspunkt>
+                """
+            )
+            _find(til_tidspunkt, "{*}TidsstempelDatoTid").text = _format_time(until)
+            _find(body, "{*}SoegRegistrering").append(til_tidspunkt)
+
         if user_key_filter is not None:
             bvn_text = etree.fromstring(
                 """
@@ -360,11 +400,12 @@ class FKKAPI(AsyncContextManager):
             _find(body, "{*}AttributListe").append(bvn_text)
 
         # Send request
-        data = await self._request(
-            url=f"{self.settings.base_url}/klasse/7",
-            action="http://kombit.dk/sts/klassifikation/klasse/soeg",
-            body=body,
-        )
+        with span("fkk.soeg", page_offset=page_offset):
+            data = await self._request(
+                url=f"{self.settings.base_url}/klasse/7",
+                action="http://kombit.dk/sts/klassifikation/klasse/soeg",
+                body=body,
+            )
 
         # Check response status
         status_code = int(
@@ -388,23 +429,75 @@ class FKKAPI(AsyncContextManager):
             )
         }
 
-    async def get_changed_uuids(self, since: datetime) -> set[UUID]:
+    async def get_changed_uuids_page(
+        self,
+        since: datetime,
+        until: datetime | None,
+        page_offset: int,
+        user_key_filter: str | None,
+    ) -> set[UUID]:
+        """Get a single page of UUIDs changed in the provided registration window.
+
+        Pages contain at most `SEARCH_PAGE_LIMIT` UUIDs; an empty page marks the end.
+        """
+        logger.info(
+            "Getting changed UUIDs",
+            since=since,
+            until=until,
+            page_offset=page_offset,
+            user_key_filter=user_key_filter,
+        )
+        return await self._search(
+            since=since,
+            until=until,
+            page_limit=SEARCH_PAGE_LIMIT,
+            page_offset=page_offset,
+            user_key_filter=user_key_filter,
+        )
+
+    async def get_changed_uuids(
+        self, since: datetime, bootstrap: bool = False
+    ) -> set[UUID]:
         """Get the set of UUIDs which have been changed since the provided datetime.
 
         We only search KLE Emneplan (00000c7e-face-4001-8000-000000000000).
+
+        Args:
+            since: Registration time to search from.
+            bootstrap: Search all of FKK, e.g. on the first run. The search is sharded
+                on `BrugervendtNoegleTekst` prefixes, which are paginated concurrently.
         """
-        # The endpoint supports a maximum of 500 results per page. Requesting fewer
-        # elements does not seem to impact the response time (FKK is probably
-        # implemented on top of LoRa).
-        page_limit = 500
+        user_key_filter = self.settings.changed_uuids_user_key_filter
+        if not bootstrap or user_key_filter is not None:
+            return await self._get_changed_uuids(since, user_key_filter)
+        shards = await gather_with_concurrency(
+            self.settings.search_concurrency,
+            *(
+                self._get_changed_uuids(since, shard)
+                for shard in BOOTSTRAP_USER_KEY_FILTERS
+            ),
+        )
+        return set().union(*shards)
+
+    async def get_uuids(self, user_key_filter: str) -> set[UUID]:
+        """Get the UUIDs of all Klasser matching the `BrugervendtNoegleTekst` filter.
+
+        The filter supports wildcards such as `85.02*`.
+        """
+        return await self._get_changed_uuids(
+            datetime.min.replace(tzinfo=UTC), user_key_filter
+        )
+
+    async def _get_changed_uuids(
+        self, since: datetime, user_key_filter: str | None
+    ) -> set[UUID]:
         changed = set()
-        for page_offset in count(step=page_limit):
-            logger.info("Getting changed UUIDs", since=since, page_offset=page_offset)
-            page = await self._search(
+        for page_offset in count(step=SEARCH_PAGE_LIMIT):
+            page = await self.get_changed_uuids_page(
                 since=since,
-                page_limit=page_limit,
+                until=None,
                 page_offset=page_offset,
-                user_key_filter=self.settings.changed_uuids_user_key_filter,
+                user_key_filter=user_key_filter,
             )
             if not page:
                 break
@@ -430,11 +523,12 @@ class FKKAPI(AsyncContextManager):
         _find(body, "{*}UUIDIdentifikator").text = str(uuid)
 
         # Send request
-        data = await self._request(
-            url=f"{self.settings.base_url}/klasse/7",
-            action="http://kombit.dk/sts/klassifikation/klasse/laes",
-            body=body,
-        )
+        with span("fkk.laes", uuid=str(uuid)):
+            data = await self._request(
+                url=f"{self.settings.base_url}/klasse/7",
+                action="http://kombit.dk/sts/klassifikation/klasse/laes",
+                body=body,
+            )
 
         # Check response status
         status_code = int(
@@ -457,4 +551,88 @@ class FKKAPI(AsyncContextManager):
         raw = await self.read_raw(uuid)
         if raw is None:
             return None
-        return parse_klasse(raw)
+        with span("fkk.parse_klasse"):
+            return parse_klasse(raw)
+
+    async def read_list_raw(self, uuids: list[UUID]) -> Element | None:
+        """Read multiple objects in a single request."""
+        # Construct list body
+        body = etree.fromstring(
+            """
+            <ListInput xmlns="http://stoettesystemerne.dk/klassifikation/klasse/7/" xmlns:urn="urn:oio:sagdok:3.0.0">
+              <urn:VirkningFraFilter>
+                <urn:GraenseIndikator>true</urn:GraenseIndikator>
+              </urn:VirkningFraFilter>
+              <urn:VirkningTilFilter>
+                <urn:GraenseIndikator>true</urn:GraenseIndikator>
+              </urn:VirkningTilFilter>
+            </ListInput>
+            """
+        )
+        # The UUIDs must precede the filters
+        for uuid in reversed(uuids):
+            uuid_identifikator = etree.Element(
+                "{urn:oio:sagdok:3.0.0}UUIDIdentifikator"
+            )
+            uuid_identifikator.text = str(uuid)
+            body.insert(0, uuid_identifikator)
+
+        # Send request
+        with span("fkk.list", count=len(uuids)):
+            data = await self._request(
+                url=f"{self.settings.base_url}/klasse/7",
+                action="http://kombit.dk/sts/klassifikation/klasse/list",
+                body=body,
+            )
+
+        # Check response status
+        status_code = int(
+            _findtext(data, "{*}Body/{*}ListOutput/{*}StandardRetur/{*}StatusKode")
+        )
+        # 44: Requested object not found
+        if status_code == 44:
+            return None
+        # 20: Success
+        if status_code != 20:  # pragma: no cover
+            message = _find(
+                data, "{*}Body/{*}ListOutput/{*}StandardRetur/{*}FejlbeskedTekst"
+            ).text
+            raise LookupError(f"{status_code=} {message}")
+
+        return _find(data, "{*}Body/{*}ListOutput")
+
+    async def read_list_outputs(self, uuids: list[UUID]) -> list[Element]:
+        """Read multiple objects, falling back to reading them one by one.
+
+        StatusKode 44 only tells us that some of the requested objects were not
+        found, so which of them exist is unknown. In that case, each object is read
+        in a list request of its own.
+
+        Returns:
+            The `ListOutput` of every request which found any objects.
+        """
+        raw = await self.read_list_raw(uuids)
+        if raw is not None:
+            return [raw]
+        if len(uuids) == 1:
+            return []
+        logger.info("Objects missing from list request", count=len(uuids))
+        raws = await gather_with_concurrency(
+            self.settings.search_concurrency,
+            *(self.read_list_raw([uuid]) for uuid in uuids),
+        )
+        return [raw for raw in raws if raw is not None]
+
+    async def read_list(self, uuids: list[UUID]) -> dict[UUID, Klasse]:
+        """Read and parse multiple objects.
+
+        Objects which do not exist in FKK are not included in the result.
+        """
+        klasser = {}
+        for chunk in chunked(uuids, LIST_LIMIT):
+            for raw in await self.read_list_outputs(chunk):
+                with span("fkk.parse_klasser"):
+                    klasser.update(
+                        {klasse.uuid: klasse for klasse in parse_klasser(raw)}
+                    )
+        return klasser
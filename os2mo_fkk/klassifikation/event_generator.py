@@ -4,13 +4,16 @@ import asyncio
 from contextlib import suppress
 from datetime import UTC
 from datetime import datetime
+from datetime import timedelta
 from typing import AsyncContextManager
 from typing import Self
 
 import structlog
 from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
-from fastramqpi.ramqp import AMQPSystem
+from prometheus_client import Gauge
+from prometheus_client import Histogram
 from sqlalchemy import DateTime
+from sqlalchemy import delete
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
@@ -19,10 +22,29 @@ from sqlalchemy.orm import mapped_column
 
 from os2mo_fkk.config import FKKSettings
 from os2mo_fkk.database import Base
+from os2mo_fkk.klassifikation.api import BOOTSTRAP_USER_KEY_FILTERS
 from os2mo_fkk.klassifikation.api import FKKAPI
+from os2mo_fkk.klassifikation.api import SEARCH_PAGE_LIMIT
+from os2mo_fkk.klassifikation.outbox import OutboxEntry
+from os2mo_fkk.klassifikation.outbox import OutboxPublisher
+from os2mo_fkk.leader import LeaderLease
 
 logger = structlog.stdlib.get_logger()
 
+polling_interval = Gauge(
+    "fkk_event_generator_interval_seconds",
+    "Current interval between event generator runs",
+)
+run_changes = Histogram(
+    "fkk_event_generator_changes",
+    "Number of changed UUIDs found per event generator run",
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000),
+)
+
+
+# Start of the registration time window searched by the first run
+BOOTSTRAP_SINCE = datetime.min.replace(tzinfo=UTC)
+
 
 class LastRun(Base):
     __tablename__ = "last_run"
@@ -31,20 +53,67 @@ class LastRun(Base):
     datetime: Mapped[datetime] = mapped_column(DateTime(timezone=True))
 
 
+class Checkpoint(Base):
+    """Progress of a shard of an unfinished event-generation iteration."""
+
+    __tablename__ = "checkpoint"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Registration time window searched
+    since: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    until: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    user_key_filter: Mapped[str | None]
+    # Offset of the next page to fetch, and the number of UUIDs outboxed so far
+    page_offset: Mapped[int]
+    published: Mapped[int]
+    done: Mapped[bool]
+
+    def __repr__(self) -> str:
+        return (
+            f"Checkpoint(since={self.since}, until={self.until}, "
+            f"user_key_filter={self.user_key_filter}, "
+            f"page_offset={self.page_offset}, published={self.published}, "
+            f"done={self.done})"
+        )
+
+
+class LeadershipLost(Exception):
+    pass
+
+
+def next_interval(
+    interval: float, changes: int, min_interval: float, max_interval: float
+) -> float:
+    """Adapt the polling interval to the changes found by the last run.
+
+    Poll more often while runs keep finding changes, such as after a KLE release,
+    and back off while nothing changes.
+    """
+    if changes:
+        return max(interval / 2, min_interval)
+    return min(interval * 2, max_interval)
+
+
 class FKKEventGenerator(AsyncContextManager):
     def __init__(
         self,
         settings: FKKSettings,
         api: FKKAPI,
-        amqp_system: AMQPSystem,
+        outbox: OutboxPublisher,
+        lease: LeaderLease,
         sessionmaker: async_sessionmaker[AsyncSession],
     ) -> None:
-        """Periodically poll FKK for new Klasser based on LastRun in the database."""
+        """Periodically poll FKK for new Klasser based on LastRun in the database.
+
+        Only the replica holding the lease polls FKK; the others wait to take over.
+        """
         self._settings = settings
         self._api = api
-        self._amqp_system = amqp_system
+        self._outbox = outbox
+        self._lease = lease
         self._sessionmaker = sessionmaker
         self._scheduler_task: asyncio.Task | None = None
+        self._triggered = asyncio.Event()
 
     async def __aenter__(self) -> Self:
         """Start event generator."""
@@ -60,47 +129,198 @@ class FKKEventGenerator(AsyncContextManager):
         with suppress(asyncio.CancelledError):
             await self._scheduler_task
 
+    @property
+    def is_leader(self) -> bool:
+        return self._lease.is_leader
+
+    def trigger(self) -> None:
+        """Run the event generator now, instead of waiting for the interval."""
+        self._triggered.set()
+
     async def _scheduler(self) -> None:
         """Async task which will run as long as the event-generator is started."""
         logger.info("Starting event-generator")
+        interval: float = self._settings.min_interval
         while True:
             try:
-                await self._generate()
-                await asyncio.sleep(self._settings.interval)
+                changes = await self._generate_as_leader()
+                run_changes.observe(changes)
+                interval = next_interval(
+                    interval,
+                    changes,
+                    min_interval=self._settings.min_interval,
+                    max_interval=self._settings.interval,
+                )
+                polling_interval.set(interval)
+                await self._sleep(interval)
             except asyncio.CancelledError:
                 logger.info("Stopping event-generator")
                 raise
+            except LeadershipLost:
+                # The iteration is resumed from its checkpoints by the new leader
+                logger.warning("Lost leadership during event generation")
             except Exception:  # pragma: no cover
                 logger.exception("Failed to generate events")
-                await asyncio.sleep(30)
+                await self._sleep(30)
+
+    async def _generate_as_leader(self) -> int:
+        """Wait for leadership and run an iteration, cancelled if it is lost."""
+        if not self._lease.is_leader:
+            logger.info("Waiting for leadership")
+            await self._lease.wait_leader()
+        generate = asyncio.create_task(self._generate())
+        lost = asyncio.create_task(self._lease.wait_follower())
+        try:
+            await asyncio.wait({generate, lost}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lost.cancel()
+            if not generate.done():
+                generate.cancel()
+                with suppress(asyncio.CancelledError):
+                    await generate
+        if generate.cancelled():
+            raise LeadershipLost()
+        return generate.result()
 
-    async def _generate(self) -> None:
-        """One event-generation iteration. Publishes changed UUIDs since last run."""
+    async def _sleep(self, interval: float) -> None:
+        """Sleep for the interval, or until triggered."""
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._triggered.wait(), interval)
+        self._triggered.clear()
+
+    async def _generate(self) -> int:
+        """One event-generation iteration. Outboxes changed UUIDs since last run.
+
+        The search is split into shards, each with its own checkpoint. Progress is
+        checkpointed after every page, so an interrupted iteration, such as the
+        hours-long first run, resumes where it stopped.
+        """
         logger.info("Generating events")
-        async with self._sessionmaker() as session, session.begin():
-            # Get last run time from database
+        checkpoints = await self._get_or_create_checkpoints()
+        await gather_with_concurrency(
+            self._settings.search_concurrency,
+            *(self._search(c) for c in checkpoints if not c.done),
+        )
+
+        # Update last run time in database and finish the iteration
+        async with self._session() as session, session.begin():
             last_run = await session.scalar(select(LastRun))
             if last_run is None:
-                last_run = LastRun(datetime=datetime.min.replace(tzinfo=UTC))
+                last_run = LastRun()
+            last_run.datetime = max(c.until for c in checkpoints)
+            session.add(last_run)
+            await session.execute(delete(Checkpoint))
+        changes = sum(c.published for c in checkpoints)
+        logger.info("Generated events", published=changes)
+        return changes
 
+    async def _search(self, checkpoint: Checkpoint) -> None:
+        """Publish all changed UUIDs of a single shard."""
+        logger.info("Searching", checkpoint=checkpoint)
+        while True:
             # Fetch changed UUIDs from FKK
-            now = datetime.now(UTC)
-            changed = await self._api.get_changed_uuids(since=last_run.datetime)
-            logger.info("Changes", uuids=changed)
-
-            # Publish changes to internal AMQP exchange
-            publish_tasks = [
-                self._amqp_system.publish_message(
-                    routing_key="change",
-                    payload=str(uuid),
+            changed = sorted(
+                await self._api.get_changed_uuids_page(
+                    since=checkpoint.since,
+                    until=checkpoint.until,
+                    page_offset=checkpoint.page_offset,
+                    user_key_filter=checkpoint.user_key_filter,
+                )
+            )
+            if changed:
+                logger.info("Changes", uuids=changed)
+
+            # Write changes to the outbox, to be published to the internal AMQP
+            # exchange, and checkpoint progress in the same transaction.
+            async with self._session() as session, session.begin():
+                session.add_all(OutboxEntry(uuid=uuid) for uuid in changed)
+                merged = await session.merge(checkpoint)
+                merged.page_offset += SEARCH_PAGE_LIMIT
+                merged.published += len(changed)
+                merged.done = not changed
+            # Keep the caller's object, which is used to report the totals
+            checkpoint.page_offset = merged.page_offset
+            checkpoint.published = merged.published
+            checkpoint.done = merged.done
+            if changed:
+                self._outbox.notify()
+            if checkpoint.done:
+                logger.info("Shard done", checkpoint=checkpoint)
+                return
+
+    def _shards(self, bootstrap: bool) -> list[str | None]:
+        """User key filters splitting the search of an iteration into shards.
+
+        The first run searches all of FKK, which is split into a shard per KLE
+        main group to be paginated concurrently.
+        """
+        user_key_filter = self._settings.changed_uuids_user_key_filter
+        if user_key_filter is not None:
+            return [user_key_filter]
+        if bootstrap:
+            return list(BOOTSTRAP_USER_KEY_FILTERS)
+        return [None]
+
+    async def _get_or_create_checkpoints(self) -> list[Checkpoint]:
+        """Resume unfinished iteration, or start a new one from the last run."""
+        async with self._session() as session, session.begin():
+            checkpoints = list(await session.scalars(select(Checkpoint)))
+            if checkpoints:
+                if self._is_resumable(checkpoints):
+                    return checkpoints
+                # The search changed, so the checkpoints cannot be resumed
+                logger.warning("Discarding checkpoints", checkpoints=checkpoints)
+                await session.execute(delete(Checkpoint))
+
+            last_run = await session.scalar(select(LastRun))
+            # The window is closed at the start of the iteration, so pages do not
+            # shift while the search is paginated.
+            until = datetime.now(UTC)
+            if last_run is None:
+                windows = [(BOOTSTRAP_SINCE, until)]
+            else:
+                windows = self._windows(last_run.datetime, until)
+            checkpoints = [
+                Checkpoint(
+                    since=since,
+                    until=until,
+                    user_key_filter=user_key_filter,
+                    page_offset=0,
+                    published=0,
+                    done=False,
                 )
-                for uuid in changed
+                for since, until in windows
+                for user_key_filter in self._shards(bootstrap=last_run is None)
             ]
-            await gather_with_concurrency(100, *publish_tasks)
+            session.add_all(checkpoints)
+        return checkpoints
 
-            # Update last run time in database
-            last_run.datetime = now
-            session.add(last_run)
+    def _windows(
+        self, since: datetime, until: datetime
+    ) -> list[tuple[datetime, datetime]]:
+        """Split the registration time window of an incremental search.
+
+        Catching up after downtime is bounded by the number of concurrent shards,
+        instead of a single paginated search of every change in the meantime.
+        """
+        step = timedelta(seconds=self._settings.search_window)
+        windows = []
+        while until - since > step:
+            windows.append((since, since + step))
+            since += step
+        windows.append((since, until))
+        return windows
+
+    def _is_resumable(self, checkpoints: list[Checkpoint]) -> bool:
+        user_key_filters = {c.user_key_filter for c in checkpoints}
+        return user_key_filters in (
+            set(self._shards(bootstrap=False)),
+            set(self._shards(bootstrap=True)),
+        )
+
+    def _session(self) -> AsyncSession:
+        # The checkpoint is used across sessions, so it must not be expired
+        return self._sessionmaker(expire_on_commit=False)
 
     async def get_last_run(self) -> datetime | None:
         """External interface to retrieve last run."""
@@ -86,12 +86,27 @@ def _parse_virkning(virkning: Element) -> Virkning:
 
 
 def parse_klasse(element: Element) -> Klasse:
-    # UUID
-    uuid = _findtext(
-        element, "{*}FiltreretOejebliksbillede/{*}ObjektID/{*}UUIDIdentifikator"
+    """Parse Klasse from LaesOutput."""
+    return parse_filtreret_oejebliksbillede(
+        _find(element, "{*}FiltreretOejebliksbillede")
     )
 
-    registrering = _find(element, "{*}FiltreretOejebliksbillede/{*}Registrering")
+
+def parse_klasser(element: Element) -> list[Klasse]:
+    """Parse Klasser from ListOutput."""
+    return [
+        parse_filtreret_oejebliksbillede(filtreret_oejebliksbillede)
+        for filtreret_oejebliksbillede in element.iterfind(
+            "{*}FiltreretOejebliksbillede"
+        )
+    ]
+
+
+def parse_filtreret_oejebliksbillede(element: Element) -> Klasse:
+    # UUID
+    uuid = _findtext(element, "{*}ObjektID/{*}UUIDIdentifikator")
+
+    registrering = _find(element, "{*}Registrering")
 
     # AttributListe/Egenskab
     def parse_egenskab(egenskab: Element) -> Egenskab:
@@ -0,0 +1,169 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from contextlib import suppress
+from typing import AsyncContextManager
+from typing import Self
+from uuid import UUID
+
+import structlog
+from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
+from fastramqpi.ramqp import AMQPSystem
+from more_itertools import bucket
+from more_itertools import chunked
+from prometheus_client import Gauge
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from os2mo_fkk.database import Base
+from os2mo_fkk.partitions import partition
+
+logger = structlog.stdlib.get_logger()
+
+outbox_depth = Gauge(
+    "fkk_outbox_depth",
+    "Number of changed UUIDs waiting to be published to the FKK AMQP exchange",
+)
+
+
+class OutboxEntry(Base):
+    """Changed UUID found by the event generator."""
+
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    uuid: Mapped[UUID]
+    sent: Mapped[bool] = mapped_column(default=False, index=True)
+
+
+class OutboxPublisher(AsyncContextManager):
+    def __init__(
+        self,
+        amqp_system: AMQPSystem,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        batch_size: int = 500,
+        interval: float = 10,
+        message_size: int | None = None,
+        partitions: int | None = None,
+    ) -> None:
+        """Publish the changed UUIDs written to the outbox by the event generator.
+
+        The event generator writes changed UUIDs to the outbox in the same
+        transaction as its checkpoint, so searching and publishing are decoupled
+        and a restart only publishes the UUIDs not yet sent. The outbox is drained
+        in batches whenever notified, and every `interval` seconds.
+
+        UUIDs are published as a `change` message each, or, if `message_size` is
+        given, as `changes` messages of up to that many UUIDs. If `partitions` is
+        given, the UUID's partition is appended to the routing key, e.g. `change.3`.
+        """
+        self._amqp_system = amqp_system
+        self._sessionmaker = sessionmaker
+        self._batch_size = batch_size
+        self._interval = interval
+        self._message_size = message_size
+        self._partitions = partitions
+        self._notified = asyncio.Event()
+        self._publisher_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        """Start publisher."""
+        self._publisher_task = asyncio.create_task(self._publisher())
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Stop publisher."""
+        assert self._publisher_task is not None
+        self._publisher_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._publisher_task
+
+    def notify(self) -> None:
+        """Notify the publisher of new entries in the outbox."""
+        self._notified.set()
+
+    async def _publisher(self) -> None:
+        logger.info("Starting outbox publisher")
+        while True:
+            try:
+                while await self._publish_batch():
+                    pass
+                await self._purge()
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self._notified.wait(), self._interval)
+                self._notified.clear()
+            except asyncio.CancelledError:
+                logger.info("Stopping outbox publisher")
+                raise
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to publish outbox")
+                await asyncio.sleep(30)
+
+    async def _publish_batch(self) -> int:
+        """Publish and mark the oldest batch of unsent entries as sent.
+
+        Returns:
+            The number of entries published.
+        """
+        async with self._sessionmaker() as session, session.begin():
+            entries = list(
+                await session.scalars(
+                    select(OutboxEntry)
+                    .where(OutboxEntry.sent.is_(False))
+                    .order_by(OutboxEntry.id)
+                    .limit(self._batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            # A batch is published again if we crash before marking it as sent,
+            # which is harmless.
+            if self._message_size is None:
+                publish_tasks = [
+                    self._amqp_system.publish_message(
+                        routing_key=self._routing_key("change", entry.uuid),
+                        payload=str(entry.uuid),
+                    )
+                    for entry in entries
+                ]
+            else:
+                # Messages contain UUIDs of a single partition
+                by_routing_key = bucket(
+                    entries, key=lambda e: self._routing_key("changes", e.uuid)
+                )
+                publish_tasks = [
+                    self._amqp_system.publish_message(
+                        routing_key=routing_key,
+                        payload=[str(entry.uuid) for entry in chunk],
+                    )
+                    for routing_key in by_routing_key
+                    for chunk in chunked(
+                        by_routing_key[routing_key], self._message_size
+                    )
+                ]
+            await gather_with_concurrency(100, *publish_tasks)
+            for entry in entries:
+                entry.sent = True
+            depth = await session.scalar(
+                select(func.count()).where(OutboxEntry.sent.is_(False))
+            )
+        outbox_depth.set(depth or 0)
+        if entries:
+            logger.info("Published outbox batch", published=len(entries), depth=depth)
+        return len(entries)
+
+    def _routing_key(self, routing_key: str, uuid: UUID) -> str:
+        if self._partitions is None:
+            return routing_key
+        return f"{routing_key}.{partition(uuid, self._partitions)}"
+
+    async def _purge(self) -> None:
+        """Delete entries which have been sent."""
+        async with self._sessionmaker() as session, session.begin():
+            await session.execute(delete(OutboxEntry).where(OutboxEntry.sent))
@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextlib import suppress
+from enum import StrEnum
+from enum import auto
+from typing import Annotated
+
+from fastapi import Depends
+from fastramqpi.ramqp.depends import rate_limit
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+
+class Lane(StrEnum):
+    # Changes published by the FKK event generator
+    LIVE = auto()
+    # Class events from MO
+    MO = auto()
+    # Multi-UUID change messages and full reconciliations
+    BULK = auto()
+
+
+# Failing messages are retried sooner in the interactive lanes than in the bulk lane
+LiveRateLimit = Annotated[None, Depends(rate_limit(10))]
+MORateLimit = Annotated[None, Depends(rate_limit(30))]
+BulkRateLimit = Annotated[None, Depends(rate_limit(120))]
+
+waiting = Gauge(
+    "fkk_lane_waiting",
+    "Number of synchronisations waiting for capacity",
+    ["lane"],
+)
+wait_duration = Histogram(
+    "fkk_lane_wait_seconds",
+    "Time spent waiting for capacity to synchronise a class",
+    ["lane"],
+)
+
+
+class PriorityLanes:
+    def __init__(self, concurrency: int, weights: dict[Lane, int]) -> None:
+        """Weighted scheduling of synchronisations across priority lanes.
+
+        At most `concurrency` synchronisations, each of a class or a micro-batch of
+        classes, run at a time. When capacity
+        frees up and several lanes are waiting, the next lane is chosen by smooth
+        weighted round-robin, so e.g. with weights 6, 3 and 1 a large backfill in
+        the bulk lane gets a tenth of the capacity while live changes are waiting,
+        but all of it otherwise.
+        """
+        self._concurrency = concurrency
+        self._weights = weights
+        self._running = 0
+        self._waiters: dict[Lane, deque[asyncio.Future[None]]] = {
+            lane: deque() for lane in weights
+        }
+        # Current weights of the smooth weighted round-robin
+        self._current = dict.fromkeys(weights, 0)
+
+    @asynccontextmanager
+    async def slot(self, lane: Lane) -> AsyncIterator[None]:
+        """Wait for capacity in the lane, and hold it while synchronising."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(future)
+        waiting.labels(lane.value).inc()
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Capacity was granted just before cancellation; pass it on
+                self._release()
+            else:
+                with suppress(ValueError):
+                    self._waiters[lane].remove(future)
+                waiting.labels(lane.value).dec()
+            raise
+        wait_duration.labels(lane.value).observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free capacity to the waiting lanes, by weight."""
+        while self._running < self._concurrency:
+            lanes = [lane for lane, waiters in self._waiters.items() if waiters]
+            if not lanes:
+                return
+            lane = self._next_lane(lanes)
+            future = self._waiters[lane].popleft()
+            if future.cancelled():
+                continue
+            waiting.labels(lane.value).dec()
+            self._running += 1
+            future.set_result(None)
+
+    def _next_lane(self, lanes: list[Lane]) -> Lane:
+        total = sum(self._weights[lane] for lane in lanes)
+        for lane in lanes:
+            self._current[lane] += self._weights[lane]
+        lane = max(lanes, key=lambda lane: self._current[lane])
+        self._current[lane] -= total
+        return lane
@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from datetime import timedelta
+from typing import AsyncContextManager
+from typing import Self
+from uuid import uuid4
+
+import structlog
+from prometheus_client import Gauge
+from sqlalchemy import DateTime
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from os2mo_fkk.database import Base
+
+logger = structlog.stdlib.get_logger()
+
+leader = Gauge(
+    "fkk_leader",
+    "Whether this replica holds the lease",
+    ["name"],
+)
+
+
+class Lease(Base):
+    """Lease held by the leader of a group of replicas."""
+
+    __tablename__ = "lease"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    holder: Mapped[str]
+    expires: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class LeaderLease(AsyncContextManager):
+    def __init__(
+        self, sessionmaker: async_sessionmaker[AsyncSession], name: str, ttl: float
+    ) -> None:
+        """Elect a single leader among the replicas using a lease row.
+
+        Every replica tries to acquire or renew the lease every `ttl / 3` seconds.
+        The lease is held until it expires `ttl` seconds after the last renewal, so
+        if the leader dies, another replica takes over automatically. The lease is
+        released when exiting, so failover is immediate on a clean shutdown.
+        Expiry is based on the database clock to be independent of clock skew
+        between replicas.
+        """
+        self._sessionmaker = sessionmaker
+        self._name = name
+        self._ttl = ttl
+        self._holder = str(uuid4())
+        self._leader = asyncio.Event()
+        self._follower = asyncio.Event()
+        self._follower.set()
+        self._renewer_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        """Start campaigning for leadership."""
+        await self._campaign()
+        self._renewer_task = asyncio.create_task(self._renewer())
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Stop campaigning for leadership and release the lease."""
+        assert self._renewer_task is not None
+        self._renewer_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._renewer_task
+        if self.is_leader:
+            self._set_leader(False)
+            async with self._sessionmaker() as session, session.begin():
+                await session.execute(
+                    delete(Lease).where(
+                        Lease.name == self._name, Lease.holder == self._holder
+                    )
+                )
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader.is_set()
+
+    async def wait_leader(self) -> None:
+        """Wait until this replica is the leader."""
+        await self._leader.wait()
+
+    async def wait_follower(self) -> None:
+        """Wait until this replica is no longer the leader."""
+        await self._follower.wait()
+
+    async def _renewer(self) -> None:
+        while True:
+            await asyncio.sleep(self._ttl / 3)
+            await self._campaign()
+
+    async def _campaign(self) -> None:
+        try:
+            acquired = await self._acquire()
+        except Exception:
+            # Step down; the lease may expire before we can renew it
+            logger.exception("Failed to renew lease", name=self._name)
+            acquired = False
+        self._set_leader(acquired)
+
+    async def _acquire(self) -> bool:
+        """Acquire or renew the lease, if it is free or already ours."""
+        try:
+            async with self._sessionmaker() as session, session.begin():
+                now = (await session.execute(select(func.now()))).scalar_one()
+                lease = await session.get(Lease, self._name, with_for_update=True)
+                if lease is None:
+                    lease = Lease(name=self._name)
+                    session.add(lease)
+                elif lease.holder != self._holder and lease.expires > now:
+                    return False
+                lease.holder = self._holder
+                lease.expires = now + timedelta(seconds=self._ttl)
+        except IntegrityError:
+            # Another replica created the lease concurrently
+            return False
+        return True
+
+    def _set_leader(self, is_leader: bool) -> None:
+        if is_leader == self.is_leader:
+            return
+        logger.info("Leadership changed", name=self._name, is_leader=is_leader)
+        leader.labels(self._name).set(is_leader)
+        if is_leader:
+            self._follower.clear()
+            self._leader.set()
+        else:
+            self._leader.clear()
+            self._follower.set()
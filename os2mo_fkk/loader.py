@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from uuid import UUID
+
+import structlog
+from more_itertools import chunked
+from more_itertools import one
+from prometheus_client import Histogram
+
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+
+logger = structlog.stdlib.get_logger()
+
+load_batch_size = Histogram(
+    "fkk_class_loader_batch_size",
+    "Number of MO classes fetched per batched lookup",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+
+MOClassState = tuple[MOClassValidities | None, UUID]
+
+
+class ClassLoader:
+    def __init__(self, max_batch_size: int = 100) -> None:
+        """Batch concurrent MO class lookups into a single request.
+
+        Lookups made in the same iteration of the event loop, e.g. by a group of
+        concurrent synchronisations, are collected and fetched from MO using one
+        `get_classes` query, like a GraphQL dataloader.
+        """
+        self._max_batch_size = max_batch_size
+        self._pending: dict[UUID, asyncio.Future[MOClassState]] = {}
+        self._mo: GraphQLClient | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, mo: GraphQLClient, uuid: UUID) -> MOClassState:
+        """Load MO class and the UUID of the `kle_number` facet.
+
+        Returns:
+            The MO class, or None if it does not exist, and the kle_number facet UUID.
+        """
+        future = self._pending.get(uuid)
+        if future is None:
+            if not self._pending:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[uuid] = future
+            self._mo = mo
+        # Shield the shared future from cancellation of a single caller
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        """Fetch all pending lookups from MO."""
+        pending, self._pending = self._pending, {}
+        assert self._mo is not None
+        for batch in chunked(pending.items(), self._max_batch_size):
+            task = asyncio.create_task(self._fetch(self._mo, dict(batch)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(
+        self, mo: GraphQLClient, batch: dict[UUID, asyncio.Future[MOClassState]]
+    ) -> None:
+        load_batch_size.observe(len(batch))
+        try:
+            result = await mo.get_classes(
+                list(batch.keys()), facet_user_key="kle_number"
+            )
+            kle_number_facet = one(result.facets.objects).uuid
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        mo_classes = {mo_class.uuid: mo_class for mo_class in result.classes.objects}
+        for uuid, future in batch.items():
+            future.set_result((mo_classes.get(uuid), kle_number_facet))
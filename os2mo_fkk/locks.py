@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack
+from contextlib import asynccontextmanager
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class KeyedLock:
+    def __init__(self) -> None:
+        """Serialise synchronisations per class, in-process.
+
+        Two concurrent synchronisations of the same class could otherwise
+        interleave their truncate and update mutations. Different classes are
+        synchronised in parallel.
+        """
+        # Lock and number of tasks holding or waiting for it, by UUID
+        self._locks: dict[UUID, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def lock(self, *uuids: UUID) -> AsyncIterator[None]:
+        """Lock the given classes.
+
+        Locks are acquired in sorted order to avoid deadlocks between tasks
+        locking overlapping sets of classes.
+        """
+        async with AsyncExitStack() as stack:
+            for uuid in sorted(set(uuids)):
+                await stack.enter_async_context(self._lock(uuid))
+            yield
+
+    @asynccontextmanager
+    async def _lock(self, uuid: UUID) -> AsyncIterator[None]:
+        lock, users = self._locks.get(uuid, (asyncio.Lock(), 0))
+        self._locks[uuid] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[uuid]
+            if users == 1:
+                del self._locks[uuid]
+            else:
+                self._locks[uuid] = (lock, users - 1)
+
+
+def advisory_lock_key(uuid: UUID) -> int:
+    """Convert UUID to a (signed, 64-bit) PostgreSQL advisory lock key."""
+    return int.from_bytes(uuid.bytes[:8], byteorder="big", signed=True)
+
+
+class AdvisoryKeyedLock(KeyedLock):
+    def __init__(self, engine: AsyncEngine, max_connections: int) -> None:
+        """Serialise synchronisations per class across all replicas.
+
+        Uses session-level PostgreSQL advisory locks, held on a connection in
+        autocommit mode, so no transaction is kept open while synchronising. The
+        locks are released automatically if the connection is lost.
+
+        The in-process lock is taken first, so each replica holds at most one
+        connection per class, and at most `max_connections` connections in total.
+        This must be below the size of the connection pool, to leave connections
+        for the synchronisations themselves.
+        """
+        super().__init__()
+        self._engine = engine
+        self._connections = asyncio.Semaphore(max_connections)
+
+    @asynccontextmanager
+    async def lock(self, *uuids: UUID) -> AsyncIterator[None]:
+        keys = sorted({advisory_lock_key(uuid) for uuid in uuids})
+        async with (
+            super().lock(*uuids),
+            self._connections,
+            self._engine.connect() as connection,
+        ):
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            try:
+                for key in keys:
+                    await connection.execute(
+                        text("SELECT pg_advisory_lock(:key)"), {"key": key}
+                    )
+                yield
+            finally:
+                try:
+                    for key in keys:
+                        await connection.execute(
+                            text("SELECT pg_advisory_unlock(:key)"), {"key": key}
+                        )
+                except BaseException:
+                    # Closing the connection releases its locks
+                    await connection.invalidate()
+                    raise
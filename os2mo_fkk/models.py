@@ -18,11 +18,9 @@ from os2mo_fkk.autogenerated_graphql_client import (
 from os2mo_fkk.autogenerated_graphql_client import (
     ClassUpdateInput as MOClassUpdateInput,
 )
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
 from os2mo_fkk.autogenerated_graphql_client import (
-    GetClassClassesObjects as MOGetClassClassesObjects,
-)
-from os2mo_fkk.autogenerated_graphql_client.get_class import (
-    GetClassClassesObjectsValiditiesValidity,
+    ClassValiditiesValiditiesValidity as MOValidity,
 )
 from os2mo_fkk.autogenerated_graphql_client.input_types import ValidityInput
 from os2mo_fkk.klassifikation.models import HasVirking as HasFKKVirkning
@@ -39,7 +37,7 @@ class Validity(StrictBaseModel):
     end: datetime
 
     @classmethod
-    def from_mo(cls, mo: GetClassClassesObjectsValiditiesValidity) -> Self:
+    def from_mo(cls, mo: MOValidity) -> Self:
         """MO uses None for infinity."""
         return cls(
             start=mo.from_ or NEGATIVE_INFINITY,
@@ -155,7 +153,7 @@ def fkk_klasse_to_class_validities(
 
 
 def mo_class_read_to_class_validities(
-    mo_class: MOGetClassClassesObjects,
+    mo_class: MOClassValidities,
 ) -> Iterator[ClassValidity]:
     """Convert MO GraphQL Class object to ClassValidity intermediate objects."""
     for validity in mo_class.validities:
@@ -166,7 +164,7 @@ def mo_class_read_to_class_validities(
         if validity_to is not None:
             assert validity_to.time() == time.min
             validity_to += timedelta(days=1)
-        fixed_validity = GetClassClassesObjectsValiditiesValidity(
+        fixed_validity = MOValidity(
             from_=validity.validity.from_,
             to=validity_to,
         )
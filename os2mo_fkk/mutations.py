@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from enum import StrEnum
+from enum import auto
+from typing import AsyncContextManager
+from typing import Self
+from uuid import UUID
+
+import structlog
+from prometheus_client import Histogram
+
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClientGraphQLMultiError
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import class_validity_to_create_input
+from os2mo_fkk.models import class_validity_to_update_input
+from os2mo_fkk.tracing import span
+from os2mo_fkk.util import StrictBaseModel
+
+logger = structlog.stdlib.get_logger()
+
+batch_size = Histogram(
+    "fkk_mutation_batch_size",
+    "Number of mutations written to MO per write-behind batch",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+batch_flush_duration = Histogram(
+    "fkk_mutation_batch_flush_duration_seconds",
+    "Time spent writing a write-behind batch to MO",
+)
+
+
+class ClassMutationKind(StrEnum):
+    CREATE = auto()
+    TERMINATE = auto()
+    UPDATE = auto()
+    DELETE = auto()
+
+
+class ClassMutation(StrictBaseModel):
+    """A single planned MO GraphQL class mutation.
+
+    `validity` is required for CREATE and UPDATE, and ignored otherwise.
+    """
+
+    kind: ClassMutationKind
+    uuid: UUID
+    validity: ClassValidity | None = None
+
+
+# Variable type and field template for each kind of mutation. The TERMINATE
+# template MUST match the `truncate_class` mutation in queries.graphql.
+MUTATION_FIELDS = {
+    ClassMutationKind.CREATE: ("ClassCreateInput!", "class_create(input: ${var})"),
+    ClassMutationKind.TERMINATE: (
+        "UUID!",
+        'class_terminate(input: {{uuid: ${var}, from: "0001-01-02", to: "9999-12-30"}})',
+    ),
+    ClassMutationKind.UPDATE: ("ClassUpdateInput!", "class_update(input: ${var})"),
+    ClassMutationKind.DELETE: ("UUID!", "class_delete(uuid: ${var})"),
+}
+
+
+def _variable(mutation: ClassMutation) -> object:
+    """Convert mutation to its GraphQL variable value."""
+    match mutation.kind:
+        case ClassMutationKind.CREATE:
+            assert mutation.validity is not None
+            return class_validity_to_create_input(mutation.validity)
+        case ClassMutationKind.UPDATE:
+            assert mutation.validity is not None
+            return class_validity_to_update_input(mutation.validity)
+        case ClassMutationKind.TERMINATE | ClassMutationKind.DELETE:
+            return mutation.uuid
+
+
+def build_document(mutations: list[ClassMutation]) -> tuple[str, dict[str, object]]:
+    """Build a single GraphQL document executing all the mutations in order.
+
+    Each mutation is added as an aliased top-level field. The GraphQL specification
+    mandates that top-level mutation fields are executed serially, in order.
+    """
+    definitions = []
+    fields = []
+    variables: dict[str, object] = {}
+    for i, mutation in enumerate(mutations):
+        var = f"m{i}"
+        type_, template = MUTATION_FIELDS[mutation.kind]
+        definitions.append(f"${var}: {type_}")
+        fields.append(f"  {var}: {template.format(var=var)} {{ uuid }}")
+        variables[var] = _variable(mutation)
+    query = "\n".join(
+        [f"mutation class_mutations({', '.join(definitions)}) {{", *fields, "}"]
+    )
+    return query, variables
+
+
+async def execute_mutations(
+    mo: GraphQLClient, mutations: list[ClassMutation]
+) -> list[UUID]:
+    """Execute mutations in a single round trip to MO.
+
+    Returns:
+        The UUID returned by each mutation, in order.
+    """
+    if not mutations:
+        return []
+    logger.info("Executing mutations", mutations=mutations)
+    query, variables = build_document(mutations)
+    with span(
+        "mo.write",
+        mutations=[f"{mutation.kind}:{mutation.uuid}" for mutation in mutations],
+    ):
+        response = await mo.execute(query=query, variables=variables)
+    # Raises on errors in *any* of the mutations. Mutations before the failing one
+    # will have been applied, but since synchronisation is idempotent, the entire
+    # synchronisation can safely be retried.
+    data = mo.get_data(response)
+    return [UUID(data[f"m{i}"]["uuid"]) for i in range(len(mutations))]
+
+
+class MutationBatcher(AsyncContextManager):
+    def __init__(self, window: float, max_size: int) -> None:
+        """Write-behind batching of mutations from many classes.
+
+        Mutations submitted by concurrent synchronisations are collected for up to
+        `window` seconds, or until there are at least `max_size` of them, and written
+        to MO in a single GraphQL document. If some of the mutations fail, only
+        their submitters fail.
+        """
+        self._window = window
+        self._max_size = max_size
+        self._batch: list[tuple[list[ClassMutation], asyncio.Future[list[UUID]]]] = []
+        self._batch_size = 0
+        self._mo: GraphQLClient | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Flush pending mutations and wait for in-flight batches."""
+        self._flush()
+        await asyncio.gather(*self._flushes)
+
+    async def submit(
+        self, mo: GraphQLClient, mutations: list[ClassMutation]
+    ) -> list[UUID]:
+        """Execute mutations as part of the next batch.
+
+        The mutations of a single call are kept together and in order, so the
+        semantics are the same as `execute_mutations()`. Returns once the batch has
+        been written to MO.
+        """
+        if not mutations:
+            return []
+        future: asyncio.Future[list[UUID]] = asyncio.get_running_loop().create_future()
+        self._mo = mo
+        self._batch.append((mutations, future))
+        self._batch_size += len(mutations)
+        if self._batch_size >= self._max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._window, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        """Start writing the current batch to MO."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch:
+            return
+        assert self._mo is not None
+        task = asyncio.create_task(self._write(self._mo, self._batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+        self._batch = []
+        self._batch_size = 0
+
+    async def _write(
+        self,
+        mo: GraphQLClient,
+        batch: list[tuple[list[ClassMutation], asyncio.Future[list[UUID]]]],
+    ) -> None:
+        mutations = [mutation for submitted, _ in batch for mutation in submitted]
+        batch_size.observe(len(mutations))
+        try:
+            with batch_flush_duration.time():
+                results = await execute_mutations(mo, mutations)
+        except GraphQLClientGraphQLMultiError as e:
+            logger.exception("Failed to write part of batch", size=len(mutations))
+            self._distribute_errors(batch, e)
+            return
+        except Exception as e:
+            # We cannot know which of the mutations were applied, so every waiting
+            # synchronisation fails. They are all idempotent, and will be retried.
+            logger.exception("Failed to write batch", size=len(mutations))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Distribute the results back to each submitter
+        offset = 0
+        for submitted, future in batch:
+            if not future.done():
+                future.set_result(results[offset : offset + len(submitted)])
+            offset += len(submitted)
+
+    @staticmethod
+    def _distribute_errors(
+        batch: list[tuple[list[ClassMutation], asyncio.Future[list[UUID]]]],
+        error: GraphQLClientGraphQLMultiError,
+    ) -> None:
+        """Fail only the submitters whose mutations failed.
+
+        Every mutation is a top-level field of its own, which MO executes even if
+        others fail, so errors are attributed to submitters by the alias in their
+        path. Errors without a path, such as for an invalid document, fail every
+        submitter.
+        """
+        unattributed = any(not e.path for e in error.errors)
+        offset = 0
+        for submitted, future in batch:
+            aliases = [f"m{offset + i}" for i in range(len(submitted))]
+            offset += len(submitted)
+            if future.done():
+                continue
+            errors = [e for e in error.errors if e.path and e.path[0] in aliases]
+            data = [(error.data or {}).get(alias) for alias in aliases]
+            if errors:
+                future.set_exception(
+                    GraphQLClientGraphQLMultiError(errors=errors, data=error.data)
+                )
+            elif unattributed or None in data:
+                future.set_exception(error)
+            else:
+                future.set_result([UUID(error.data[a]["uuid"]) for a in aliases])
@@ -0,0 +1,40 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from functools import wraps
+from typing import Any
+from uuid import UUID
+
+from fastramqpi.ramqp import Router
+from fastramqpi.ramqp.utils import CallbackType
+
+
+def partition(uuid: UUID, partitions: int) -> int:
+    """Consistently hash the UUID to one of the partitions.
+
+    Uses jump consistent hashing, so changing the number of partitions only moves
+    the minimal number of UUIDs to a different partition.
+    """
+    key = uuid.int & 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < partitions:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (1 << 31) / ((key >> 33) + 1))
+    return b
+
+
+def register_partitions(
+    router: Router, handler: CallbackType, routing_key: str, partitions: list[int]
+) -> None:
+    """Register the handler for the given partitions of the routing key.
+
+    Each partition is consumed from its own queue, named after the handler.
+    """
+    for p in partitions:
+
+        @wraps(handler)
+        async def partition_handler(*args: Any, **kwargs: Any) -> None:
+            await handler(*args, **kwargs)
+
+        partition_handler.__name__ = f"{handler.__name__}_partition_{p}"
+        router.register(f"{routing_key}.{p}")(partition_handler)
@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from datetime import timedelta
+from enum import StrEnum
+from enum import auto
+from uuid import UUID
+
+import structlog
+from pydantic import BaseModel
+
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
+from os2mo_fkk.klassifikation.models import Klasse as FKKKlasse
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import fkk_klasse_to_class_validities
+from os2mo_fkk.models import mo_class_read_to_class_validities
+from os2mo_fkk.mutations import ClassMutation
+from os2mo_fkk.mutations import ClassMutationKind
+
+logger = structlog.stdlib.get_logger()
+
+
+class SyncStatus(StrEnum):
+    CREATE_OR_UPDATE = auto()
+    DELETE = auto()
+    UP_TO_DATE = auto()
+    WONT_DELETE = auto()
+
+
+class SyncPlan(BaseModel):
+    """Outcome of a dry-run synchronisation."""
+
+    uuid: UUID
+    status: SyncStatus
+    mutations: list[ClassMutation]
+    # Duration of each stage, in seconds
+    durations: dict[str, float]
+    # Number of requests to FKK and MO a real synchronisation would make
+    remote_calls: int
+
+
+def desired_state(
+    fkk_klasse: FKKKlasse | None, kle_number_facet: UUID
+) -> set[ClassValidity]:
+    """Convert FKK Klasse to the set of ClassValidity states desired in MO."""
+    if fkk_klasse is None:
+        return set()
+    # TODO(#61751): MO does not support datetimes with a time. Truncate time from
+    # the validity to avoid infinite synchronisation loops.
+    desired = {
+        d.with_validity_as_dates()
+        for d in fkk_klasse_to_class_validities(fkk_klasse, facet=kle_number_facet)
+    }
+
+    # TODO(#61435): MO does not support objects with a validity less than a day
+    single_day_desired = {
+        d for d in desired if (d.validity.end - d.validity.start) <= timedelta(days=1)
+    }
+    if single_day_desired:
+        logger.warning(
+            "Ignoring desired single-day class validities",
+            ignored=single_day_desired,
+        )
+        desired -= single_day_desired
+    return desired
+
+
+def actual_state(mo_class: MOClassValidities | None) -> set[ClassValidity]:
+    """Convert MO class to the set of its ClassValidity states."""
+    if mo_class is None:
+        return set()
+    return set(mo_class_read_to_class_validities(mo_class))
+
+
+def plan_sync(
+    uuid: UUID,
+    desired: set[ClassValidity],
+    mo_class: MOClassValidities | None,
+    kle_number_facet: UUID,
+) -> tuple[SyncStatus, list[ClassMutation]]:
+    """Plan the MO mutations required to bring the MO class to the desired state.
+
+    See `desired_state()` for the conversion from FKK Klasse.
+    """
+    log = logger.bind(uuid=uuid)
+
+    # Convert to intermediate ClassValidity objects to allow comparison
+    actual = actual_state(mo_class)
+    log.info("Synchronise", actual=actual, desired=desired)
+
+    # The actual and desired state can match either if the class is equal in both
+    # systems *or* if it is missing (None) in both.
+    if actual == desired:
+        log.info("Actual state matches desired state: nothing to do")
+        return SyncStatus.UP_TO_DATE, []
+
+    # The FKK klasse does not exist
+    if not desired:
+        # MO class must exist or the states would be equal
+        assert mo_class is not None
+        # The UUID we are handling could be missing from FKK because it was
+        # deleted, but it could also be a class from MO that has nothing to do
+        # with FKK. We have no way to know since there is nothing in FKK
+        # (anymore), so we err on the side of caution and abort if the MO class
+        # is not under the kle_number facet. This allows us to clean-up deleted
+        # FKK classes in all cases except if someone manually moves it to a
+        # different facet between events after it was deleted from FKK.
+        mo_class_facets = {validity.facet_uuid for validity in mo_class.validities}
+        if mo_class_facets != {kle_number_facet}:
+            log.info("MO class is not KLE: won't delete")
+            return SyncStatus.WONT_DELETE, []
+        log.info("Deleting class from MO")
+        delete = ClassMutation(kind=ClassMutationKind.DELETE, uuid=uuid)
+        return SyncStatus.DELETE, [delete]
+
+    # The FKK klasse exists, and we have a set of desired intermediate
+    # ClassValidity states we need to synchronise to MO. Each validity can be
+    # added to MO using either a GraphQL `class_create` or `class_update`.
+    mutations = []
+    if not actual:
+        # If the class does not already exist in MO, we select a random
+        # validity and `class_create` using it.
+        log.info("Creating new class in MO")
+        some_validity = next(iter(desired))
+        desired = desired - {some_validity}
+        mutations.append(
+            ClassMutation(
+                kind=ClassMutationKind.CREATE, uuid=uuid, validity=some_validity
+            )
+        )
+    else:
+        # Otherwise, we truncate all the class's existing validities using
+        # `class_terminate`.
+        log.info("Truncating existing class validities in MO")
+        mutations.append(ClassMutation(kind=ClassMutationKind.TERMINATE, uuid=uuid))
+
+    # In either case, we now have a MO class to which we can `class_update` the
+    # remaining desired validities.
+    log.info("Updating class validities in MO")
+    mutations.extend(
+        ClassMutation(kind=ClassMutationKind.UPDATE, uuid=uuid, validity=validity)
+        for validity in desired
+    )
+
+    # All mutations are sent in a single, ordered, GraphQL document to avoid a
+    # round trip to MO for each validity.
+    return SyncStatus.CREATE_OR_UPDATE, mutations
@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from contextlib import suppress
+from typing import AsyncContextManager
+from typing import Self
+from uuid import UUID
+
+import structlog
+from fastramqpi.context import Context
+from prometheus_client import Counter
+
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.fingerprint import Fingerprints
+from os2mo_fkk.loader import ClassLoader
+from os2mo_fkk.reconcile import get_mo_kle_classes
+
+logger = structlog.stdlib.get_logger()
+
+prefiltered_events = Counter(
+    "fkk_prefiltered_events",
+    "Number of MO class events dropped because the class is not KLE",
+)
+
+
+class KLEPrefilter(AsyncContextManager):
+    def __init__(self, fingerprints: Fingerprints, context: Context) -> None:
+        """In-memory set of KLE class UUIDs used to discard irrelevant MO events.
+
+        MO emits events for all classes, but only the ones under the `kle_number`
+        facet, or known from FKK, are relevant to us. The set is built in the
+        background at startup from MO, using the GraphQL client of the FastRAMQPI
+        `context`, and the classes known from FKK through their `fingerprints`,
+        which are shared by all replicas, so FKK itself is not searched. It is
+        then kept up to date by synchronisation. Until it is ready, all events are
+        considered relevant.
+        """
+        self._fingerprints = fingerprints
+        self._context = context
+        self._uuids: set[UUID] = set()
+        # Classes found irrelevant by synchronisation while building
+        self._removed: set[UUID] = set()
+        self._ready = False
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        """Start building the set."""
+        self._task = asyncio.create_task(self._build(self._context["graphql_client"]))
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Stop building the set."""
+        assert self._task is not None
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def _build(self, mo: GraphQLClient) -> None:
+        logger.info("Building KLE prefilter")
+        try:
+            (mo_classes, _), fkk_uuids = await asyncio.gather(
+                get_mo_kle_classes(mo), self._fingerprints.existing()
+            )
+        except Exception:
+            # Stay open. The filter is only an optimisation.
+            logger.exception("Failed to build KLE prefilter")
+            return
+        # Synchronisation while building is more recent than what was read
+        self._uuids |= (mo_classes.keys() | fkk_uuids) - self._removed
+        self._removed.clear()
+        self._ready = True
+        logger.info("Built KLE prefilter", size=len(self._uuids))
+
+    def update(self, uuid: UUID, relevant: bool) -> None:
+        """Update the set after synchronising the class."""
+        if relevant:
+            self._uuids.add(uuid)
+            self._removed.discard(uuid)
+        else:
+            self._uuids.discard(uuid)
+            if not self._ready:
+                self._removed.add(uuid)
+
+    async def is_relevant(
+        self, mo: GraphQLClient, loader: ClassLoader, uuid: UUID
+    ) -> bool:
+        """Determine whether a MO class event should be synchronised.
+
+        Classes not in the set may have been created or moved under the
+        `kle_number` facet by someone else, so they are checked in MO, which is
+        much cheaper than reading FKK.
+        """
+        if not self._ready or uuid in self._uuids:
+            return True
+        mo_class, kle_number_facet = await loader.load(mo, uuid)
+        if mo_class is not None and any(
+            validity.facet_uuid == kle_number_facet for validity in mo_class.validities
+        ):
+            self._uuids.add(uuid)
+            return True
+        prefiltered_events.inc()
+        return False
@@ -0,0 +1,214 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections import Counter
+from contextlib import suppress
+from datetime import UTC
+from datetime import datetime
+from enum import StrEnum
+from enum import auto
+from typing import AsyncContextManager
+from typing import Self
+from uuid import UUID
+
+import structlog
+from fastramqpi.ra_utils.asyncio_utils import gather_with_concurrency
+from more_itertools import chunked
+from more_itertools import one
+from pydantic import BaseModel
+
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.batching import SyncBatch
+from os2mo_fkk.hierarchy import sync_waves
+from os2mo_fkk.klassifikation.api import FKKAPI
+from os2mo_fkk.klassifikation.api import LIST_LIMIT
+from os2mo_fkk.klassifikation.models import Klasse as FKKKlasse
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.planner import SyncStatus
+from os2mo_fkk.planner import desired_state
+from os2mo_fkk.planner import plan_sync
+from os2mo_fkk.util import NEGATIVE_INFINITY
+
+logger = structlog.stdlib.get_logger()
+
+
+async def get_mo_kle_classes(
+    mo: GraphQLClient,
+) -> tuple[dict[UUID, MOClassValidities], UUID]:
+    """Fetch all MO classes under the `kle_number` facet.
+
+    Returns:
+        The MO classes by UUID, and the kle_number facet UUID.
+    """
+    mo_classes: dict[UUID, MOClassValidities] = {}
+    cursor = None
+    while True:
+        result = await mo.get_facet_classes(
+            facet_user_key="kle_number", cursor=cursor, limit=500
+        )
+        mo_classes.update({c.uuid: c for c in result.classes.objects})
+        cursor = result.classes.page_info.next_cursor
+        if cursor is None:
+            break
+    kle_number_facet = one(result.facets.objects).uuid
+    return mo_classes, kle_number_facet
+
+
+class ReconciliationState(StrEnum):
+    IDLE = auto()
+    RUNNING = auto()
+    FINISHED = auto()
+    FAILED = auto()
+
+
+class ReconciliationProgress(BaseModel):
+    state: ReconciliationState = ReconciliationState.IDLE
+    started: datetime | None = None
+    finished: datetime | None = None
+    # Number of classes in MO and FKK. The same class is usually in both.
+    mo_total: int = 0
+    fkk_total: int = 0
+    # Number of distinct classes to reconcile, and how many have been so far
+    total: int = 0
+    processed: int = 0
+    failed: int = 0
+    # Classes are reconciled in waves, one for each level of the KLE hierarchy
+    waves: int = 0
+    waves_processed: int = 0
+    statuses: dict[SyncStatus, int] = {}
+
+
+class Reconciler(AsyncContextManager):
+    def __init__(self, fkk: FKKAPI) -> None:
+        """Full reconciliation of all KLE classes between FKK and MO.
+
+        Instead of synchronising each class individually, all classes are read in
+        bulk from both systems and compared in memory. Only the classes which
+        differ are synchronised, in bulk through `sync_batch`, in the bulk priority
+        lane.
+
+        The bulk snapshot may be long outdated by the time a class is synchronised,
+        so it only decides which classes to synchronise, and in which order. Each
+        class is read again under its lock, like any other synchronisation.
+        """
+        self._fkk = fkk
+        self.progress = ReconciliationProgress()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        """Stop running reconciliation."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, mo: GraphQLClient, sync_batch: SyncBatch) -> None:
+        """Start reconciliation in the background."""
+        assert not self.running
+        self.progress = ReconciliationProgress(
+            state=ReconciliationState.RUNNING,
+            started=datetime.now(UTC),
+        )
+        self._task = asyncio.create_task(self._run(mo, sync_batch))
+
+    async def _run(self, mo: GraphQLClient, sync_batch: SyncBatch) -> None:
+        try:
+            await self.reconcile(mo, sync_batch)
+        except Exception:
+            logger.exception("Reconciliation failed")
+            self.progress.state = ReconciliationState.FAILED
+        else:
+            self.progress.state = ReconciliationState.FINISHED
+        self.progress.finished = datetime.now(UTC)
+
+    async def reconcile(self, mo: GraphQLClient, sync_batch: SyncBatch) -> None:
+        """Reconcile all KLE classes."""
+        progress = self.progress
+        statuses: Counter[SyncStatus] = Counter()
+        logger.info("Reconciling all classes")
+
+        # Read everything from MO and the UUIDs of everything in FKK
+        mo_classes, kle_number_facet = await get_mo_kle_classes(mo)
+        fkk_uuids = await self._fkk.get_changed_uuids(
+            since=NEGATIVE_INFINITY, bootstrap=True
+        )
+        progress.mo_total = len(mo_classes)
+        progress.fkk_total = len(fkk_uuids)
+
+        # Classes only in MO are also read from FKK, since a KLE class missing from
+        # the search results could be caused by `changed_uuids_user_key_filter`.
+        uuids = sorted(fkk_uuids | mo_classes.keys())
+        progress.total = len(uuids)
+        logger.info("Reconciling", progress=progress)
+
+        # Read all classes from FKK first, to allow ordering them by hierarchy
+        fkk_klasser: dict[UUID, FKKKlasse] = {}
+
+        async def read_chunk(chunk: list[UUID]) -> None:
+            fkk_klasser.update(await self._fkk.read_list(chunk))
+
+        await gather_with_concurrency(
+            4, *(read_chunk(chunk) for chunk in chunked(uuids, LIST_LIMIT))
+        )
+
+        # Classes already matching FKK are done
+        changed = []
+        for uuid in uuids:
+            status, mutations = plan_sync(
+                uuid=uuid,
+                desired=desired_state(fkk_klasser.get(uuid), kle_number_facet),
+                mo_class=mo_classes.get(uuid),
+                kle_number_facet=kle_number_facet,
+            )
+            if mutations:
+                changed.append(uuid)
+            else:
+                statuses[status] += 1
+                progress.processed += 1
+        progress.statuses = dict(statuses)
+
+        # Parents are created before their children, so no mutations fail because
+        # the parent does not exist (yet). Classes not in FKK are to be deleted, and
+        # are handled last.
+        waves = sync_waves(
+            changed, {u: fkk_klasser[u] for u in changed if u in fkk_klasser}
+        )
+        progress.waves = len(waves)
+        logger.info("Reconciling", progress=progress)
+
+        async def reconcile_chunk(chunk: list[UUID]) -> None:
+            # MO differs from FKK, so fingerprints cannot be trusted
+            try:
+                results = await sync_batch(chunk, mo_changed=set(chunk), lane=Lane.BULK)
+            except Exception as e:
+                logger.exception("Failed to reconcile classes", uuids=chunk)
+                results = [e] * len(chunk)
+            for uuid, result in zip(chunk, results):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        "Failed to reconcile class", uuid=uuid, exc_info=result
+                    )
+                    progress.failed += 1
+                else:
+                    statuses[result] += 1
+                progress.processed += 1
+
+        for wave in waves:
+            await gather_with_concurrency(
+                4, *(reconcile_chunk(chunk) for chunk in chunked(wave, LIST_LIMIT))
+            )
+            progress.waves_processed += 1
+            progress.statuses = dict(statuses)
+            logger.info("Reconciling", progress=progress)
+        logger.info("Reconciliation finished", progress=progress)
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import AbstractContextManager
+from contextlib import contextmanager
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import UTC
+from datetime import datetime
+from typing import Any
+from typing import AsyncContextManager
+from typing import Protocol
+from typing import Self
+from uuid import UUID
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+
+class Span(BaseModel):
+    """A timed operation, in the style of OpenTelemetry.
+
+    Spans started while another span is active become its children, also across
+    tasks created in the meantime, and share its trace ID.
+    """
+
+    name: str
+    trace_id: UUID
+    span_id: UUID
+    parent_id: UUID | None
+    start: datetime
+    duration: float | None = None  # seconds
+    attributes: dict[str, Any] = {}
+    error: str | None = None
+
+
+class Exporter(Protocol):
+    def export(self, span: Span) -> None:  # pragma: no cover
+        ...
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_exporters: list[Exporter] = []
+
+
+def span(name: str, **attributes: Any) -> AbstractContextManager[Span | None]:
+    """Trace the enclosed code as a span, exported when it ends.
+
+    Nothing is traced while there are no exporters, so tracing is free when
+    disabled.
+    """
+    if not _exporters:
+        return nullcontext()
+    return _span(name, attributes)
+
+
+@contextmanager
+def _span(name: str, attributes: dict[str, Any]) -> Iterator[Span]:
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent is not None else uuid4(),
+        span_id=uuid4(),
+        parent_id=parent.span_id if parent is not None else None,
+        start=datetime.now(UTC),
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        for exporter in _exporters:
+            exporter.export(current)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set attribute on the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+class InMemoryExporter(AsyncContextManager):
+    def __init__(self, max_spans: int) -> None:
+        """Keep the most recent spans in memory, for inspection without a collector.
+
+        Spans are only exported while the exporter is entered.
+        """
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+
+    async def __aenter__(self) -> Self:
+        _exporters.append(self)
+        return self
+
+    async def __aexit__(
+        self, __exc_type: object, __exc_value: object, __traceback: object
+    ) -> None:
+        _exporters.remove(self)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def traces(self) -> dict[UUID, list[Span]]:
+        """Group the exported spans by trace, in the order they were started."""
+        traces: dict[UUID, list[Span]] = {}
+        for s in sorted(self.spans, key=lambda s: s.start):
+            traces.setdefault(s.trace_id, []).append(s)
+        return traces
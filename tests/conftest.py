@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections import defaultdict
+from typing import Any
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+from os2mo_fkk import events
+from os2mo_fkk.autogenerated_graphql_client import ClassValidities as MOClassValidities
+from os2mo_fkk.autogenerated_graphql_client.fragments import ClassValiditiesValidities
+from os2mo_fkk.autogenerated_graphql_client.fragments import (
+    ClassValiditiesValiditiesValidity,
+)
+from os2mo_fkk.fingerprint import Fingerprint
+from os2mo_fkk.fingerprint import fingerprint
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import Validity
+from os2mo_fkk.mutations import ClassMutation
+from os2mo_fkk.mutations import ClassMutationKind
+from os2mo_fkk.util import NEGATIVE_INFINITY
+from os2mo_fkk.util import POSITIVE_INFINITY
+
+KLE_NUMBER_FACET = uuid4()
+
+
+def compile_sql(statement: Any) -> str:
+    return str(
+        statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+class FakeSession:
+    def __init__(self, database: "FakeDatabase") -> None:
+        self.database = database
+
+    async def __aenter__(self) -> "FakeSession":
+        if self.database.down:
+            raise ConnectionError("database is down")
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        pass
+
+    def begin(self) -> "FakeSession":
+        return self
+
+    def add(self, row: Any) -> None:
+        if row not in self.database.rows[type(row)]:
+            self.database.rows[type(row)].append(row)
+
+    def add_all(self, rows: Any) -> None:
+        for row in rows:
+            self.add(row)
+
+    async def merge(self, row: Any) -> Any:
+        self.add(row)
+        return row
+
+    async def get(self, entity: type, key: Any, **kwargs: Any) -> Any:
+        return self.database.get(entity, key, **kwargs)
+
+    async def scalars(self, statement: Any) -> list[Any]:
+        self.database.statements.append(compile_sql(statement))
+        return self.database.scalars(statement)
+
+    async def scalar(self, statement: Any) -> Any:
+        self.database.statements.append(compile_sql(statement))
+        return self.database.scalar(statement)
+
+    async def execute(self, statement: Any) -> Any:
+        self.database.statements.append(compile_sql(statement))
+        return self.database.execute(statement)
+
+
+class FakeDatabase:
+    def __init__(self, *rows: Any) -> None:
+        """In-memory stand-in for the sessionmaker, keeping the rows by table.
+
+        The executed statements are recorded as SQL. Queries are answered with all
+        rows of the selected table, and deletes delete all rows of the table;
+        subclasses answer the queries of the code under test more precisely.
+        """
+        self.rows: dict[type, list[Any]] = defaultdict(list)
+        for row in rows:
+            self.rows[type(row)].append(row)
+        self.statements: list[str] = []
+        self.down = False
+
+    def __call__(self, **kwargs: Any) -> FakeSession:
+        return FakeSession(self)
+
+    def get(self, entity: type, key: Any, **kwargs: Any) -> Any:
+        mapper: Any = inspect(entity)
+        primary_key = mapper.primary_key[0].key
+        return next(
+            (row for row in self.rows[entity] if getattr(row, primary_key) == key),
+            None,
+        )
+
+    def scalars(self, statement: Any) -> list[Any]:
+        return list(self.rows[statement.column_descriptions[0]["entity"]])
+
+    def scalar(self, statement: Any) -> Any:
+        return next(iter(self.scalars(statement)), None)
+
+    def execute(self, statement: Any) -> Any:
+        assert statement.is_delete
+        self.rows[statement.entity_description["entity"]].clear()
+
+
+def class_validity(
+    uuid: UUID, name: str, facet: UUID = KLE_NUMBER_FACET
+) -> ClassValidity:
+    return ClassValidity(
+        facet=facet,
+        validity=Validity(start=NEGATIVE_INFINITY, end=POSITIVE_INFINITY),
+        uuid=uuid,
+        user_key="00.01",
+        name=name,
+        parent=None,
+    )
+
+
+class FakeFKK:
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """FKK holding the desired state of each class.
+
+        The states stand in for the FKK Klasser, as converted by `desired_state()`.
+        """
+        monkeypatch.setattr(
+            events, "desired_state", lambda klasse, facet: set(klasse or ())
+        )
+        self.klasser: dict[UUID, set[ClassValidity]] = {}
+        self.reads: list[UUID] = []
+
+    async def read(self, uuid: UUID) -> Any:
+        self.reads.append(uuid)
+        return self.klasser.get(uuid)
+
+    async def read_list(self, uuids: list[UUID]) -> dict[UUID, Any]:
+        self.reads.extend(uuids)
+        return {uuid: self.klasser[uuid] for uuid in uuids if uuid in self.klasser}
+
+
+class FakeMO:
+    def __init__(self) -> None:
+        """MO holding the state of each class, read as by the `ClassLoader`.
+
+        Mutations submitted as to the `MutationBatcher` are applied to the states;
+        mutations of the `failing` classes fail the write. Reads wait for `read_gate`
+        after reading the state, to allow interleaving changes.
+        """
+        self.classes: dict[UUID, set[ClassValidity]] = {}
+        self.reads: list[UUID] = []
+        self.failing: set[UUID] = set()
+        self.read_gate = asyncio.Event()
+        self.read_gate.set()
+
+    async def load(self, mo: Any, uuid: UUID) -> tuple[MOClassValidities | None, UUID]:
+        self.reads.append(uuid)
+        state = self.classes.get(uuid)
+        await self.read_gate.wait()
+        if state is None:
+            return None, KLE_NUMBER_FACET
+        mo_class = MOClassValidities(
+            validities=[
+                ClassValiditiesValidities(
+                    validity=ClassValiditiesValiditiesValidity(
+                        # Only infinite validities are supported
+                        **{"from": None, "to": None}
+                    ),
+                    facet_uuid=v.facet,
+                    uuid=v.uuid,
+                    user_key=v.user_key,
+                    name=v.name,
+                    parent_uuid=v.parent,
+                )
+                for v in state
+            ]
+        )
+        return mo_class, KLE_NUMBER_FACET
+
+    async def submit(self, mo: Any, mutations: list[ClassMutation]) -> list[UUID]:
+        if any(m.uuid in self.failing for m in mutations):
+            raise ConnectionError("MO is down")
+        for m in mutations:
+            match m.kind:
+                case ClassMutationKind.CREATE | ClassMutationKind.UPDATE:
+                    assert m.validity is not None
+                    self.classes.setdefault(m.uuid, set()).add(m.validity)
+                case ClassMutationKind.TERMINATE:
+                    self.classes[m.uuid] = set()
+                case ClassMutationKind.DELETE:
+                    del self.classes[m.uuid]
+        return [m.uuid for m in mutations]
+
+
+class FakeFingerprints:
+    def __init__(self) -> None:
+        """In-memory stand-in for the fingerprint table."""
+        self.fingerprints: dict[UUID, Fingerprint] = {}
+
+    async def get(self, uuid: UUID) -> Fingerprint | None:
+        return self.fingerprints.get(uuid)
+
+    async def set(self, uuid: UUID, facet: UUID, desired: set[ClassValidity]) -> None:
+        self.fingerprints[uuid] = Fingerprint(
+            uuid=uuid, facet=facet, digest=fingerprint(desired)
+        )
+
+    async def delete(self, uuid: UUID) -> None:
+        self.fingerprints.pop(uuid, None)
+
+    def digest(self, uuid: UUID) -> str | None:
+        known = self.fingerprints.get(uuid)
+        return known.digest if known is not None else None
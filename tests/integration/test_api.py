@@ -1,10 +1,16 @@
 # SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
 # SPDX-License-Identifier: MPL-2.0
+import asyncio
+import json
 from unittest.mock import ANY
 
 import pytest
 from httpx import AsyncClient
 
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClient
+from os2mo_fkk.batching import SyncBatch
+from os2mo_fkk.reconcile import Reconciler
+
 
 @pytest.mark.integration_test
 async def test_read_raw(test_client: AsyncClient) -> None:
@@ -92,3 +98,102 @@ async def test_read_mo_non_existent(test_client: AsyncClient) -> None:
     """Test return None."""
     response = await test_client.get("/read/00000000-0000-0000-0000-000000000000/mo")
     assert response.json() is None
+
+
+@pytest.mark.integration_test
+async def test_reconcile(
+    monkeypatch: pytest.MonkeyPatch, test_client: AsyncClient
+) -> None:
+    """Test starting reconciliation and reading its progress."""
+    # Reconciling every class in the test systems takes far longer than the test,
+    # so a controllable reconciliation is run in its place.
+    done = asyncio.Event()
+
+    async def reconcile(
+        self: Reconciler, mo: GraphQLClient, sync_batch: SyncBatch
+    ) -> None:
+        await done.wait()
+
+    monkeypatch.setattr(Reconciler, "reconcile", reconcile)
+
+    response = await test_client.post("/reconcile")
+    assert response.status_code == 200
+    assert response.json()["state"] == "running"
+
+    # Only one reconciliation can run at a time
+    response = await test_client.post("/reconcile")
+    assert response.status_code == 409
+
+    response = await test_client.get("/reconcile")
+    assert response.json()["state"] == "running"
+
+    done.set()
+    while (await test_client.get("/reconcile")).json()["state"] == "running":
+        await asyncio.sleep(0.1)
+    response = await test_client.get("/reconcile")
+    assert response.json()["state"] == "finished"
+
+
+@pytest.mark.integration_test
+async def test_sync_dry_run(test_client: AsyncClient) -> None:
+    """Test planning synchronisation without writing to MO."""
+    uuid = "0095665f-3685-498b-8ba7-2339d05a5bda"
+    response = await test_client.post(f"/sync/{uuid}", params={"dry_run": True})
+    plan = response.json()
+    assert plan["uuid"] == uuid
+    assert plan["remote_calls"] == 2 + (1 if plan["mutations"] else 0)
+    assert plan["durations"].keys() == {"read", "fkk_read", "mo_read", "plan"}
+
+    # Nothing was written, so the plan is the same
+    response = await test_client.post("/sync/dry-run", json=[uuid])
+    assert response.json()[0]["mutations"] == plan["mutations"]
+
+
+@pytest.mark.integration_test
+async def test_trigger_event_generator(test_client: AsyncClient) -> None:
+    """Test triggering an event generator run on demand."""
+    response = await test_client.post("/event-generator/trigger")
+    assert response.status_code == 202
+
+
+@pytest.mark.integration_test
+async def test_sync_many(test_client: AsyncClient) -> None:
+    """Test synchronising multiple classes, streaming a result per class."""
+    uuid = "0095665f-3685-498b-8ba7-2339d05a5bda"
+    response = await test_client.post("/sync", json={"uuids": [uuid, uuid]})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert len(results) == 1
+    assert results[0]["uuid"] == uuid
+    assert results[0]["error"] is None
+
+    response = await test_client.post("/sync", json={"user_key_prefix": "85.15"})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert uuid in {r["uuid"] for r in results}
+
+    # An empty prefix would synchronise all of FKK
+    response = await test_client.post("/sync", json={"user_key_prefix": ""})
+    assert response.status_code == 422
+
+
+@pytest.mark.integration_test
+async def test_read_many(test_client: AsyncClient) -> None:
+    """Test reading multiple classes in bulk."""
+    uuids = [
+        "0095665f-3685-498b-8ba7-2339d05a5bda",
+        "00000000-0000-0000-0000-000000000000",
+    ]
+    response = await test_client.post("/read/raw", json=uuids)
+    assert response.headers["content-type"] == "application/xml"
+    assert uuids[0] in response.text
+
+    response = await test_client.post("/read/parsed", json=uuids)
+    results = {r["uuid"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results.keys() == set(uuids)
+    assert results[uuids[0]]["klasse"]["uuid"] == uuids[0]
+    assert results[uuids[1]]["klasse"] is None
+
+    response = await test_client.post("/read/mo", json=uuids)
+    results = {r["uuid"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results[uuids[0]]["validities"][0]["user_key"] == "85.15.02"
+    assert results[uuids[1]]["validities"] is None
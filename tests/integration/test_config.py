@@ -59,3 +59,27 @@ async def test_validation_certificate_not_valid_yet(
     monkeypatch.setenv("FKK__CERTIFICATE", str(cert_path))
     with pytest.raises(ValidationError, match="Certificate not valid before"):
         Settings()
+
+
+@pytest.mark.integration_test
+async def test_validation_debounce_prefetch_count(monkeypatch: MonkeyPatch) -> None:
+    """Test that debouncing cannot be enabled with a prefetch count of one."""
+    monkeypatch.setenv("DEBOUNCE__ENABLED", "true")
+    monkeypatch.setenv("FASTRAMQPI__AMQP__PREFETCH_COUNT", "10")
+    monkeypatch.setenv("FKK__AMQP__PREFETCH_COUNT", "1")
+    with pytest.raises(ValidationError, match="FKK__AMQP__PREFETCH_COUNT"):
+        Settings()
+
+    monkeypatch.setenv("FKK__AMQP__PREFETCH_COUNT", "10")
+    assert Settings().debounce.enabled
+
+
+@pytest.mark.integration_test
+async def test_validation_partitions(monkeypatch: MonkeyPatch) -> None:
+    """Test that partitioning requires consumed partitions."""
+    monkeypatch.setenv("FKK__PARTITIONS", "4")
+    with pytest.raises(ValidationError, match="without consumed partitions"):
+        Settings()
+
+    monkeypatch.setenv("FKK__CONSUMED_PARTITIONS", "[0, 1]")
+    assert Settings().fkk.consumed_partitions == [0, 1]
@@ -41,3 +41,16 @@ async def test_dipex_last_success_timestamp_metric(test_client: AsyncClient) ->
         assert await get_last_run() > begin.timestamp()
 
     await verify()
+
+
+@pytest.mark.integration_test
+async def test_sync_stage_duration_metric(test_client: AsyncClient) -> None:
+    """Test that synchronisation exports the duration of each stage."""
+    response = await test_client.post("/sync/0095665f-3685-498b-8ba7-2339d05a5bda")
+    assert response.is_success
+
+    response = await test_client.get("/metrics")
+    assert response.is_success
+    metrics = response.text
+    for stage in ("read", "fkk_read", "mo_read"):
+        assert f'fkk_sync_stage_duration_seconds_count{{stage="{stage}"}}' in metrics
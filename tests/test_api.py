@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from uuid import UUID
+from uuid import uuid4
+
+from lxml import etree
+from lxml.etree import _Element as Element
+
+from os2mo_fkk.api import _as_completed
+from os2mo_fkk.api import _parse_list
+from os2mo_fkk.api import _read_klasser
+from tests.test_models import FKK_KLASSE
+
+KLASSE_UUID = UUID("0095665f-3685-498b-8ba7-2339d05a5bda")
+
+
+async def test_as_completed() -> None:
+    """Test results are yielded as completed, with bounded concurrency."""
+    running = 0
+    max_running = 0
+    started: list[float] = []
+
+    async def work(delay: float) -> float:
+        nonlocal running, max_running
+        started.append(delay)
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return delay
+
+    delays = [0.05, 0.01, 0.02]
+    results = [r async for r in _as_completed(2, [work(d) for d in delays])]
+    assert results == [0.01, 0.02, 0.05]
+    assert max_running == 2
+
+    # Remaining work is cancelled if the iteration stops early
+    started.clear()
+    iterator = _as_completed(1, [work(d) for d in delays])
+    assert await anext(iterator) == 0.05
+    await iterator.aclose()
+    await asyncio.sleep(0.05)
+    assert started == [0.05, 0.01]
+
+
+def test_parse_list() -> None:
+    """Test Klasser are parsed in order, with missing Klasser as None."""
+    missing = uuid4()
+    raws = [etree.fromstring(FKK_KLASSE)]
+    parsed = list(_parse_list([missing, KLASSE_UUID], raws))
+    assert [uuid for uuid, _ in parsed] == [missing, KLASSE_UUID]
+    assert parsed[0][1] is None
+    klasse = parsed[1][1]
+    assert klasse is not None
+    assert klasse.uuid == KLASSE_UUID
+
+    assert list(_parse_list([missing], [])) == [(missing, None)]
+
+
+class FakeFKKAPI:
+    async def read_list_outputs(self, uuids: list[UUID]) -> list[Element]:
+        if KLASSE_UUID not in uuids:
+            raise ConnectionError("FKK is down")
+        return [etree.fromstring(FKK_KLASSE)]
+
+
+async def test_read_klasser_errors() -> None:
+    """Test a failed chunk yields its error per Klasse, without stopping others."""
+    failing = [uuid4() for _ in range(100)]
+    fkk = FakeFKKAPI()
+    results = {
+        uuid: (klasse, error)
+        async for uuid, klasse, error in _read_klasser(fkk, [*failing, KLASSE_UUID])  # type: ignore[arg-type]
+    }
+    assert results.keys() == {*failing, KLASSE_UUID}
+    assert all(
+        results[uuid] == (None, "ConnectionError('FKK is down')") for uuid in failing
+    )
+    klasse, error = results[KLASSE_UUID]
+    assert klasse is not None
+    assert error is None
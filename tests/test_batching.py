@@ -0,0 +1,189 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from typing import Any
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk import events
+from os2mo_fkk.batching import SyncBatcher
+from os2mo_fkk.fingerprint import fingerprint
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.lanes import PriorityLanes
+from os2mo_fkk.locks import KeyedLock
+from os2mo_fkk.planner import SyncStatus
+from tests.conftest import KLE_NUMBER_FACET
+from tests.conftest import FakeFingerprints
+from tests.conftest import FakeFKK
+from tests.conftest import FakeMO
+from tests.conftest import class_validity
+
+
+async def test_sync_batcher() -> None:
+    """Test messages are synchronised in one batch, with individual outcomes.
+
+    Classes are marked as changed in MO if any of their messages says so, and the
+    batch is synchronised in the most urgent lane of its messages.
+    """
+    ok = uuid4()
+    failing = uuid4()
+    batches: list[tuple[list[UUID], set[UUID], Lane]] = []
+
+    async def sync_batch(
+        uuids: list[UUID], mo_changed: set[UUID], lane: Lane
+    ) -> list[SyncStatus | BaseException]:
+        batches.append((uuids, mo_changed, lane))
+        return [
+            ValueError("boom") if uuid == failing else SyncStatus.UP_TO_DATE
+            for uuid in uuids
+        ]
+
+    # Duplicate UUIDs are synchronised once, so the batch never becomes full
+    async with SyncBatcher(window=0.01, max_size=3) as batcher:
+        results = await asyncio.gather(
+            batcher.submit(ok, sync_batch, Lane.BULK),
+            batcher.submit(failing, sync_batch, Lane.MO),
+            batcher.submit(ok, sync_batch, Lane.BULK, mo_changed=True),
+            return_exceptions=True,
+        )
+    assert batches == [([ok, failing], {ok}, Lane.MO)]
+    assert results[0] == SyncStatus.UP_TO_DATE
+    assert isinstance(results[1], ValueError)
+    assert results[2] == SyncStatus.UP_TO_DATE
+
+
+async def test_sync_batcher_max_size() -> None:
+    """Test a full batch is synchronised without waiting for the window."""
+    uuids = [uuid4(), uuid4()]
+
+    async def sync_batch(
+        uuids: list[UUID], mo_changed: set[UUID], lane: Lane
+    ) -> list[SyncStatus | BaseException]:
+        return [SyncStatus.CREATE_OR_UPDATE] * len(uuids)
+
+    async with SyncBatcher(window=10, max_size=2) as batcher:
+        async with asyncio.timeout(1):
+            results = await asyncio.gather(
+                *(batcher.submit(uuid, sync_batch, Lane.LIVE) for uuid in uuids)
+            )
+    assert results == [SyncStatus.CREATE_OR_UPDATE] * 2
+
+
+async def test_sync_batcher_read_failure() -> None:
+    """Test every message in the batch fails if the batch itself fails."""
+
+    async def sync_batch(
+        uuids: list[UUID], mo_changed: set[UUID], lane: Lane
+    ) -> list[SyncStatus | BaseException]:
+        raise ValueError("FKK is down")
+
+    async with SyncBatcher(window=0, max_size=10) as batcher:
+        with pytest.raises(ValueError):
+            await batcher.submit(uuid4(), sync_batch, Lane.LIVE)
+
+
+async def test_sync_batcher_lanes(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a batch holds a lane slot, instead of each message waiting for it."""
+    lanes = PriorityLanes(concurrency=1, weights=dict.fromkeys(Lane, 1))
+    uuids = [uuid4(), uuid4(), uuid4()]
+    batches: list[list[UUID]] = []
+
+    async def sync_batch(
+        uuids: list[UUID], lanes: PriorityLanes, lane: Lane, **kwargs: Any
+    ) -> list[SyncStatus | BaseException]:
+        async with lanes.slot(lane):
+            batches.append(uuids)
+        return [SyncStatus.UP_TO_DATE] * len(uuids)
+
+    monkeypatch.setattr(events, "sync_batch", sync_batch)
+    async with SyncBatcher(window=0.01, max_size=10) as sync_batcher:
+        await asyncio.gather(
+            *(
+                events._sync_event(
+                    uuid,
+                    MagicMock(),
+                    MagicMock(),
+                    loader=MagicMock(),
+                    batcher=None,
+                    fingerprints=MagicMock(),
+                    echoes=MagicMock(),
+                    prefilter=MagicMock(),
+                    sync_batcher=sync_batcher,
+                    debouncer=None,
+                    locks=MagicMock(),
+                    lanes=lanes,
+                    lane=Lane.LIVE,
+                )
+                for uuid in uuids
+            )
+        )
+    assert batches == [uuids]
+
+
+async def test_sync_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test each class of a batch is synchronised with its own FKK and MO state."""
+    unchanged, created, failing, deleted = (uuid4() for _ in range(4))
+    fkk, mo, fingerprints = FakeFKK(monkeypatch), FakeMO(), FakeFingerprints()
+    for uuid in (unchanged, failing):
+        fkk.klasser[uuid] = {class_validity(uuid, "FKK")}
+        mo.classes[uuid] = {class_validity(uuid, "MO")}
+    fkk.klasser[unchanged] = mo.classes[unchanged]
+    fkk.klasser[created] = {class_validity(created, "FKK")}
+    mo.classes[deleted] = {class_validity(deleted, "MO")}
+    mo.failing.add(failing)
+    await fingerprints.set(failing, KLE_NUMBER_FACET, fkk.klasser[failing])
+
+    uuids = [unchanged, created, failing, deleted]
+    results = await events.sync_batch(
+        uuids,
+        MagicMock(),
+        fkk,  # type: ignore[arg-type]
+        loader=mo,  # type: ignore[arg-type]
+        batcher=mo,  # type: ignore[arg-type]
+        fingerprints=fingerprints,  # type: ignore[arg-type]
+        mo_changed={failing},
+    )
+    assert results[:2] == [SyncStatus.UP_TO_DATE, SyncStatus.CREATE_OR_UPDATE]
+    assert isinstance(results[2], ConnectionError)
+    assert results[3] == SyncStatus.DELETE
+
+    # Read in bulk
+    assert fkk.reads == uuids
+    assert mo.reads == uuids
+    assert mo.classes == {
+        unchanged: fkk.klasser[unchanged],
+        created: fkk.klasser[created],
+        failing: {class_validity(failing, "MO")},
+    }
+    # The fingerprint of the class changed in MO is deleted, and not written back
+    # since the synchronisation failed
+    assert fingerprints.digest(failing) is None
+    assert fingerprints.digest(created) == fingerprint(fkk.klasser[created])
+
+
+async def test_sync_batch_locks(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the batch waits for the lock of each of its classes."""
+    uuids = [uuid4() for _ in range(3)]
+    fkk, mo = FakeFKK(monkeypatch), FakeMO()
+    locks = KeyedLock()
+    for uuid in uuids:
+        async with locks.lock(uuid):
+            batch = asyncio.create_task(
+                events.sync_batch(
+                    uuids,
+                    MagicMock(),
+                    fkk,  # type: ignore[arg-type]
+                    loader=mo,  # type: ignore[arg-type]
+                    batcher=mo,  # type: ignore[arg-type]
+                    locks=locks,
+                )
+            )
+            await asyncio.sleep(0.01)
+            assert not batch.done()
+            assert fkk.reads == mo.reads == []
+        assert await batch == [SyncStatus.UP_TO_DATE] * len(uuids)
+        fkk.reads.clear()
+        mo.reads.clear()
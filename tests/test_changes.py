@@ -0,0 +1,74 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from typing import Any
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk import events
+from os2mo_fkk.events import fkk_changes_handler
+
+
+async def test_fkk_changes_handler(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test every class of a multi-UUID message is attempted despite failures."""
+    ok = uuid4()
+    failing = uuid4()
+    synced: list[UUID] = []
+
+    async def sync_event(uuid: UUID, *args: Any, **kwargs: Any) -> None:
+        synced.append(uuid)
+        if uuid == failing:
+            raise ValueError("boom")
+
+    monkeypatch.setattr(events, "_sync_event", sync_event)
+    mocks: dict[str, Any] = dict.fromkeys(
+        (
+            "mo",
+            "fkk",
+            "loader",
+            "batcher",
+            "fingerprints",
+            "echoes",
+            "prefilter",
+            "sync_batcher",
+            "debouncer",
+            "locks",
+            "lanes",
+        ),
+        MagicMock(),
+    )
+    settings = MagicMock()
+    settings.fkk.changes_concurrency = 2
+    message = MagicMock(routing_key="changes.3")
+    amqp_system = AsyncMock()
+
+    # Only the failed classes are republished, and the message is acknowledged
+    await fkk_changes_handler(
+        [failing, ok, ok],
+        settings=settings,
+        message=message,
+        amqp_system=amqp_system,
+        _=None,
+        **mocks,
+    )
+    assert sorted(synced) == sorted([failing, ok, ok])
+    amqp_system.publish_message.assert_awaited_once_with(
+        routing_key="changes.3", payload=[str(failing)]
+    )
+
+    # The message is rejected if every class failed
+    amqp_system.reset_mock()
+    with pytest.raises(ExceptionGroup) as exc_info:
+        await fkk_changes_handler(
+            [failing],
+            settings=settings,
+            message=message,
+            amqp_system=amqp_system,
+            _=None,
+            **mocks,
+        )
+    assert len(exc_info.value.exceptions) == 1
+    amqp_system.publish_message.assert_not_awaited()
@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from uuid import uuid4
+
+from os2mo_fkk.debounce import Debouncer
+from os2mo_fkk.planner import SyncStatus
+
+
+async def test_debouncer() -> None:
+    """Test bursts are collapsed, and running classes get a single follow-up."""
+    uuid = uuid4()
+    calls: list[bool] = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def sync(mo_changed: bool) -> SyncStatus:
+        calls.append(mo_changed)
+        started.set()
+        await release.wait()
+        return SyncStatus.UP_TO_DATE
+
+    async with Debouncer(window=0) as debouncer:
+        # A burst of events within the window is collapsed into one
+        burst = [asyncio.create_task(debouncer.run(uuid, sync)) for _ in range(3)]
+        await started.wait()
+        assert calls == [False]
+
+        # Events during the synchronisation collapse into one follow-up, which is
+        # marked as changed in MO if any of the events are
+        follow_ups = [
+            asyncio.create_task(debouncer.run(uuid, sync, mo_changed=mo_changed))
+            for mo_changed in (False, True, False)
+        ]
+        await asyncio.sleep(0.01)
+        assert calls == [False]
+
+        release.set()
+        results = await asyncio.gather(*burst, *follow_ups)
+    assert calls == [False, True]
+    assert results == [SyncStatus.UP_TO_DATE] * 6
@@ -0,0 +1,136 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from datetime import datetime
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+from pytest import MonkeyPatch
+
+from os2mo_fkk import echo
+from os2mo_fkk import events
+from os2mo_fkk.echo import EchoRegistry
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import Validity
+from os2mo_fkk.planner import SyncStatus
+from tests.conftest import FakeFingerprints
+from tests.conftest import FakeFKK
+from tests.conftest import FakeMO
+from tests.conftest import class_validity
+
+
+def test_echo_registry(monkeypatch: MonkeyPatch) -> None:
+    """Test events are echoes only while the class is in the written state."""
+    now = 1000.0
+    monkeypatch.setattr(echo.time, "monotonic", lambda: now)
+    registry = EchoRegistry(ttl=60)
+    uuid = uuid4()
+    written = {
+        ClassValidity(
+            uuid=uuid,
+            user_key="00",
+            name="Kommunens styrelse",
+            facet=uuid4(),
+            parent=None,
+            validity=Validity(start=datetime(2020, 1, 1), end=datetime(2030, 1, 1)),
+        )
+    }
+
+    # Unknown classes are not echoes
+    assert registry.expects(uuid) is False
+    assert registry.is_echo(uuid, written) is False
+
+    # Every event is an echo while MO is in the written state
+    registry.record(uuid, written)
+    assert registry.expects(uuid) is True
+    assert registry.is_echo(uuid, written) is True
+    assert registry.is_echo(uuid, written) is True
+
+    # Changes made by others are not
+    assert registry.is_echo(uuid, set()) is False
+
+    # Written states expire
+    now += 61
+    assert registry.expects(uuid) is False
+    assert registry.is_echo(uuid, written) is False
+
+
+class Handler:
+    def __init__(self, monkeypatch: MonkeyPatch) -> None:
+        """MO handler and synchronisation sharing fake FKK, MO and echo registry."""
+        self.fkk = FakeFKK(monkeypatch)
+        self.mo = FakeMO()
+        self.echoes = EchoRegistry(ttl=60)
+        self.settings = MagicMock()
+        self.settings.fkk.partitions = None
+        self.prefilter = MagicMock()
+        self.prefilter.is_relevant = AsyncMock(return_value=True)
+
+    async def sync(self, uuid: UUID) -> SyncStatus:
+        return await events.sync(
+            uuid,
+            MagicMock(),
+            self.fkk,  # type: ignore[arg-type]
+            loader=self.mo,  # type: ignore[arg-type]
+            batcher=self.mo,  # type: ignore[arg-type]
+            echoes=self.echoes,
+        )
+
+    async def mo_handler(self, uuid: UUID) -> None:
+        await events.mo_handler(
+            uuid,  # type: ignore[arg-type]
+            settings=self.settings,
+            amqp_system=MagicMock(),
+            mo=MagicMock(),
+            fkk=self.fkk,  # type: ignore[arg-type]
+            loader=self.mo,  # type: ignore[arg-type]
+            batcher=self.mo,  # type: ignore[arg-type]
+            fingerprints=FakeFingerprints(),  # type: ignore[arg-type]
+            echoes=self.echoes,
+            prefilter=self.prefilter,
+            sync_batcher=None,
+            debouncer=None,
+            locks=MagicMock(),
+            lanes=None,
+            _=None,
+        )
+
+
+async def test_mo_handler_drops_echo(monkeypatch: MonkeyPatch) -> None:
+    """Test events of our own writes are dropped without synchronising."""
+    handler = Handler(monkeypatch)
+    uuid = uuid4()
+    handler.fkk.klasser[uuid] = {class_validity(uuid, "FKK")}
+    assert await handler.sync(uuid) == SyncStatus.CREATE_OR_UPDATE
+    assert handler.fkk.reads == [uuid]
+
+    await handler.mo_handler(uuid)
+    # MO is read to compare the state, but FKK is not
+    assert handler.mo.reads == [uuid, uuid]
+    assert handler.fkk.reads == [uuid]
+
+
+async def test_mo_handler_foreign_change(monkeypatch: MonkeyPatch) -> None:
+    """Test changes made by others are synchronised, even if a write is recorded."""
+    handler = Handler(monkeypatch)
+    uuid = uuid4()
+    handler.fkk.klasser[uuid] = {class_validity(uuid, "FKK")}
+    assert await handler.sync(uuid) == SyncStatus.CREATE_OR_UPDATE
+
+    handler.mo.classes[uuid] = {class_validity(uuid, "Edited in MO")}
+    await handler.mo_handler(uuid)
+    assert handler.fkk.reads == [uuid, uuid]
+    assert handler.mo.classes[uuid] == handler.fkk.klasser[uuid]
+
+
+async def test_failed_write_not_recorded(monkeypatch: MonkeyPatch) -> None:
+    """Test writes are only recorded as echoes once they succeed."""
+    handler = Handler(monkeypatch)
+    uuid = uuid4()
+    handler.fkk.klasser[uuid] = {class_validity(uuid, "FKK")}
+    handler.mo.failing.add(uuid)
+    with pytest.raises(ConnectionError):
+        await handler.sync(uuid)
+    assert handler.echoes.expects(uuid) is False
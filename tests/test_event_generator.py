@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk.config import FKKSettings
+from os2mo_fkk.klassifikation.api import BOOTSTRAP_USER_KEY_FILTERS
+from os2mo_fkk.klassifikation.api import SEARCH_PAGE_LIMIT
+from os2mo_fkk.klassifikation.event_generator import BOOTSTRAP_SINCE
+from os2mo_fkk.klassifikation.event_generator import Checkpoint
+from os2mo_fkk.klassifikation.event_generator import FKKEventGenerator
+from os2mo_fkk.klassifikation.event_generator import LastRun
+from os2mo_fkk.klassifikation.event_generator import next_interval
+from os2mo_fkk.klassifikation.outbox import OutboxEntry
+from tests.conftest import FakeDatabase
+
+
+class FakeFKKAPI:
+    def __init__(self, pages: dict[tuple[str | None, int], set[UUID]]) -> None:
+        self.pages = pages
+        self.searched: list[tuple[str | None, int]] = []
+
+    async def get_changed_uuids_page(
+        self,
+        since: datetime,
+        until: datetime,
+        page_offset: int,
+        user_key_filter: str | None,
+    ) -> set[UUID]:
+        self.searched.append((user_key_filter, page_offset))
+        return self.pages.get((user_key_filter, page_offset), set())
+
+    async def read_list(self, uuids: list[UUID]) -> dict:
+        return {}
+
+
+def event_generator(
+    database: FakeDatabase | None = None,
+    api: FakeFKKAPI | None = None,
+    **settings: Any,
+) -> FKKEventGenerator:
+    return FKKEventGenerator(
+        settings=FKKSettings.construct(**settings),
+        api=api or FakeFKKAPI(pages={}),  # type: ignore[arg-type]
+        outbox=MagicMock(),
+        lease=MagicMock(),
+        sessionmaker=database or FakeDatabase(),  # type: ignore[arg-type]
+    )
+
+
+@pytest.mark.parametrize(
+    "interval,changes,expected",
+    [
+        # Changes shorten the interval, down to the minimum
+        (1800, 5, 900),
+        (100, 5, 60),
+        # No changes lengthen the interval, up to the maximum
+        (60, 0, 120),
+        (1000, 0, 1800),
+    ],
+)
+def test_next_interval(interval: float, changes: int, expected: float) -> None:
+    """Test the polling interval adapts to the changes found."""
+    assert (
+        next_interval(interval, changes, min_interval=60, max_interval=1800) == expected
+    )
+
+
+async def test_generate_resumes_from_checkpoints() -> None:
+    """Test an interrupted iteration resumes from the checkpoints of its shards."""
+    until = datetime(2026, 1, 1, tzinfo=UTC)
+    database = FakeDatabase()
+    # The first run was interrupted after the first page of the "01*" shard
+    database.rows[Checkpoint] = [
+        Checkpoint(
+            since=BOOTSTRAP_SINCE,
+            until=until,
+            user_key_filter=user_key_filter,
+            page_offset=SEARCH_PAGE_LIMIT,
+            published=1,
+            done=user_key_filter != "01*",
+        )
+        for user_key_filter in BOOTSTRAP_USER_KEY_FILTERS
+    ]
+    changed = uuid4()
+    api = FakeFKKAPI(pages={("01*", SEARCH_PAGE_LIMIT): {changed}})
+    generator = event_generator(database, api, search_concurrency=4)
+
+    assert await generator._generate() == len(BOOTSTRAP_USER_KEY_FILTERS) + 1
+    # Only the unfinished shard is searched, from its next page
+    assert api.searched == [("01*", SEARCH_PAGE_LIMIT), ("01*", 2 * SEARCH_PAGE_LIMIT)]
+    assert [e.uuid for e in database.rows[OutboxEntry]] == [changed]
+    # The iteration is finished
+    assert database.rows[Checkpoint] == []
+    assert [r.datetime for r in database.rows[LastRun]] == [until]
+
+
+def test_shards() -> None:
+    """Test the first run is sharded by KLE main group, unless filtered."""
+    generator = event_generator()
+    assert generator._shards(bootstrap=True) == BOOTSTRAP_USER_KEY_FILTERS
+    assert generator._shards(bootstrap=False) == [None]
+
+    filtered = event_generator(changed_uuids_user_key_filter="85*")
+    assert filtered._shards(bootstrap=True) == ["85*"]
+    assert filtered._shards(bootstrap=False) == ["85*"]
+
+
+def test_is_resumable() -> None:
+    """Test checkpoints are only resumed if the search is unchanged."""
+
+    def checkpoints(*user_key_filters: str | None) -> list[Checkpoint]:
+        return [Checkpoint(user_key_filter=f) for f in user_key_filters]
+
+    generator = event_generator()
+    assert generator._is_resumable(checkpoints(*BOOTSTRAP_USER_KEY_FILTERS))
+    # Split into multiple time windows
+    assert generator._is_resumable(checkpoints(None, None))
+    # Checkpoints of a search with a different filter
+    assert not generator._is_resumable(checkpoints("85*"))
+    assert not generator._is_resumable(checkpoints(*BOOTSTRAP_USER_KEY_FILTERS[:10]))
+
+    filtered = event_generator(changed_uuids_user_key_filter="85*")
+    assert filtered._is_resumable(checkpoints("85*"))
+    assert not filtered._is_resumable(checkpoints(None))
+
+
+def test_windows() -> None:
+    """Test long incremental search windows are split into contiguous windows."""
+    generator = event_generator(search_window=3600)
+    since = datetime(2026, 1, 1, tzinfo=UTC)
+    hour = timedelta(hours=1)
+
+    assert generator._windows(since, since + hour / 2) == [(since, since + hour / 2)]
+    assert generator._windows(since, since + hour) == [(since, since + hour)]
+    assert generator._windows(since, since + 2.5 * hour) == [
+        (since, since + hour),
+        (since + hour, since + 2 * hour),
+        (since + 2 * hour, since + 2.5 * hour),
+    ]
@@ -0,0 +1,180 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk import events
+from os2mo_fkk.echo import EchoRegistry
+from os2mo_fkk.fingerprint import fingerprint
+from os2mo_fkk.locks import KeyedLock
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import Validity
+from os2mo_fkk.planner import SyncStatus
+from os2mo_fkk.util import NEGATIVE_INFINITY
+from os2mo_fkk.util import POSITIVE_INFINITY
+from tests.conftest import KLE_NUMBER_FACET
+from tests.conftest import FakeFingerprints
+from tests.conftest import FakeFKK
+from tests.conftest import FakeMO
+from tests.conftest import class_validity
+
+
+def test_fingerprint() -> None:
+    """Test fingerprints are stable and sensitive to the desired state."""
+    facet = uuid4()
+    uuid = uuid4()
+    validities = [
+        ClassValidity(
+            facet=facet,
+            validity=Validity(start=NEGATIVE_INFINITY, end=POSITIVE_INFINITY),
+            uuid=uuid,
+            user_key=user_key,
+            name="Administrative systemer",
+            parent=None,
+        )
+        for user_key in ("85.11.06", "85.11.07")
+    ]
+    assert fingerprint(set(validities)) == fingerprint(set(reversed(validities)))
+    assert fingerprint(set(validities)) != fingerprint(set(validities[:1]))
+    assert fingerprint(set()) != fingerprint(set(validities))
+
+
+async def test_sync_fingerprint(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test MO is only read if the desired state differs from the fingerprint."""
+    uuid = uuid4()
+    fkk, mo, fingerprints = FakeFKK(monkeypatch), FakeMO(), FakeFingerprints()
+    fkk.klasser[uuid] = mo.classes[uuid] = {class_validity(uuid, "Old")}
+    await fingerprints.set(uuid, KLE_NUMBER_FACET, fkk.klasser[uuid])
+
+    async def sync() -> SyncStatus:
+        return await events.sync(
+            uuid,
+            MagicMock(),
+            fkk,  # type: ignore[arg-type]
+            loader=mo,  # type: ignore[arg-type]
+            batcher=mo,  # type: ignore[arg-type]
+            fingerprints=fingerprints,  # type: ignore[arg-type]
+            locks=KeyedLock(),
+        )
+
+    # Unchanged in FKK
+    assert await sync() == SyncStatus.UP_TO_DATE
+    assert fkk.reads == [uuid]
+    assert mo.reads == []
+
+    # Changed in FKK
+    fkk.klasser[uuid] = {class_validity(uuid, "New")}
+    assert await sync() == SyncStatus.CREATE_OR_UPDATE
+    assert mo.reads == [uuid]
+    assert mo.classes[uuid] == fkk.klasser[uuid]
+    assert fingerprints.digest(uuid) == fingerprint(fkk.klasser[uuid])
+
+
+async def test_sync_fingerprint_wont_delete(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the fingerprint is deleted if MO is left different from FKK."""
+    uuid = uuid4()
+    fkk, mo, fingerprints = FakeFKK(monkeypatch), FakeMO(), FakeFingerprints()
+    mo.classes[uuid] = {class_validity(uuid, "Not KLE", facet=uuid4())}
+    await fingerprints.set(uuid, KLE_NUMBER_FACET, {class_validity(uuid, "Old")})
+
+    status = await events.sync(
+        uuid,
+        MagicMock(),
+        fkk,  # type: ignore[arg-type]
+        loader=mo,  # type: ignore[arg-type]
+        batcher=mo,  # type: ignore[arg-type]
+        fingerprints=fingerprints,  # type: ignore[arg-type]
+    )
+    assert status == SyncStatus.WONT_DELETE
+    assert fingerprints.digest(uuid) is None
+
+
+async def test_sync_fingerprint_mo_changed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test MO is always read, and repaired, if changed in MO by someone else."""
+    uuid = uuid4()
+    fkk, mo, fingerprints = FakeFKK(monkeypatch), FakeMO(), FakeFingerprints()
+    fkk.klasser[uuid] = {class_validity(uuid, "FKK")}
+    mo.classes[uuid] = {class_validity(uuid, "Edited in MO")}
+    await fingerprints.set(uuid, KLE_NUMBER_FACET, fkk.klasser[uuid])
+
+    status = await events.sync(
+        uuid,
+        MagicMock(),
+        fkk,  # type: ignore[arg-type]
+        loader=mo,  # type: ignore[arg-type]
+        batcher=mo,  # type: ignore[arg-type]
+        fingerprints=fingerprints,  # type: ignore[arg-type]
+        mo_changed=True,
+    )
+    assert status == SyncStatus.CREATE_OR_UPDATE
+    assert mo.reads == [uuid]
+    assert mo.classes[uuid] == fkk.klasser[uuid]
+    assert fingerprints.digest(uuid) == fingerprint(fkk.klasser[uuid])
+
+
+async def test_mo_event_during_sync(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a concurrent synchronisation cannot hide a change made in MO.
+
+    The FKK synchronisation reads MO from before the change and writes the
+    fingerprint after the MO event has been received. The synchronisation of the
+    MO event must still read MO.
+    """
+    uuid = uuid4()
+    fkk, mo, fingerprints = FakeFKK(monkeypatch), FakeMO(), FakeFingerprints()
+    fkk.klasser[uuid] = mo.classes[uuid] = {class_validity(uuid, "FKK")}
+    locks = KeyedLock()
+    settings = MagicMock()
+    settings.fkk.partitions = None
+    prefilter = MagicMock()
+    prefilter.is_relevant = AsyncMock(return_value=True)
+
+    # FKK synchronisation reads MO
+    mo.read_gate.clear()
+    fkk_sync = asyncio.create_task(
+        events.sync(
+            uuid,
+            MagicMock(),
+            fkk,  # type: ignore[arg-type]
+            loader=mo,  # type: ignore[arg-type]
+            batcher=mo,  # type: ignore[arg-type]
+            fingerprints=fingerprints,  # type: ignore[arg-type]
+            locks=locks,
+        )
+    )
+    while not mo.reads:
+        await asyncio.sleep(0)
+
+    # Someone else changes the class, and the MO event is handled while the FKK
+    # synchronisation holds the lock
+    mo.classes[uuid] = {class_validity(uuid, "Edited in MO")}
+    mo_sync: asyncio.Task[None] = asyncio.create_task(
+        events.mo_handler(
+            uuid,  # type: ignore[arg-type]
+            settings=settings,
+            amqp_system=MagicMock(),
+            mo=MagicMock(),
+            fkk=fkk,  # type: ignore[arg-type]
+            loader=mo,  # type: ignore[arg-type]
+            batcher=mo,  # type: ignore[arg-type]
+            fingerprints=fingerprints,  # type: ignore[arg-type]
+            echoes=EchoRegistry(ttl=60),
+            prefilter=prefilter,
+            sync_batcher=None,
+            debouncer=None,
+            locks=locks,
+            lanes=None,
+            _=None,
+        )
+    )
+    await asyncio.sleep(0.01)
+    mo.read_gate.set()
+
+    assert await fkk_sync == SyncStatus.UP_TO_DATE
+    await mo_sync
+    assert mo.reads == [uuid, uuid]
+    assert mo.classes[uuid] == fkk.klasser[uuid]
+    assert fingerprints.digest(uuid) == fingerprint(fkk.klasser[uuid])
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from uuid import UUID
+from uuid import uuid4
+
+from prometheus_client import REGISTRY
+
+from os2mo_fkk.hierarchy import hierarchy_waves
+from os2mo_fkk.hierarchy import sync_waves
+from os2mo_fkk.klassifikation.models import Klasse
+from os2mo_fkk.klassifikation.models import OverordnetRelation
+from os2mo_fkk.klassifikation.models import Virkning
+from os2mo_fkk.util import NEGATIVE_INFINITY
+from os2mo_fkk.util import POSITIVE_INFINITY
+
+
+def klasse(uuid: UUID, *parents: UUID) -> Klasse:
+    return Klasse(
+        uuid=uuid,
+        attribut_egenskab=[],
+        tilstand_publiceret=[],
+        relation_overordnet=[
+            OverordnetRelation(
+                virkning=Virkning(fra=NEGATIVE_INFINITY, til=POSITIVE_INFINITY),
+                uuid=parent,
+            )
+            for parent in parents
+        ],
+    )
+
+
+def test_hierarchy_waves() -> None:
+    """Test parents are ordered before their children."""
+    outside = uuid4()
+    main_group, group, topic, other_group = sorted(uuid4() for _ in range(4))
+    klasser = {
+        topic: klasse(topic, group),
+        # Moved between groups over time
+        group: klasse(group, main_group, other_group),
+        other_group: klasse(other_group, main_group),
+        main_group: klasse(main_group, outside),
+    }
+    assert hierarchy_waves(klasser) == [
+        [main_group],
+        [other_group],
+        [group],
+        [topic],
+    ]
+
+
+def test_hierarchy_waves_cycle() -> None:
+    """Test cycles are placed in the last wave."""
+    a, b, c = sorted(uuid4() for _ in range(3))
+    klasser = {
+        a: klasse(a),
+        b: klasse(b, c),
+        c: klasse(c, b),
+    }
+    assert hierarchy_waves(klasser) == [[a], [b, c]]
+
+
+def test_sync_waves() -> None:
+    """Test classes not in FKK are deleted last, and deferrals are counted."""
+    deleted, parent, child = sorted(uuid4() for _ in range(3))
+    klasser = {
+        parent: klasse(parent),
+        child: klasse(child, parent),
+    }
+    deferred = "fkk_hierarchy_deferred_classes_total"
+    before = REGISTRY.get_sample_value(deferred)
+    assert before is not None
+    assert sync_waves([child, deleted, parent], klasser) == [
+        [parent],
+        [child],
+        [deleted],
+    ]
+    assert REGISTRY.get_sample_value(deferred) == before + 1
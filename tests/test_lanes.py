@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.lanes import PriorityLanes
+
+
+async def test_priority_lanes() -> None:
+    """Test waiting lanes share capacity by weight."""
+    lanes = PriorityLanes(concurrency=1, weights={Lane.LIVE: 2, Lane.BULK: 1})
+    order: list[Lane] = []
+
+    async def synchronise(lane: Lane) -> None:
+        async with lanes.slot(lane):
+            order.append(lane)
+            await asyncio.sleep(0)
+
+    # Queue a backfill and live changes while the capacity is in use
+    async with lanes.slot(Lane.BULK):
+        tasks = [asyncio.create_task(synchronise(Lane.BULK)) for _ in range(4)]
+        tasks += [asyncio.create_task(synchronise(Lane.LIVE)) for _ in range(4)]
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert order == [
+        Lane.LIVE,
+        Lane.BULK,
+        Lane.LIVE,
+        Lane.LIVE,
+        Lane.BULK,
+        Lane.LIVE,
+        Lane.BULK,
+        Lane.BULK,
+    ]
+
+
+async def test_priority_lanes_cancelled() -> None:
+    """Test cancelled waiters do not leak capacity."""
+    lanes = PriorityLanes(concurrency=1, weights={Lane.LIVE: 1})
+
+    async def synchronise() -> None:
+        async with lanes.slot(Lane.LIVE):
+            pass
+
+    async with lanes.slot(Lane.LIVE):
+        waiter = asyncio.create_task(synchronise())
+        await asyncio.sleep(0)
+        waiter.cancel()
+    async with asyncio.timeout(1):
+        async with lanes.slot(Lane.LIVE):
+            pass
@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from unittest.mock import MagicMock
+
+from os2mo_fkk.leader import LeaderLease
+from os2mo_fkk.leader import Lease
+from tests.conftest import FakeDatabase
+from tests.conftest import compile_sql
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+class FakeLeaseDatabase(FakeDatabase):
+    """Fake database holding the leases, with a fixed clock."""
+
+    @property
+    def leases(self) -> dict[str, Lease]:
+        return {lease.name: lease for lease in self.rows[Lease]}
+
+    def get(self, entity: type, key: Any, **kwargs: Any) -> Any:
+        assert kwargs == {"with_for_update": True}
+        return super().get(entity, key)
+
+    def execute(self, statement: Any) -> Any:
+        sql = compile_sql(statement)
+        if sql.startswith("SELECT now()"):
+            return MagicMock(scalar_one=lambda: NOW)
+        # Only used to release our own lease
+        assert sql.startswith("DELETE FROM lease")
+        self.rows[Lease] = [
+            lease
+            for lease in self.rows[Lease]
+            if not (f"'{lease.name}'" in sql and f"'{lease.holder}'" in sql)
+        ]
+
+
+def lease(database: FakeLeaseDatabase) -> LeaderLease:
+    return LeaderLease(sessionmaker=database, name="test", ttl=30)  # type: ignore[arg-type]
+
+
+async def test_take_over_expired_lease() -> None:
+    """Test the lease is taken over once it expires."""
+    other = Lease(name="test", holder="other", expires=NOW + timedelta(seconds=1))
+    database = FakeLeaseDatabase(other)
+
+    async with lease(database) as follower:
+        assert not follower.is_leader
+        assert database.leases["test"].holder == "other"
+
+        other.expires = NOW
+        await follower._campaign()
+        assert follower.is_leader
+        assert database.leases["test"].holder == follower._holder
+        assert database.leases["test"].expires == NOW + timedelta(seconds=30)
+
+
+async def test_step_down_on_renewal_failure() -> None:
+    """Test the leader steps down if the lease cannot be renewed."""
+    database = FakeLeaseDatabase()
+
+    async with lease(database) as leader:
+        assert leader.is_leader
+
+        database.down = True
+        await leader._campaign()
+        assert not leader.is_leader
+        await leader.wait_follower()
+
+        database.down = False
+        await leader._campaign()
+        assert leader.is_leader
+
+
+async def test_release_on_exit() -> None:
+    """Test the lease is released on exit, but only by its holder."""
+    database = FakeLeaseDatabase()
+
+    async with lease(database) as leader:
+        assert leader.is_leader
+        async with lease(database) as follower:
+            assert not follower.is_leader
+        assert database.leases["test"].holder == leader._holder
+
+    assert not leader.is_leader
+    assert database.leases == {}
@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from uuid import UUID
+from uuid import uuid4
+
+from os2mo_fkk.autogenerated_graphql_client import GetClasses
+from os2mo_fkk.loader import ClassLoader
+
+KLE_NUMBER_FACET = uuid4()
+
+
+class FakeMO:
+    def __init__(self, existing: set[UUID]) -> None:
+        self.existing = existing
+        self.requests: list[list[UUID]] = []
+
+    async def get_classes(self, uuids: list[UUID], facet_user_key: str) -> GetClasses:
+        self.requests.append(uuids)
+        return GetClasses.parse_obj(
+            {
+                "classes": {
+                    "objects": [
+                        {"uuid": uuid, "validities": []}
+                        for uuid in uuids
+                        if uuid in self.existing
+                    ]
+                },
+                "facets": {"objects": [{"uuid": KLE_NUMBER_FACET}]},
+            }
+        )
+
+
+async def test_class_loader_batches() -> None:
+    """Test that concurrent lookups are fetched in a single request."""
+    existing = uuid4()
+    missing = uuid4()
+    mo = FakeMO(existing={existing})
+    loader = ClassLoader()
+
+    results = await asyncio.gather(
+        loader.load(mo, existing),  # type: ignore[arg-type]
+        loader.load(mo, missing),  # type: ignore[arg-type]
+        loader.load(mo, existing),  # type: ignore[arg-type]
+    )
+
+    assert mo.requests == [[existing, missing]]
+    (existing_class, facet), (missing_class, _), (duplicate_class, _) = results
+    assert existing_class is not None
+    assert missing_class is None
+    assert duplicate_class is existing_class
+    assert facet == KLE_NUMBER_FACET
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+from uuid import UUID
+from uuid import uuid4
+
+from os2mo_fkk.locks import AdvisoryKeyedLock
+from os2mo_fkk.locks import KeyedLock
+from os2mo_fkk.locks import advisory_lock_key
+
+
+async def test_keyed_lock() -> None:
+    """Test the same class is serialised, while different classes are not."""
+    locks = KeyedLock()
+    a, b = uuid4(), uuid4()
+    running: list[UUID] = []
+    observed: list[list[UUID]] = []
+
+    async def work(*uuids: UUID) -> None:
+        async with locks.lock(*uuids):
+            running.extend(uuids)
+            observed.append(list(running))
+            await asyncio.sleep(0.01)
+            for uuid in uuids:
+                running.remove(uuid)
+
+    await asyncio.gather(work(a), work(a), work(b), work(b, a))
+    # Each class was only ever locked once at a time ...
+    assert all(o.count(a) <= 1 and o.count(b) <= 1 for o in observed)
+    # ... but different classes were locked concurrently
+    assert [a, b] in observed
+    # Unused locks are forgotten
+    assert locks._locks == {}
+
+
+def test_advisory_lock_key() -> None:
+    """Test advisory lock keys fit in a PostgreSQL bigint."""
+    key = advisory_lock_key(UUID("ffffffff-ffff-ffff-ffff-ffffffffffff"))
+    assert -(2**63) <= key < 2**63
+
+
+class FakeConnection:
+    def __init__(self, engine: "FakeEngine") -> None:
+        self.engine = engine
+
+    async def execution_options(self, isolation_level: str) -> "FakeConnection":
+        assert isolation_level == "AUTOCOMMIT"
+        return self
+
+    async def execute(self, statement: Any, parameters: dict[str, int]) -> None:
+        function = str(statement).split()[1].split("(")[0]
+        self.engine.executed.append((function, parameters["key"]))
+
+    async def invalidate(self) -> None:  # pragma: no cover
+        pass
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.executed: list[tuple[str, int]] = []
+        self.connected = 0
+        self.max_connected = 0
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[FakeConnection]:
+        self.connected += 1
+        self.max_connected = max(self.max_connected, self.connected)
+        try:
+            yield FakeConnection(self)
+        finally:
+            self.connected -= 1
+
+
+async def test_advisory_keyed_lock() -> None:
+    """Test advisory locks are released, and the connections are capped."""
+    engine = FakeEngine()
+    locks = AdvisoryKeyedLock(engine=engine, max_connections=2)  # type: ignore[arg-type]
+    a, b = uuid4(), uuid4()
+    keys = sorted([advisory_lock_key(a), advisory_lock_key(b)])
+
+    async with locks.lock(b, a):
+        pass
+    assert engine.executed == [
+        ("pg_advisory_lock", keys[0]),
+        ("pg_advisory_lock", keys[1]),
+        ("pg_advisory_unlock", keys[0]),
+        ("pg_advisory_unlock", keys[1]),
+    ]
+
+    async def work() -> None:
+        async with locks.lock(uuid4()):
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work() for _ in range(5)))
+    assert engine.max_connected == 2
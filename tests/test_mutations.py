@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk.autogenerated_graphql_client import ClassCreateInput
+from os2mo_fkk.autogenerated_graphql_client import ClassUpdateInput
+from os2mo_fkk.autogenerated_graphql_client import GraphQLClientGraphQLMultiError
+from os2mo_fkk.models import ClassValidity
+from os2mo_fkk.models import Validity
+from os2mo_fkk.mutations import ClassMutation
+from os2mo_fkk.mutations import ClassMutationKind
+from os2mo_fkk.mutations import MutationBatcher
+from os2mo_fkk.mutations import build_document
+from os2mo_fkk.util import POSITIVE_INFINITY
+
+
+def test_build_document() -> None:
+    """Test that mutations are aliased in order in a single document."""
+    uuid = uuid4()
+    validity = ClassValidity(
+        facet=uuid4(),
+        validity=Validity(start=datetime(2020, 1, 1), end=POSITIVE_INFINITY),
+        uuid=uuid,
+        user_key="85.11",
+        name="Etablering og udvikling af IT-systemer",
+        parent=None,
+    )
+    query, variables = build_document(
+        [
+            ClassMutation(kind=ClassMutationKind.CREATE, uuid=uuid, validity=validity),
+            ClassMutation(kind=ClassMutationKind.TERMINATE, uuid=uuid),
+            ClassMutation(kind=ClassMutationKind.UPDATE, uuid=uuid, validity=validity),
+            ClassMutation(kind=ClassMutationKind.DELETE, uuid=uuid),
+        ]
+    )
+    assert query == (
+        "mutation class_mutations("
+        "$m0: ClassCreateInput!, $m1: UUID!, $m2: ClassUpdateInput!, $m3: UUID!) {\n"
+        "  m0: class_create(input: $m0) { uuid }\n"
+        '  m1: class_terminate(input: {uuid: $m1, from: "0001-01-02", to: "9999-12-30"}) { uuid }\n'
+        "  m2: class_update(input: $m2) { uuid }\n"
+        "  m3: class_delete(uuid: $m3) { uuid }\n"
+        "}"
+    )
+    assert isinstance(variables["m0"], ClassCreateInput)
+    assert variables["m1"] == uuid
+    assert isinstance(variables["m2"], ClassUpdateInput)
+    assert variables["m3"] == uuid
+
+
+class FakeMO:
+    def __init__(self, failing: set[UUID] | None = None) -> None:
+        self.variables: list[dict[str, object]] = []
+        self.failing = failing or set()
+
+    async def execute(self, query: str, variables: dict[str, object]) -> Any:
+        self.variables.append(variables)
+        data: dict[str, Any] = {}
+        errors = []
+        for var, uuid in variables.items():
+            if uuid in self.failing:
+                data[var] = None
+                errors.append({"message": "boom", "path": [var]})
+            else:
+                data[var] = {"uuid": str(uuid)}
+        return {"data": data, "errors": errors}
+
+    def get_data(self, response: Any) -> Any:
+        if response["errors"]:
+            raise GraphQLClientGraphQLMultiError.from_errors_dicts(
+                errors_dicts=response["errors"], data=response["data"]
+            )
+        return response["data"]
+
+
+async def test_mutation_batcher() -> None:
+    """Test that concurrent submissions are written in one batch."""
+    mo = FakeMO()
+    batcher = MutationBatcher(window=10, max_size=3)
+    uuids = [uuid4(), uuid4(), uuid4()]
+
+    async def submit(*uuids: UUID) -> list[UUID]:
+        mutations = [
+            ClassMutation(kind=ClassMutationKind.DELETE, uuid=uuid) for uuid in uuids
+        ]
+        return await batcher.submit(mo, mutations)  # type: ignore[arg-type]
+
+    async with batcher:
+        results = await asyncio.gather(submit(uuids[0], uuids[1]), submit(uuids[2]))
+
+    # The batch was flushed by size, not by the (very long) window
+    assert results == [[uuids[0], uuids[1]], [uuids[2]]]
+    assert len(mo.variables) == 1
+
+
+async def test_mutation_batcher_partial_failure() -> None:
+    """Test that only the submitters of failing mutations fail."""
+    uuids = [uuid4(), uuid4(), uuid4()]
+    mo = FakeMO(failing={uuids[1]})
+    batcher = MutationBatcher(window=10, max_size=3)
+
+    async def submit(*uuids: UUID) -> list[UUID]:
+        mutations = [
+            ClassMutation(kind=ClassMutationKind.DELETE, uuid=uuid) for uuid in uuids
+        ]
+        return await batcher.submit(mo, mutations)  # type: ignore[arg-type]
+
+    async with batcher:
+        ok, failed = await asyncio.gather(
+            submit(uuids[0]), submit(uuids[1], uuids[2]), return_exceptions=True
+        )
+
+    assert len(mo.variables) == 1
+    assert ok == [uuids[0]]
+    assert isinstance(failed, GraphQLClientGraphQLMultiError)
+    assert [e.path for e in failed.errors] == [["m1"]]
+
+
+async def test_mutation_batcher_document_failure() -> None:
+    """Test that errors not attributable to a mutation fail every submitter."""
+    uuid = uuid4()
+    mo = FakeMO()
+
+    async def execute(query: str, variables: dict[str, object]) -> Any:
+        return {"data": None, "errors": [{"message": "Invalid document"}]}
+
+    mo.execute = execute  # type: ignore[method-assign]
+    mutations = [ClassMutation(kind=ClassMutationKind.DELETE, uuid=uuid)]
+    async with MutationBatcher(window=0, max_size=10) as batcher:
+        with pytest.raises(GraphQLClientGraphQLMultiError):
+            await batcher.submit(mo, mutations)  # type: ignore[arg-type]
@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import re
+from typing import Any
+from uuid import uuid4
+
+from os2mo_fkk.klassifikation.outbox import OutboxEntry
+from os2mo_fkk.klassifikation.outbox import OutboxPublisher
+from os2mo_fkk.partitions import partition
+from tests.conftest import FakeDatabase
+from tests.conftest import compile_sql
+
+
+class FakeOutboxDatabase(FakeDatabase):
+    """Fake database holding the outbox."""
+
+    @property
+    def entries(self) -> list[OutboxEntry]:
+        return self.rows[OutboxEntry]
+
+    def scalars(self, statement: Any) -> list[OutboxEntry]:
+        # Only used to select the next batch of unsent entries
+        match = re.search(r"LIMIT (\d+)", compile_sql(statement))
+        assert match is not None
+        unsent = [e for e in self.entries if not e.sent]
+        return unsent[: int(match.group(1))]
+
+    def scalar(self, statement: Any) -> int:
+        # Only used to count the unsent entries
+        return sum(not e.sent for e in self.entries)
+
+    def execute(self, statement: Any) -> None:
+        # Only used to purge the sent entries
+        self.rows[OutboxEntry] = [e for e in self.entries if not e.sent]
+
+
+class FakeAMQPSystem:
+    def __init__(self) -> None:
+        self.published: list[tuple[str, Any]] = []
+
+    async def publish_message(self, routing_key: str, payload: Any) -> None:
+        self.published.append((routing_key, payload))
+
+
+def outbox(size: int) -> list[OutboxEntry]:
+    return [OutboxEntry(id=i, uuid=uuid4(), sent=False) for i in range(size)]
+
+
+async def test_publish_batch() -> None:
+    """Test the outbox is published in batches of locked, unsent entries."""
+    database = FakeOutboxDatabase(*outbox(5))
+    amqp_system = FakeAMQPSystem()
+    publisher = OutboxPublisher(
+        amqp_system=amqp_system,  # type: ignore[arg-type]
+        sessionmaker=database,  # type: ignore[arg-type]
+        batch_size=2,
+    )
+
+    assert [await publisher._publish_batch() for _ in range(4)] == [2, 2, 1, 0]
+    assert amqp_system.published == [
+        ("change", str(entry.uuid)) for entry in database.entries
+    ]
+    assert all(entry.sent for entry in database.entries)
+    # Concurrent publishers skip the batches locked by each other
+    batches = [s for s in database.statements if s.startswith("SELECT outbox.id")]
+    assert len(batches) == 4
+    assert all(s.endswith("LIMIT 2 FOR UPDATE SKIP LOCKED") for s in batches)
+
+
+async def test_publish_batch_changes() -> None:
+    """Test the UUIDs of a batch are published in multi-UUID messages."""
+    database = FakeOutboxDatabase(*outbox(5))
+    amqp_system = FakeAMQPSystem()
+    publisher = OutboxPublisher(
+        amqp_system=amqp_system,  # type: ignore[arg-type]
+        sessionmaker=database,  # type: ignore[arg-type]
+        message_size=2,
+    )
+
+    assert await publisher._publish_batch() == 5
+    uuids = [str(entry.uuid) for entry in database.entries]
+    assert amqp_system.published == [
+        ("changes", uuids[0:2]),
+        ("changes", uuids[2:4]),
+        ("changes", uuids[4:5]),
+    ]
+
+
+async def test_purge() -> None:
+    """Test only the sent entries are purged."""
+    entries = outbox(3)
+    entries[1].sent = True
+    database = FakeOutboxDatabase(*entries)
+    publisher = OutboxPublisher(
+        amqp_system=FakeAMQPSystem(),  # type: ignore[arg-type]
+        sessionmaker=database,  # type: ignore[arg-type]
+    )
+
+    await publisher._purge()
+    assert database.entries == [entries[0], entries[2]]
+    assert database.statements == ["DELETE FROM outbox WHERE outbox.sent"]
+
+
+async def test_publish_batch_partitions() -> None:
+    """Test partitioned routing keys, with a single partition per message."""
+    database = FakeOutboxDatabase(*outbox(20))
+    amqp_system = FakeAMQPSystem()
+    publisher = OutboxPublisher(
+        amqp_system=amqp_system,  # type: ignore[arg-type]
+        sessionmaker=database,  # type: ignore[arg-type]
+        partitions=4,
+    )
+    await publisher._publish_batch()
+    assert amqp_system.published == [
+        (f"change.{partition(entry.uuid, 4)}", str(entry.uuid))
+        for entry in database.entries
+    ]
+
+    database = FakeOutboxDatabase(*outbox(20))
+    amqp_system = FakeAMQPSystem()
+    publisher = OutboxPublisher(
+        amqp_system=amqp_system,  # type: ignore[arg-type]
+        sessionmaker=database,  # type: ignore[arg-type]
+        message_size=100,
+        partitions=4,
+    )
+    await publisher._publish_batch()
+    published = {routing_key: payload for routing_key, payload in amqp_system.published}
+    assert len(published) == len(amqp_system.published)
+    assert published == {
+        f"changes.{p}": [
+            str(entry.uuid)
+            for entry in database.entries
+            if partition(entry.uuid, 4) == p
+        ]
+        for p in {partition(entry.uuid, 4) for entry in database.entries}
+    }
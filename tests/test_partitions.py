@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from typing import Any
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+from fastramqpi.ramqp import Router
+
+from os2mo_fkk.events import fkk_handler
+from os2mo_fkk.events import mo_handler
+from os2mo_fkk.partitions import partition
+from os2mo_fkk.partitions import register_partitions
+
+
+def test_partition() -> None:
+    """Test partitions are stable and move few UUIDs when adding partitions."""
+    assert partition(UUID("0095665f-3685-498b-8ba7-2339d05a5bda"), 8) == partition(
+        UUID("0095665f-3685-498b-8ba7-2339d05a5bda"), 8
+    )
+    uuids = [uuid4() for _ in range(1000)]
+    assert {partition(uuid, 4) for uuid in uuids} == {0, 1, 2, 3}
+    moved = [uuid for uuid in uuids if partition(uuid, 4) != partition(uuid, 5)]
+    assert all(partition(uuid, 5) == 4 for uuid in moved)
+    assert len(moved) < 300
+
+
+def test_register_partitions() -> None:
+    """Test each partition gets a uniquely named handler."""
+    router = Router()
+    register_partitions(router, fkk_handler, "change", [0, 2])
+    assert {f.__name__: keys for f, keys in router.registry.items()} == {
+        "fkk_handler_partition_0": {"change.0"},
+        "fkk_handler_partition_2": {"change.2"},
+    }
+
+
+async def test_mo_handler_partitions() -> None:
+    """Test MO events are forwarded to the partition of the class."""
+    uuid = uuid4()
+    settings = MagicMock()
+    settings.fkk.partitions = 4
+    amqp_system = AsyncMock()
+    prefilter = AsyncMock()
+    mocks: dict[str, Any] = dict.fromkeys(
+        (
+            "mo",
+            "fkk",
+            "loader",
+            "batcher",
+            "fingerprints",
+            "echoes",
+            "sync_batcher",
+            "debouncer",
+            "locks",
+            "lanes",
+        ),
+        MagicMock(),
+    )
+    await mo_handler(
+        uuid,
+        settings=settings,
+        amqp_system=amqp_system,
+        prefilter=prefilter,
+        _=None,
+        **mocks,
+    )
+    amqp_system.publish_message.assert_awaited_once_with(
+        routing_key=f"mo_change.{partition(uuid, 4)}", payload=str(uuid)
+    )
+    # Filtering is left to the replica consuming the partition
+    prefilter.is_relevant.assert_not_awaited()
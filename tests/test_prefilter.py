@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+from uuid import UUID
+from uuid import uuid4
+
+from os2mo_fkk.autogenerated_graphql_client import GetFacetClasses
+from os2mo_fkk.loader import MOClassState
+from os2mo_fkk.prefilter import KLEPrefilter
+
+KLE_NUMBER_FACET = uuid4()
+
+
+class FakeMO:
+    def __init__(self, kle: set[UUID]) -> None:
+        self.kle = kle
+
+    async def get_facet_classes(
+        self, facet_user_key: str, cursor: str | None, limit: int
+    ) -> GetFacetClasses:
+        return GetFacetClasses.parse_obj(
+            {
+                "classes": {
+                    "objects": [{"uuid": uuid, "validities": []} for uuid in self.kle],
+                    "page_info": {"next_cursor": None},
+                },
+                "facets": {"objects": [{"uuid": KLE_NUMBER_FACET}]},
+            }
+        )
+
+
+class FakeFingerprints:
+    def __init__(self, uuids: set[UUID]) -> None:
+        self.uuids = uuids
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def existing(self) -> set[UUID]:
+        await self.release.wait()
+        return self.uuids
+
+
+class FakeLoader:
+    def __init__(self) -> None:
+        self.loaded: list[UUID] = []
+
+    async def load(self, mo: FakeMO, uuid: UUID) -> MOClassState:
+        self.loaded.append(uuid)
+        return None, KLE_NUMBER_FACET
+
+
+async def test_kle_prefilter() -> None:
+    """Test non-KLE classes are discarded once the set is built."""
+    kle = uuid4()
+    fkk_only = uuid4()
+    other = uuid4()
+    mo = FakeMO(kle={kle})
+    loader = FakeLoader()
+    prefilter = KLEPrefilter(
+        fingerprints=FakeFingerprints(uuids={kle, fkk_only}),  # type: ignore[arg-type]
+        context={"graphql_client": mo},
+    )
+
+    async with prefilter:
+        # Everything is relevant until the set is built
+        assert await prefilter.is_relevant(mo, loader, other)  # type: ignore[arg-type]
+        while not prefilter.ready:
+            await asyncio.sleep(0)
+
+        # The set is built from MO and the classes known from FKK at startup
+        assert await prefilter.is_relevant(mo, loader, kle)  # type: ignore[arg-type]
+        assert await prefilter.is_relevant(mo, loader, fkk_only)  # type: ignore[arg-type]
+        assert loader.loaded == []
+
+        # Unknown classes are checked in MO
+        assert not await prefilter.is_relevant(mo, loader, other)  # type: ignore[arg-type]
+        assert loader.loaded == [other]
+
+        # Synchronisation keeps the set up to date
+        prefilter.update(other, relevant=True)
+        assert await prefilter.is_relevant(mo, loader, other)  # type: ignore[arg-type]
+        prefilter.update(kle, relevant=False)
+        assert not await prefilter.is_relevant(mo, loader, kle)  # type: ignore[arg-type]
+
+
+async def test_kle_prefilter_update_while_building() -> None:
+    """Test synchronisation while building is not overwritten by the build."""
+    removed = uuid4()
+    added = uuid4()
+    mo = FakeMO(kle={removed})
+    loader = FakeLoader()
+    fingerprints = FakeFingerprints(uuids={removed})
+    fingerprints.release.clear()
+    prefilter = KLEPrefilter(
+        fingerprints=fingerprints,  # type: ignore[arg-type]
+        context={"graphql_client": mo},
+    )
+
+    async with prefilter:
+        prefilter.update(removed, relevant=False)
+        prefilter.update(added, relevant=True)
+        fingerprints.release.set()
+        while not prefilter.ready:
+            await asyncio.sleep(0)
+
+        assert not await prefilter.is_relevant(mo, loader, removed)  # type: ignore[arg-type]
+        assert await prefilter.is_relevant(mo, loader, added)  # type: ignore[arg-type]
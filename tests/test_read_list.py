@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+from lxml import etree
+from lxml.etree import _Element as Element
+
+from os2mo_fkk.klassifikation.api import FKKAPI
+
+
+class FakeFKKAPI(FKKAPI):
+    def __init__(self, existing: set[UUID]) -> None:
+        self.settings = MagicMock(search_concurrency=2)
+        self.existing = existing
+        self.requests: list[list[UUID]] = []
+
+    async def read_list_raw(self, uuids: list[UUID]) -> Element | None:
+        self.requests.append(uuids)
+        # StatusKode 44 if any of the objects are not found
+        if not self.existing.issuperset(uuids):
+            return None
+        return etree.Element("ListOutput")
+
+
+async def test_read_list_outputs() -> None:
+    """Test a partial miss falls back to reading the objects one by one."""
+    a, b, missing = uuid4(), uuid4(), uuid4()
+    fkk = FakeFKKAPI(existing={a, b})
+
+    assert len(await fkk.read_list_outputs([a, b])) == 1
+    assert fkk.requests == [[a, b]]
+
+    fkk.requests.clear()
+    assert len(await fkk.read_list_outputs([a, missing, b])) == 2
+    assert fkk.requests == [[a, missing, b], [a], [missing], [b]]
+
+    fkk.requests.clear()
+    assert await fkk.read_list_outputs([missing]) == []
+    assert fkk.requests == [[missing]]
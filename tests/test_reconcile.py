@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+from typing import Any
+from unittest.mock import MagicMock
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+from os2mo_fkk import reconcile
+from os2mo_fkk.klassifikation.models import Klasse
+from os2mo_fkk.lanes import Lane
+from os2mo_fkk.planner import SyncStatus
+from os2mo_fkk.reconcile import Reconciler
+from tests.test_hierarchy import klasse
+
+
+class FakeFKK:
+    def __init__(self, klasser: dict[UUID, Klasse]) -> None:
+        self.klasser = klasser
+
+    async def get_changed_uuids(self, **kwargs: Any) -> set[UUID]:
+        return set(self.klasser)
+
+    async def read_list(self, uuids: list[UUID]) -> dict[UUID, Klasse]:
+        return {uuid: self.klasser[uuid] for uuid in uuids if uuid in self.klasser}
+
+
+async def test_reconcile(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test only differing classes are synchronised, in waves by hierarchy."""
+    unchanged, parent, child, deleted = sorted(uuid4() for _ in range(4))
+    fkk = FakeFKK(
+        {
+            unchanged: klasse(unchanged),
+            parent: klasse(parent),
+            child: klasse(child, parent),
+        }
+    )
+
+    async def get_mo_kle_classes(mo: Any) -> tuple[dict[UUID, Any], UUID]:
+        return {unchanged: MagicMock(), deleted: MagicMock()}, uuid4()
+
+    def plan_sync(uuid: UUID, **kwargs: Any) -> tuple[SyncStatus, list[Any]]:
+        if uuid == unchanged:
+            return SyncStatus.UP_TO_DATE, []
+        return SyncStatus.CREATE_OR_UPDATE, [MagicMock()]
+
+    monkeypatch.setattr(reconcile, "get_mo_kle_classes", get_mo_kle_classes)
+    monkeypatch.setattr(reconcile, "plan_sync", plan_sync)
+    monkeypatch.setattr(reconcile, "desired_state", MagicMock())
+
+    batches: list[tuple[list[UUID], set[UUID], Lane]] = []
+
+    async def sync_batch(
+        uuids: list[UUID], mo_changed: set[UUID], lane: Lane
+    ) -> list[SyncStatus | BaseException]:
+        batches.append((uuids, mo_changed, lane))
+        return [
+            ValueError("boom") if uuid == deleted else SyncStatus.CREATE_OR_UPDATE
+            for uuid in uuids
+        ]
+
+    reconciler = Reconciler(fkk=fkk)  # type: ignore[arg-type]
+    await reconciler.reconcile(MagicMock(), sync_batch)
+
+    # Every class is read again by the synchronisation, in the bulk lane
+    assert batches == [
+        ([parent], {parent}, Lane.BULK),
+        ([child], {child}, Lane.BULK),
+        ([deleted], {deleted}, Lane.BULK),
+    ]
+    progress = reconciler.progress
+    assert progress.total == progress.processed == 4
+    assert progress.failed == 1
+    assert progress.waves == progress.waves_processed == 3
+    assert progress.statuses == {
+        SyncStatus.UP_TO_DATE: 1,
+        SyncStatus.CREATE_OR_UPDATE: 2,
+    }
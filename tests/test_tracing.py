@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: Magenta ApS <https://magenta.dk>
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+
+import pytest
+from more_itertools import one
+
+from os2mo_fkk.tracing import InMemoryExporter
+from os2mo_fkk.tracing import set_attribute
+from os2mo_fkk.tracing import span
+
+
+async def test_tracing() -> None:
+    """Test spans are nested across tasks and exported in memory."""
+
+    async def child(name: str) -> None:
+        with span(name):
+            set_attribute("answer", 42)
+
+    async with InMemoryExporter(max_spans=10) as exporter:
+        with span("root", uuid="abc") as root:
+            await asyncio.gather(child("a"), child("b"))
+        with pytest.raises(ValueError), span("failing"):
+            raise ValueError("boom")
+
+    # Nothing is traced after the exporter exits
+    with span("ignored") as ignored:
+        assert ignored is None
+        set_attribute("answer", 42)
+
+    assert root is not None
+    traces = exporter.traces()
+    assert len(traces) == 2
+    root_trace = traces[root.trace_id]
+    assert [s.name for s in root_trace] == ["root", "a", "b"]
+    assert root_trace[0].attributes == {"uuid": "abc"}
+    for s in root_trace[1:]:
+        assert s.parent_id == root.span_id
+        assert s.attributes == {"answer": 42}
+        assert s.duration is not None
+
+    failing = one(t for t in traces.values() if t[0].name == "failing")
+    assert one(failing).error == "ValueError('boom')"